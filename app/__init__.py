@@ -1,10 +1,43 @@
 # This file makes the app directory a Python package 
 
 import os
+import json
 import time
-from flask import Flask, request, jsonify, render_template
+import base64
+import tempfile
+import itertools
+from contextlib import contextmanager
+import cv2
+from flask import (Flask, Response, g, request, jsonify, render_template, send_file, send_from_directory,
+                   stream_with_context, url_for)
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry
+from werkzeug.datastructures import CombinedMultiDict, FileStorage
+from werkzeug.formparser import parse_form_data
 from werkzeug.utils import secure_filename
+from werkzeug.wsgi import get_input_stream
 from app.config import config
+from app.cli import register_commands
+from app.utils.admission import BULK, INTERACTIVE, AdmissionController, DeadlineExceeded, Overloaded, check_deadline, request_deadline
+from app.utils.annotate import ENCODINGS, AnnotationRenderer, encode_image
+from app.utils.boxes import boxes_to_detections
+from app.utils.cpu_policy import CpuPolicy
+from app.utils.detection_service import InvalidImageError, cache_allowed
+from app.utils.formats import FORMATS, encode_boxes, negotiate
+from app.utils.image_io import decode_image
+from app.utils.inference_options import parse_inference_options, rescale_detections, with_classes
+from app.utils.jobs import FINISHED, JobRunner, JobStore
+from app.utils.metrics import REQUEST_SECONDS, AppCollector, end_request, render_metrics, stage, start_request
+from app.utils.model_loader import LazyModel, ModelLoader
+from app.utils.model_registry import CurrentModel, ModelRegistry, UnknownModelError, model_name, parse_models
+from app.utils.profiling import Profiler
+from app.utils.result_cache import settings_digest
+from app.utils.tiling import tiled_predict
+from app.utils.uploads import disk_stream_factory, is_archive, iter_uploads, map_upload, spooled_request_class
+from app.utils.video import iter_mjpeg_frames, iter_video_frames, track_stream
+
+# Requests the profiler samples when armed
+PROFILED_ENDPOINTS = {'detect', 'api_detect', 'api_detect_annotated', 'api_detect_batch', 'api_detect_tiled',
+                      'api_detect_video'}
 
 def create_app(config_name='default'):
     """Create and configure the Flask application."""
@@ -12,79 +45,982 @@ def create_app(config_name='default'):
     
     # Load configuration
     app.config.from_object(config[config_name])
+    app.request_class = spooled_request_class(app.config['UPLOAD_SPOOL_MAX_MEMORY'])
+    
+    # Model maintenance commands for the flask CLI
+    register_commands(app)
+    
+    # Thread budget of this process among WEB_CONCURRENCY; a pre-forking
+    # server applies it in each worker after the fork instead
+    cpu_policy = CpuPolicy(
+        threads=app.config['TORCH_THREADS'],
+        interop_threads=app.config['TORCH_INTEROP_THREADS'],
+        processes=app.config['WEB_CONCURRENCY'],
+        pin=app.config['CPU_PINNING']
+    )
+    app.extensions['yolo_cpu_policy'] = cpu_policy
+    if app.config['CPU_POLICY'] and app.config['YOLO_LOAD_MODE'] != 'preload':
+        cpu_policy.apply()
+    
+    # Initialize the YOLO detector. torch and ultralytics are only imported
+    # when the model is first loaded, see YOLO_LOAD_MODE
+    detector_options = {
+        'backend': app.config['YOLO_BACKEND'],
+        'channels_last': app.config['YOLO_CHANNELS_LAST'],
+        'inference_defaults': {
+            'imgsz': app.config['YOLO_IMGSZ'],
+            'iou': app.config['YOLO_IOU'],
+            'max_det': app.config['YOLO_MAX_DET'],
+            'classes': [name.strip() for name in app.config['YOLO_CLASSES'].split(',') if name.strip()] or None,
+            'half': app.config['YOLO_HALF']
+        }
+    }
+    if app.config['YOLO_BACKEND'] == 'onnx':
+        # ONNX Runtime sizes its pool by the whole machine, keep it to the policy's share
+        onnx_threads = app.config['ONNX_INTRA_OP_THREADS'] or (cpu_policy.threads if app.config['CPU_POLICY'] else 0)
+        detector_options.update(
+            cache_dir=app.config['ONNX_CACHE_DIR'],
+            imgsz=app.config['YOLO_IMGSZ'],
+            intra_op_threads=onnx_threads,
+            inter_op_threads=app.config['ONNX_INTER_OP_THREADS'],
+            quantization=app.config['YOLO_QUANTIZATION'],
+            calibration_dir=app.config['QUANT_CALIBRATION_DIR']
+        )
+    
+    def build_engine(weights):
+        """Build the detector for a weights file and the engine that serves it."""
+        def load_detector():
+            from app.utils.yolo_detector import YOLODetector
+            return YOLODetector(weights, **detector_options)
+        
+        def load_pool():
+            from app.utils.worker_pool import InferencePool
+            return InferencePool(
+                weights,
+                workers=app.config['YOLO_WORKERS'],
+                threads_per_worker=app.config['YOLO_THREADS_PER_WORKER'],
+                imgsz=app.config['YOLO_IMGSZ'],
+                detector_options=detector_options
+            )
+        
+        detector = LazyModel(load_detector)
+        engine = detector
+        
+        # Hand frames to a pool of inference processes, or group concurrent
+        # requests into batched forward passes in this process
+        if app.config['YOLO_WORKERS'] > 0:
+            engine = LazyModel(load_pool)
+        elif app.config['YOLO_BATCH_SIZE'] > 1:
+            from app.utils.batcher import BatchScheduler
+            engine = BatchScheduler(
+                detector,
+                max_batch_size=app.config['YOLO_BATCH_SIZE'],
+                max_wait_ms=app.config['YOLO_BATCH_WAIT_MS'],
+                imgsz=app.config['YOLO_IMGSZ']
+            )
+        return detector, engine
+    
+    detector, engine = build_engine(app.config['YOLO_MODEL'])
+    
+    loader = ModelLoader(
+        engine,
+        detector,
+        mode=app.config['YOLO_LOAD_MODE'],
+        warmup_sizes=app.config['YOLO_WARMUP_SIZES'],
+        conf=app.config['YOLO_CONF']
+    )
+    app.extensions['yolo_loader'] = loader
+    loader.start()
+    
+    # Content-addressed cache of detection results
+    cache = None
+    if app.config['DETECTION_CACHE_SIZE'] > 0:
+        from app.utils.result_cache import DetectionCache
+        cache = DetectionCache(
+            max_entries=app.config['DETECTION_CACHE_SIZE'],
+            ttl=app.config['DETECTION_CACHE_TTL'],
+            db_path=app.config['DETECTION_CACHE_DB']
+        )
+    
+    # Further models are loaded on demand and picked per request with ?model=
+    cascade = [name.strip() for name in app.config['YOLO_CASCADE'].split(',') if name.strip()]
+    decode_size = app.config['YOLO_IMGSZ'] if app.config['DECODE_REDUCED'] else None
+    registry = ModelRegistry(
+        lambda weights: build_engine(weights)[1],
+        models=parse_models(app.config['YOLO_MODELS']),
+        cache=cache,
+        memory_budget_mb=app.config['YOLO_MODEL_MEMORY_MB'],
+        cascade=cascade or None,
+        cascade_conf=app.config['YOLO_CASCADE_CONF'],
+        warmup_sizes=app.config['YOLO_WARMUP_SIZES'],
+        conf=app.config['YOLO_CONF'],
+        decode_size=decode_size,
+        on_swap=lambda entry: loader.adopt(entry.engine) if entry.name == registry.default else None,
+        # Cached detections are only valid for the settings they were computed with
+        cache_tag=settings_digest({
+            'backend': app.config['YOLO_BACKEND'],
+            'quantization': detector_options.get('quantization'),
+            'inference_defaults': detector_options['inference_defaults'],
+            'decode_size': decode_size
+        })
+    )
+    # The default model is warmed up by the loader and never evicted
+    registry.register(model_name(app.config['YOLO_MODEL']), app.config['YOLO_MODEL'], engine, pinned=True)
+    # Both follow hot swaps of the default model
+    app.extensions['yolo'] = CurrentModel(registry, 'service')
+    default_engine = CurrentModel(registry, 'engine')
+    app.extensions['yolo_models'] = registry
+    
+    # Bounded, prioritized queue in front of single-image inference
+    admission = None
+    if app.config['ADMISSION_MAX_CONCURRENT'] > 0:
+        admission = AdmissionController(
+            max_concurrent=app.config['ADMISSION_MAX_CONCURRENT'],
+            max_queue=app.config['ADMISSION_MAX_QUEUE']
+        )
+    app.extensions['yolo_admission'] = admission
+    
+    # Optional persistence of uploads, content-addressed with bounded retention
+    upload_store = None
+    if app.config['UPLOAD_STORE_ENABLED']:
+        from app.utils.upload_store import UploadStore
+        upload_store = UploadStore(
+            app.config['UPLOAD_FOLDER'],
+            max_bytes=app.config['UPLOAD_STORE_MAX_BYTES'],
+            max_age=app.config['UPLOAD_STORE_MAX_AGE'],
+            async_writes=app.config['UPLOAD_STORE_ASYNC'],
+            queue_size=app.config['UPLOAD_STORE_QUEUE_SIZE'],
+            evict_interval=app.config['UPLOAD_STORE_EVICT_INTERVAL']
+        )
+    app.extensions['upload_store'] = upload_store
+    renderer = AnnotationRenderer()
+    
+    # Opt-in request profiling, armed by PROFILE_REQUESTS or POST /api/profile
+    profiler = Profiler(
+        app.config['PROFILE_DIR'],
+        interval=app.config['PROFILE_INTERVAL_MS'] / 1000,
+        torch_ops=app.config['PROFILE_TORCH'],
+        labels={
+            'model': app.config['YOLO_MODEL'],
+            'backend': app.config['YOLO_BACKEND'],
+            'imgsz': app.config['YOLO_IMGSZ'],
+            'batch_size': app.config['YOLO_BATCH_SIZE'],
+            'workers': app.config['YOLO_WORKERS'],
+            'torch_threads': cpu_policy.threads,
+            'cpu_pinning': cpu_policy.pin,
+            'onnx_intra_op_threads': app.config['ONNX_INTRA_OP_THREADS']
+        }
+    )
+    profiler.arm(app.config['PROFILE_REQUESTS'])
+    app.extensions['yolo_profiler'] = profiler
+    
+    # Queue depth, cache and model load metrics of this app, read at scrape time
+    metrics_registry = CollectorRegistry()
+    metrics_registry.register(AppCollector(default_engine, cache=cache, loader=loader, admission=admission))
     
-    # Initialize the YOLO detector
-    from app.utils.yolo_detector import YOLODetector
-    detector = YOLODetector(app.config['YOLO_MODEL'])
+    @app.before_request
+    def start_timing():
+        g.timings, g.timings_token = start_request()
+        if request.endpoint in PROFILED_ENDPOINTS:
+            g.profile = profiler.start(request.endpoint)
+        # Deadlines count from arrival, so time spent receiving the upload is included
+        try:
+            g.deadline = request_deadline(
+                g.timings.start,
+                request.headers.get('X-Request-Timeout-Ms') or app.config['REQUEST_TIMEOUT_MS']
+            )
+        except ValueError:
+            return jsonify({'error': 'X-Request-Timeout-Ms must be a number'}), 400
+    
+    @app.after_request
+    def add_server_timing(response):
+        timings = g.get('timings')
+        if timings is not None:
+            REQUEST_SECONDS.labels(request.endpoint or 'unknown').observe(timings.elapsed())
+            response.headers['Server-Timing'] = timings.server_timing()
+        return response
+    
+    @app.teardown_request
+    def stop_timing(exc=None):
+        # Streamed responses get here once the stream is done
+        capture = g.pop('profile', None)
+        if capture is not None:
+            capture.stop()
+        token = g.pop('timings_token', None)
+        if token is not None:
+            end_request(token)
+    
+    @app.errorhandler(Overloaded)
+    def overloaded(e):
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(app.config['ADMISSION_RETRY_AFTER'])}
+    
+    @app.errorhandler(DeadlineExceeded)
+    def deadline_exceeded(e):
+        return jsonify({'error': str(e)}), 504
+    
+    @contextmanager
+    def admitted(priority):
+        """
+        Hold an inference slot for the request.
+        
+        Yields the degradations to apply: empty normally, the reduced input
+        size (and no annotation where it applies) under pressure.
+        """
+        deadline = g.get('deadline')
+        if admission is None:
+            check_deadline(deadline)
+            yield []
+            return
+        with admission.admit(priority, deadline):
+            pressure = admission.pressure
+            threshold = app.config['DEGRADE_PRESSURE']
+            yield [f"imgsz={app.config['DEGRADE_IMGSZ']}"] if threshold > 0 and pressure >= threshold else []
+    
+    @contextmanager
+    def job_admitted():
+        """
+        Hold an inference slot for a background job.
+        
+        Jobs have no deadline and nobody to send a 503 to, so a full queue
+        is waited out instead of failing the job.
+        """
+        if admission is None:
+            yield []
+            return
+        while True:
+            try:
+                admission.acquire(BULK)
+                break
+            except Overloaded:
+                time.sleep(app.config['ADMISSION_RETRY_AFTER'])
+        try:
+            yield []
+        finally:
+            admission.release()
+    
+    def ndjson_response(lines):
+        """
+        Stream NDJSON lines, running the generator up to its first line before responding.
+        
+        A request rejected for overload or an expired deadline before any line
+        is sent still gets its 503 or 504, later rejections end the stream with
+        an error line.
+        """
+        first = next(lines, None)
+        
+        def generate():
+            try:
+                if first is None:
+                    return
+                yield first
+                yield from lines
+            except (Overloaded, DeadlineExceeded) as e:
+                yield json.dumps({'success': False, 'error': str(e)}) + '\n'
+            finally:
+                lines.close()
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    def inference_options(params=None):
+        """Model options set on the request: imgsz, iou, max_det, classes and half."""
+        params = request.values if params is None else params
+        return parse_inference_options(params, app.config['YOLO_MAX_IMGSZ'])
+    
+    def model_options(options, model, degradations=()):
+        """Resolve class names against the model and cap the input size when degraded."""
+        if options.get('classes'):
+            options = with_classes(options, model.engine.names)
+        if degradations:
+            options = dict(options, imgsz=min(options.get('imgsz') or app.config['DEGRADE_IMGSZ'],
+                                              app.config['DEGRADE_IMGSZ']))
+        return options
     
     def allowed_file(filename):
         return '.' in filename and \
                filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
     
+    def read_upload(file):
+        """Read an uploaded file and hand a copy to the upload store, if enabled."""
+        data = file.read()
+        if upload_store is not None:
+            upload_store.put(data, file.filename)
+        return data
+    
+    def requested_model(params=None):
+        """Model asked for with ?model=, checked against the registry."""
+        params = request.values if params is None else params
+        return registry.resolve(params.get('model'))
+    
+    def detect_and_annotate(model, image, fmt, quality, options):
+        """Run detection and encode the annotated image into memory."""
+        boxes = model.engine.predict([image], conf=app.config['YOLO_CONF'], **options)[0]
+        names = model.engine.names
+        with stage('annotate'):
+            annotated = renderer.render(image, boxes, names)
+        with stage('serialize'):
+            body, mimetype = encode_image(annotated, fmt=fmt, quality=quality)
+        return boxes_to_detections(boxes, names), body, mimetype
+    
+    def cache_requested(params=None):
+        """Callers can skip the result cache with ?cache=0 or Cache-Control: no-cache."""
+        params = request.values if params is None else params
+        return cache is not None and cache_allowed(params.get('cache'), request.headers.get('Cache-Control'))
+    
+    def detect_chunk(model, chunk, conf, use_cache, options):
+        """Run one forward pass over a chunk of (name, bytes, error) uploads and yield NDJSON lines."""
+        lines = [None] * len(chunk)
+        pending = []
+        for index, (name, data, error) in enumerate(chunk):
+            if error is not None:
+                lines[index] = {'filename': name, 'success': False, 'error': error}
+                continue
+            
+            cache_key = None
+            if use_cache:
+                cache_key = cache.make_key(data, model.service.cache_name(options=options), conf)
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    lines[index] = {'filename': name, 'success': True, 'detections': cached}
+                    continue
+            
+            try:
+                image, scale = model.service.decode(data, options.get('imgsz'))
+            except InvalidImageError as e:
+                lines[index] = {'filename': name, 'success': False, 'error': str(e)}
+                continue
+            pending.append((index, cache_key, image, scale))
+        
+        if pending:
+            try:
+                results = model.engine.detect_batch([image for _, _, image, _ in pending], conf=conf, **options)
+            except Exception as e:
+                results = [e] * len(pending)
+            
+            for (index, cache_key, _, scale), detections in zip(pending, results):
+                name = chunk[index][0]
+                if isinstance(detections, Exception):
+                    lines[index] = {'filename': name, 'success': False, 'error': str(detections)}
+                    continue
+                rescale_detections(detections, scale)
+                if cache_key is not None:
+                    cache.set(cache_key, detections)
+                lines[index] = {'filename': name, 'success': True, 'detections': detections}
+        
+        for line in lines:
+            yield json.dumps(line) + '\n'
+    
+    def detect_uploads(name, uploads, use_cache, options, guard):
+        """
+        Detect objects in uploaded images and archives chunk by chunk and yield NDJSON lines.
+        
+        Each chunk runs under ``guard``, an inference slot is held per forward
+        pass and not while lines wait for the client.
+        
+        Raises:
+            ValueError: If options name a class the model does not know
+        """
+        items = iter_uploads(uploads, app.config['ALLOWED_EXTENSIONS'], app.config['MAX_CONTENT_LENGTH'])
+        with registry.acquire(name) as model:
+            options = model_options(options, model)
+            while True:
+                chunk = list(itertools.islice(items, app.config['BATCH_CHUNK_SIZE']))
+                if not chunk:
+                    break
+                with guard():
+                    lines = list(detect_chunk(model, chunk, app.config['YOLO_CONF'], use_cache, options))
+                yield from lines
+    
+    def run_batch_job(job):
+        """Job handler for images and archives, one result line per image like /api/detect/batch."""
+        uploads = [FileStorage(open(os.path.join(job.input_dir, stored), 'rb'), filename=filename)
+                   for stored, filename in job.params['files']]
+        if not any(is_archive(upload.filename) for upload in uploads):
+            job.total = len(uploads)
+        try:
+            yield from detect_uploads(job.params['model'], uploads, job.params['cache'], job.params['options'],
+                                      job_admitted)
+        finally:
+            for upload in uploads:
+                upload.close()
+    
+    def run_video_job(job):
+        """Job handler for a video file, one result line per frame like /api/detect/video."""
+        capture = cv2.VideoCapture(os.path.join(job.input_dir, job.params['files'][0][0]))
+        if not capture.isOpened():
+            capture.release()
+            raise ValueError('Invalid video file')
+        # Container metadata, an estimate for some formats
+        job.total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) or None
+        with registry.acquire(job.params['model']) as model:
+            options = model_options(job.params['options'], model)
+            for result in track_stream(model.engine, iter_video_frames(capture, stride=job.params['stride']),
+                                       conf=app.config['YOLO_CONF'], batch_size=app.config['BATCH_CHUNK_SIZE'],
+                                       guard=job_admitted, **options):
+                yield json.dumps(result) + '\n'
+    
+    # Background jobs for work that outlives a request, state in SQLite under JOBS_DIR
+    jobs = None
+    if app.config['JOBS_ENABLED']:
+        jobs = JobRunner(
+            JobStore(app.config['JOBS_DIR']),
+            {'batch': run_batch_job, 'video': run_video_job},
+            max_concurrent=app.config['JOBS_MAX_CONCURRENT'],
+            poll_interval=app.config['JOBS_POLL_INTERVAL'],
+            stale_after=app.config['JOBS_STALE_AFTER'],
+            max_age=app.config['JOBS_MAX_AGE']
+        )
+        if app.config['YOLO_LOAD_MODE'] != 'preload':
+            # Pre-forking servers start it in one worker, see gunicorn.conf.py
+            jobs.start()
+    app.extensions['yolo_jobs'] = jobs
+    
+    @app.route('/healthz', methods=['GET'])
+    def healthz():
+        """Liveness probe, answers as soon as the process serves requests"""
+        return jsonify({'status': 'ok'})
+    
+    @app.route('/readyz', methods=['GET'])
+    def readyz():
+        """Readiness probe, fails until the model is loaded and warmed up"""
+        status = loader.status()
+        return jsonify(status), 200 if status['ready'] else 503
+    
     @app.route('/')
     def index():
         return render_template('index.html')
     
     @app.route('/detect', methods=['POST'])
     def detect_objects():
-        if 'file' not in request.files:
+        # The multipart body is read and parsed on first access
+        with stage('receive'):
+            files = request.files
+        
+        if 'file' not in files:
             return jsonify({'error': 'No file part'}), 400
         
-        file = request.files['file']
+        file = files['file']
         
         if file.filename == '':
             return jsonify({'error': 'No selected file'}), 400
         
+        try:
+            name = requested_model()
+            options = inference_options()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         if file and allowed_file(file.filename):
-            filename = secure_filename(f"{int(time.time())}_{file.filename}")
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            
-            # Ensure directory exists
-            os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+            # Decode straight from the request stream, the store writes its own copy
+            with stage('decode'):
+                image = decode_image(read_upload(file))
+            if image is None:
+                return jsonify({'error': 'Invalid image file'}), 400
             
-            file.save(filepath)
+            # Interactive traffic is admitted ahead of API requests
+            with admitted(INTERACTIVE) as degradations, registry.acquire(name) as model:
+                try:
+                    options = model_options(options, model, degradations)
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+                if degradations:
+                    # The page can show the upload itself, drawing the boxes is skipped
+                    boxes = model.engine.predict([image], conf=app.config['YOLO_CONF'], **options)[0]
+                    payload = {'success': True, 'detections': boxes_to_detections(boxes, model.engine.names),
+                               'degraded': degradations + ['no-annotation']}
+                else:
+                    results, body, mimetype = detect_and_annotate(
+                        model, image, app.config['ANNOTATION_FORMAT'], app.config['ANNOTATION_QUALITY'], options
+                    )
+                    payload = {
+                        'success': True,
+                        'result_image': f"data:{mimetype};base64,{base64.b64encode(body).decode('ascii')}",
+                        'detections': results
+                    }
             
-            # Run detection on the image
-            results = detector.detect(filepath, conf=app.config['YOLO_CONF'])
-            
-            # Return detection results
-            return jsonify({
-                'success': True,
-                'filename': filename,
-                'detections': results
-            })
+            # Return detection results with the annotated image inlined for the web interface
+            with stage('serialize'):
+                response = jsonify(payload)
+            if 'degraded' in payload:
+                response.headers['X-Degraded'] = ', '.join(payload['degraded'])
+            return response
         
         return jsonify({'error': 'File type not allowed'}), 400
     
     @app.route('/api/detect', methods=['POST'])
     def api_detect():
-        """API endpoint that accepts an image and returns detection results as JSON"""
-        if 'file' not in request.files:
+        """API endpoint that accepts an image and returns detection results as JSON or a columnar format"""
+        try:
+            fmt = negotiate(request.accept_mimetypes, request.args.get('format'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if fmt is None:
+            return jsonify({'error': f"Not acceptable, supported types: {', '.join(FORMATS.values())}"}), 406
+        
+        try:
+            name = requested_model(request.args)
+            options = inference_options(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # The multipart body is read and parsed on first access
+        with stage('receive'):
+            files = request.files
+        
+        if 'file' not in files:
             return jsonify({'error': 'No file part'}), 400
         
-        file = request.files['file']
+        file = files['file']
         
         if file.filename == '':
             return jsonify({'error': 'No selected file'}), 400
         
         if file and allowed_file(file.filename):
-            filename = secure_filename(f"{int(time.time())}_{file.filename}")
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+            data = read_upload(file)
+            with admitted(BULK) as degradations, registry.acquire(name) as model:
+                try:
+                    options = model_options(options, model, degradations)
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+                if fmt != 'json':
+                    try:
+                        boxes, cache_status = model.service.detect_boxes(
+                            data,
+                            conf=app.config['YOLO_CONF'],
+                            use_cache=cache_requested(),
+                            **options
+                        )
+                    except InvalidImageError as e:
+                        return jsonify({'error': str(e)}), 400
+                    
+                    with stage('serialize'):
+                        body, mimetype, headers = encode_boxes(boxes, model.engine.names, fmt)
+                    response = Response(body, mimetype=mimetype, headers=headers)
+                    response.headers['X-Cache'] = cache_status
+                    response.headers['X-Model'] = model.name
+                    if degradations:
+                        response.headers['X-Degraded'] = ', '.join(degradations)
+                    response.vary.add('Accept')
+                    return response
+                
+                try:
+                    results, cache_status = model.service.detect_bytes(
+                        data,
+                        conf=app.config['YOLO_CONF'],
+                        use_cache=cache_requested(),
+                        **options
+                    )
+                except InvalidImageError as e:
+                    return jsonify({'error': str(e)}), 400
             
-            # Ensure directory exists
-            os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-            
-            file.save(filepath)
+            # Return only the detection results without the image
+            payload = {'success': True, 'detections': results}
+            if degradations:
+                payload['degraded'] = degradations
+            with stage('serialize'):
+                response = jsonify(payload)
+            if degradations:
+                response.headers['X-Degraded'] = ', '.join(degradations)
+            response.headers['X-Cache'] = cache_status
+            response.headers['X-Model'] = model.name
+            response.vary.add('Accept')
+            return response
+        
+        return jsonify({'error': 'File type not allowed'}), 400
+    
+    @app.route('/api/detect/annotated', methods=['POST'])
+    def api_detect_annotated():
+        """API endpoint that accepts an image and returns it with the detections drawn on"""
+        # The multipart body is read and parsed on first access
+        with stage('receive'):
+            files = request.files
+        
+        if 'file' not in files:
+            return jsonify({'error': 'No file part'}), 400
+        
+        file = files['file']
+        
+        if file.filename == '':
+            return jsonify({'error': 'No selected file'}), 400
+        
+        fmt = request.args.get('format', app.config['ANNOTATION_FORMAT']).lower()
+        if fmt not in ENCODINGS:
+            return jsonify({'error': f"Unsupported format, use one of: {', '.join(ENCODINGS)}"}), 400
+        
+        try:
+            quality = min(max(int(request.args.get('quality', app.config['ANNOTATION_QUALITY'])), 1), 100)
+        except ValueError:
+            return jsonify({'error': 'quality must be an integer'}), 400
+        
+        try:
+            name = requested_model()
+            options = inference_options()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if file and allowed_file(file.filename):
+            with stage('decode'):
+                image = decode_image(read_upload(file))
+            if image is None:
+                return jsonify({'error': 'Invalid image file'}), 400
             
-            # Run detection on the image
-            results = detector.detect(filepath, conf=app.config['YOLO_CONF'])
+            # The image is the whole point here, so only the input size is reduced under pressure
+            with admitted(BULK) as degradations, registry.acquire(name) as model:
+                try:
+                    options = model_options(options, model, degradations)
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+                results, body, mimetype = detect_and_annotate(model, image, fmt, quality, options)
             
-            # Return only the detection results without the image
-            return jsonify({
-                'success': True,
-                'detections': results
-            })
+            response = Response(body, mimetype=mimetype)
+            response.headers['X-Detections-Count'] = str(len(results))
+            if degradations:
+                response.headers['X-Degraded'] = ', '.join(degradations)
+            return response
         
         return jsonify({'error': 'File type not allowed'}), 400
     
+    @app.route('/api/detect/batch', methods=['POST'])
+    def api_detect_batch():
+        """API endpoint that accepts many images or archives and streams one NDJSON line per image"""
+        # Parse the body here so the batch limit applies instead of MAX_CONTENT_LENGTH,
+        # werkzeug spools large parts to temporary files
+        _, form, files = parse_form_data(
+            request.environ,
+            max_content_length=app.config['BATCH_MAX_CONTENT_LENGTH']
+        )
+        uploads = files.getlist('files') + files.getlist('file')
+        
+        if not uploads:
+            return jsonify({'error': 'No file part'}), 400
+        
+        params = CombinedMultiDict([request.args, form])
+        try:
+            name = requested_model(params)
+            options = inference_options(params)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        use_cache = cache_requested(params)
+        
+        def generate():
+            try:
+                yield from detect_uploads(name, uploads, use_cache, options, lambda: admitted(BULK))
+            except ValueError as e:
+                yield json.dumps({'success': False, 'error': str(e)}) + '\n'
+            finally:
+                for upload in uploads:
+                    upload.close()
+        
+        return ndjson_response(generate())
+    
+    @app.route('/api/detect/tiled', methods=['POST'])
+    def api_detect_tiled():
+        """API endpoint that detects small objects in very large images by running overlapping tiles"""
+        # The upload goes to a temporary file and is memory-mapped for decoding
+        # instead of being read into memory, under its own size limit
+        _, form, files = parse_form_data(
+            request.environ,
+            stream_factory=disk_stream_factory,
+            max_content_length=app.config['TILED_MAX_CONTENT_LENGTH']
+        )
+        if 'file' not in files:
+            return jsonify({'error': 'No file part'}), 400
+        
+        file = files['file']
+        
+        if file.filename == '':
+            return jsonify({'error': 'No selected file'}), 400
+        
+        params = CombinedMultiDict([request.args, form])
+        tile_size = params.get('tile_size', app.config['TILE_SIZE'], type=int)
+        overlap = params.get('overlap', app.config['TILE_OVERLAP'], type=float)
+        batch_size = params.get('batch_size', app.config['TILE_BATCH_SIZE'], type=int)
+        if tile_size < 32:
+            return jsonify({'error': 'tile_size must be at least 32'}), 400
+        if not 0 <= overlap < 1:
+            return jsonify({'error': 'overlap must be in [0, 1)'}), 400
+        if batch_size < 1:
+            return jsonify({'error': 'batch_size must be a positive integer'}), 400
+        try:
+            name = requested_model(params)
+            options = inference_options(params)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if not allowed_file(file.filename):
+            return jsonify({'error': 'File type not allowed'}), 400
+        
+        try:
+            image = decode_image(map_upload(file))
+        finally:
+            file.close()
+        if image is None:
+            return jsonify({'error': 'Invalid image file'}), 400
+        
+        with registry.acquire(name) as model:
+            try:
+                options = model_options(options, model)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            boxes = tiled_predict(
+                model.engine,
+                image,
+                conf=app.config['YOLO_CONF'],
+                tile_size=tile_size,
+                overlap=overlap,
+                batch_size=batch_size,
+                iou_threshold=app.config['TILE_IOU'],
+                guard=lambda: admitted(BULK),
+                **options
+            )
+            names = model.engine.names
+        
+        return jsonify({
+            'success': True,
+            'image_size': [image.shape[1], image.shape[0]],
+            'detections': boxes_to_detections(boxes, names)
+        })
+    
+    @app.route('/api/detect/video', methods=['POST'])
+    def api_detect_video():
+        """API endpoint that accepts a video or MJPEG stream and streams per-frame detections as NDJSON"""
+        stride = request.args.get('stride', app.config['VIDEO_FRAME_STRIDE'], type=int)
+        if stride < 1:
+            return jsonify({'error': 'stride must be a positive integer'}), 400
+        try:
+            name = requested_model(request.args)
+        except UnknownModelError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        max_length = app.config['VIDEO_MAX_CONTENT_LENGTH']
+        cleanup = []
+        
+        if request.mimetype in ('multipart/x-mixed-replace', 'video/x-motion-jpeg', 'image/jpeg'):
+            # Raw or chunked MJPEG body, frames are cut out of the stream as they arrive
+            stream = get_input_stream(request.environ, max_content_length=max_length)
+            frames = iter_mjpeg_frames(stream, stride=stride, max_frame_size=app.config['MAX_CONTENT_LENGTH'])
+        elif request.mimetype == 'multipart/form-data':
+            _, _, files = parse_form_data(request.environ, max_content_length=max_length)
+            if 'file' not in files:
+                return jsonify({'error': 'No file part'}), 400
+            
+            file = files['file']
+            
+            if file.filename == '':
+                return jsonify({'error': 'No selected file'}), 400
+            
+            extension = file.filename.rsplit('.', 1)[1].lower() if '.' in file.filename else ''
+            if extension not in app.config['VIDEO_EXTENSIONS']:
+                return jsonify({'error': 'File type not allowed'}), 400
+            
+            # OpenCV needs a path to demux containers
+            with tempfile.NamedTemporaryFile(suffix=f'.{extension}', delete=False) as tmp:
+                file.save(tmp)
+                video_path = tmp.name
+            file.close()
+            
+            capture = cv2.VideoCapture(video_path)
+            cleanup.append(capture.release)
+            cleanup.append(lambda: os.remove(video_path))
+            if not capture.isOpened():
+                for callback in cleanup:
+                    callback()
+                return jsonify({'error': 'Invalid video file'}), 400
+            frames = iter_video_frames(capture, stride=stride)
+        else:
+            return jsonify({'error': 'Unsupported content type'}), 415
+        
+        def generate():
+            try:
+                with registry.acquire(name) as model:
+                    for result in track_stream(model.engine, frames, conf=app.config['YOLO_CONF'],
+                                               batch_size=app.config['BATCH_CHUNK_SIZE'],
+                                               guard=lambda: admitted(BULK)):
+                        yield json.dumps(result) + '\n'
+            except ValueError as e:
+                yield json.dumps({'success': False, 'error': str(e)}) + '\n'
+        
+        try:
+            response = ndjson_response(generate())
+        except Exception:
+            for callback in cleanup:
+                callback()
+            raise
+        # Runs even if the client disconnects before the first frame
+        for callback in cleanup:
+            response.call_on_close(callback)
+        return response
+    
+    @app.route('/api/jobs', methods=['POST'])
+    def submit_job():
+        """Queue images, archives or a video for detection in the background and return the job right away"""
+        if jobs is None:
+            return jsonify({'error': 'Job queue is disabled'}), 404
+        
+        # Uploads go to temporary files under the job size limit, then into the job directory
+        _, form, files = parse_form_data(
+            request.environ,
+            stream_factory=disk_stream_factory,
+            max_content_length=app.config['JOBS_MAX_CONTENT_LENGTH']
+        )
+        uploads = [upload for upload in files.getlist('files') + files.getlist('file') if upload.filename]
+        
+        if not uploads:
+            return jsonify({'error': 'No file part'}), 400
+        
+        params = CombinedMultiDict([request.args, form])
+        stride = params.get('stride', app.config['VIDEO_FRAME_STRIDE'], type=int)
+        if stride < 1:
+            return jsonify({'error': 'stride must be a positive integer'}), 400
+        try:
+            name = requested_model(params)
+            options = inference_options(params)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        videos = [upload for upload in uploads
+                  if upload.filename.rsplit('.', 1)[-1].lower() in app.config['VIDEO_EXTENSIONS']]
+        if videos and len(uploads) > 1:
+            return jsonify({'error': 'A video job takes exactly one file'}), 400
+        
+        inputs = [(f"{index}-{secure_filename(upload.filename) or 'upload'}", upload)
+                  for index, upload in enumerate(uploads)]
+        try:
+            job = jobs.submit('video' if videos else 'batch', {
+                'model': name,
+                'options': options,
+                'stride': stride,
+                'cache': cache_requested(params),
+                'files': [(stored, upload.filename) for stored, upload in inputs]
+            }, inputs)
+        finally:
+            for upload in uploads:
+                upload.close()
+        
+        response = jsonify(job.to_dict())
+        response.status_code = 202
+        response.headers['Location'] = url_for('job_status', job_id=job.id)
+        return response
+    
+    @app.route('/api/jobs', methods=['GET'])
+    def list_jobs():
+        """Most recent jobs, filtered with ?status=, and the number of jobs in each state"""
+        if jobs is None:
+            return jsonify({'enabled': False})
+        limit = request.args.get('limit', 50, type=int)
+        return jsonify({
+            'enabled': True,
+            'stats': jobs.stats(),
+            'jobs': [job.to_dict() for job in jobs.store.list(request.args.get('status'), limit)]
+        })
+    
+    @app.route('/api/jobs/<job_id>', methods=['GET'])
+    def job_status(job_id):
+        """Status and progress of a job, with a link to its results once finished"""
+        job = jobs.store.get(job_id) if jobs is not None else None
+        if job is None:
+            return jsonify({'error': 'Unknown job'}), 404
+        payload = job.to_dict()
+        if job.status in FINISHED and os.path.exists(job.results_path):
+            payload['results'] = url_for('job_results', job_id=job.id)
+        return jsonify(payload)
+    
+    @app.route('/api/jobs/<job_id>/results', methods=['GET'])
+    def job_results(job_id):
+        """NDJSON results of a finished job, partial for cancelled and failed ones"""
+        job = jobs.store.get(job_id) if jobs is not None else None
+        if job is None:
+            return jsonify({'error': 'Unknown job'}), 404
+        if job.status not in FINISHED:
+            return jsonify({'error': f"Job is {job.status}"}), 409
+        if not os.path.exists(job.results_path):
+            return jsonify({'error': 'Job has no results'}), 404
+        return send_file(job.results_path, mimetype='application/x-ndjson')
+    
+    @app.route('/api/jobs/<job_id>', methods=['DELETE'])
+    def cancel_job(job_id):
+        """Cancel a job, a running one stops at its next image or frame"""
+        job = jobs.cancel(job_id) if jobs is not None else None
+        if job is None:
+            return jsonify({'error': 'Unknown job'}), 404
+        return jsonify(job.to_dict())
+    
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Prometheus scrape endpoint"""
+        return Response(render_metrics(metrics_registry), content_type=CONTENT_TYPE_LATEST)
+    
+    @app.route('/api/models', methods=['GET'])
+    def list_models():
+        """Models that can be requested and those currently loaded"""
+        return jsonify(registry.stats())
+    
+    @app.route('/api/models/<name>', methods=['PUT'])
+    def swap_model(name):
+        """Load weights under a model name and switch its traffic over once warmed up"""
+        if not app.config['YOLO_MODEL_ADMIN']:
+            return jsonify({'error': 'Model administration is disabled'}), 403
+        
+        weights = (request.get_json(silent=True) or {}).get('weights')
+        if not weights:
+            return jsonify({'error': 'weights is required'}), 400
+        
+        try:
+            entry = registry.swap(name, weights)
+        except UnknownModelError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            # The previous model keeps serving
+            return jsonify({'error': f"Could not load {weights}: {e}"}), 500
+        return jsonify(dict(entry.status(), success=True))
+    
+    @app.route('/api/profile', methods=['GET'])
+    def profile_summary():
+        """Profiled requests so far, mean stage times and the most expensive torch operators"""
+        return jsonify(profiler.summary())
+    
+    @app.route('/api/profile', methods=['POST'])
+    def arm_profiler():
+        """Profile the next N detection requests"""
+        if not app.config['PROFILE_ADMIN']:
+            return jsonify({'error': 'Profiling administration is disabled'}), 403
+        
+        body = request.get_json(silent=True) or {}
+        try:
+            requests = int(body.get('requests', 1))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'requests must be an integer'}), 400
+        if body.get('reset'):
+            profiler.reset()
+        profiler.arm(requests, torch_ops=body.get('torch'))
+        return jsonify(profiler.summary())
+    
+    @app.route('/api/profile/files/<path:filename>', methods=['GET'])
+    def profile_file(filename):
+        """Download a speedscope profile, Chrome trace or summary written by the profiler"""
+        if not app.config['PROFILE_ADMIN']:
+            return jsonify({'error': 'Profiling administration is disabled'}), 403
+        return send_from_directory(os.path.abspath(profiler.directory), filename)
+    
+    @app.route('/api/admission/stats', methods=['GET'])
+    def admission_stats():
+        """Running, queued, shed and expired requests of the admission queue"""
+        if admission is None:
+            return jsonify({'enabled': False})
+        return jsonify(dict(admission.stats(), enabled=True, pressure=admission.pressure))
+    
+    @app.route('/api/uploads/stats', methods=['GET'])
+    def upload_stats():
+        """Usage of the upload store"""
+        if upload_store is None:
+            return jsonify({'enabled': False})
+        return jsonify(dict(upload_store.stats(), enabled=True))
+    
+    @app.route('/api/cache/stats', methods=['GET'])
+    def cache_stats():
+        """Hit/miss counters of the detection result cache"""
+        if cache is None:
+            return jsonify({'enabled': False})
+        return jsonify(dict(cache.stats(), enabled=True))
+    
     return app 
\ No newline at end of file
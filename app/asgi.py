@@ -0,0 +1,415 @@
+import asyncio
+import contextvars
+import functools
+import io
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import parse_qs
+
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.formparser import parse_form_data
+from werkzeug.http import parse_accept_header
+
+from app import create_app
+from app.utils.admission import BULK, DeadlineExceeded, Overloaded, check_deadline, request_deadline
+from app.utils.detection_service import InvalidImageError, cache_allowed
+from app.utils.formats import FORMATS, encode_boxes, negotiate
+from app.utils.inference_options import parse_inference_options, with_classes
+from app.utils.metrics import ASGI_PENDING, REQUEST_SECONDS, current_request, end_request, stage, start_request
+
+
+class _BodyStream(io.RawIOBase):
+    """Request body read from a WSGI thread, pulled from the ASGI receive channel as it is consumed."""
+
+    def __init__(self, receive, loop):
+        self._receive = receive
+        self._loop = loop
+        self._chunk = b''
+        self._done = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._chunk and not self._done:
+            message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if message['type'] == 'http.disconnect':
+                self._done = True
+            else:
+                self._chunk = message.get('body', b'')
+                self._done = not message.get('more_body', False)
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
+
+
+class WsgiAdapter:
+    """
+    Serves a WSGI app under ASGI on a thread pool.
+
+    Each request runs on its own executor thread, so slow routes such as
+    video uploads never hold up health checks or other requests. The body
+    is streamed to the app as it arrives rather than buffered first, and
+    ``wsgi.input_terminated`` is set so chunked uploads without a
+    Content-Length can be read to their end.
+
+    Args:
+        wsgi_app (callable): The WSGI application
+        executor (ThreadPoolExecutor): Threads the requests run on
+    """
+
+    def __init__(self, wsgi_app, executor):
+        self.wsgi_app = wsgi_app
+        self.executor = executor
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+        loop = asyncio.get_running_loop()
+        environ = self.environ(scope, io.BufferedReader(_BodyStream(receive, loop)))
+
+        def send_sync(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        await loop.run_in_executor(self.executor, contextvars.copy_context().run, self._run, environ, send_sync)
+
+    @staticmethod
+    def environ(scope, body):
+        """WSGI environ of an ASGI HTTP scope."""
+        script_name = scope.get('root_path', '').encode('utf8').decode('latin1')
+        path_info = scope['path'].encode('utf8').decode('latin1')
+        if path_info.startswith(script_name):
+            path_info = path_info[len(script_name):]
+        server = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': script_name,
+            'PATH_INFO': path_info,
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            # The stream ends with the body, so it is safe to read without a Content-Length
+            'wsgi.input_terminated': True,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False
+        }
+        if scope.get('client'):
+            environ['REMOTE_ADDR'] = scope['client'][0]
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin1').upper().replace('-', '_')
+            if name not in ('CONTENT_LENGTH', 'CONTENT_TYPE'):
+                name = f"HTTP_{name}"
+            value = value.decode('latin1')
+            environ[name] = f"{environ[name]},{value}" if name in environ else value
+        return environ
+
+    def _run(self, environ, send):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info is not None and response.get('sent'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['start'] = {
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers]
+            }
+
+        output = self.wsgi_app(environ, start_response)
+        try:
+            for chunk in output:
+                if not chunk:
+                    continue
+                if not response.get('sent'):
+                    response['sent'] = True
+                    send(response['start'])
+                send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            close = getattr(output, 'close', None)
+            if close is not None:
+                close()
+        if not response.get('sent'):
+            send(response['start'])
+        send({'type': 'http.response.body', 'body': b''})
+
+
+class AsyncDetectionApp:
+    """
+    ASGI front end for the Flask app.
+
+    ``POST /api/detect`` is served natively: the upload is read without
+    blocking the event loop, multipart parsing runs on the default executor
+    and detection runs on a bounded inference executor. When the inference
+    queue is full the request is rejected with 503 and ``Retry-After``
+    instead of queueing more work. Requests wait for a BULK slot in the
+    app's admission queue like the Flask API routes, so interactive
+    ``/detect`` requests go first and both share one pressure signal. Every other route is passed through to
+    the WSGI app, on a pool of ``ASGI_WSGI_THREADS`` threads.
+    """
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi_executor = ThreadPoolExecutor(
+            max_workers=flask_app.config['ASGI_WSGI_THREADS'],
+            thread_name_prefix='yolo-wsgi'
+        )
+        self.wsgi_app = WsgiAdapter(flask_app, self.wsgi_executor)
+        self.registry = flask_app.extensions['yolo_models']
+        self.profiler = flask_app.extensions['yolo_profiler']
+        self.upload_store = flask_app.extensions.get('upload_store')
+        self.max_content_length = flask_app.config['MAX_CONTENT_LENGTH']
+        self.max_pending = flask_app.config['ASGI_MAX_PENDING']
+        self.retry_after = flask_app.config['ASGI_RETRY_AFTER']
+        self.degrade_pressure = flask_app.config['DEGRADE_PRESSURE']
+        self.degrade_imgsz = flask_app.config['DEGRADE_IMGSZ']
+        self.max_imgsz = flask_app.config['YOLO_MAX_IMGSZ']
+        self.executor = ThreadPoolExecutor(
+            max_workers=flask_app.config['ASGI_INFERENCE_THREADS'],
+            thread_name_prefix='yolo-inference'
+        )
+        self.admission = flask_app.extensions.get('yolo_admission')
+        self.admission_executor = None
+        if self.admission is not None:
+            # Waiting for a slot blocks, one thread per request the queue can hold
+            self.admission_executor = ThreadPoolExecutor(
+                max_workers=self.admission.max_concurrent + self.admission.max_queue,
+                thread_name_prefix='yolo-admission'
+            )
+        self.pending = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http' and scope['method'] == 'POST' and scope['path'] == '/api/detect':
+            timings, token = start_request()
+            capture = self.profiler.start('api_detect')
+            try:
+                await self._detect(scope, receive, send)
+            finally:
+                if capture is not None:
+                    capture.stop()
+                REQUEST_SECONDS.labels('api_detect').observe(timings.elapsed())
+                end_request(token)
+        else:
+            await self.wsgi_app(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                self.wsgi_executor.shutdown(wait=True)
+                if self.admission_executor is not None:
+                    self.admission_executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _detect(self, scope, receive, send):
+        headers = {key.decode('latin-1'): value.decode('latin-1') for key, value in scope['headers']}
+        content_length = int(headers.get('content-length') or 0)
+        if content_length > self.max_content_length:
+            return await self._respond(send, 413, {'error': 'File too large'})
+
+        try:
+            deadline = request_deadline(
+                current_request().start,
+                headers.get('x-request-timeout-ms') or self.flask_app.config['REQUEST_TIMEOUT_MS']
+            )
+        except ValueError:
+            return await self._respond(send, 400, {'error': 'X-Request-Timeout-Ms must be a number'})
+
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        try:
+            fmt = negotiate(parse_accept_header(headers.get('accept'), MIMEAccept), query.get('format', [None])[0])
+        except ValueError as e:
+            return await self._respond(send, 400, {'error': str(e)})
+        if fmt is None:
+            return await self._respond(send, 406, {'error': f"Not acceptable, supported types: {', '.join(FORMATS.values())}"})
+        try:
+            name = self.registry.resolve(query.get('model', [None])[0])
+            options = parse_inference_options({key: values[0] for key, values in query.items()}, self.max_imgsz)
+        except ValueError as e:
+            return await self._respond(send, 400, {'error': str(e)})
+
+        # Fail fast, before spending time on the upload
+        if self.pending >= self.max_pending:
+            return await self._overloaded(send)
+
+        loop = asyncio.get_running_loop()
+        with stage('receive'):
+            body = await self._read_body(receive)
+            if body is not None:
+                files = await loop.run_in_executor(None, self._parse_files, body, headers)
+        if body is None:
+            return await self._respond(send, 413, {'error': 'File too large'})
+
+        if 'file' not in files:
+            return await self._respond(send, 400, {'error': 'No file part'})
+
+        file = files['file']
+
+        if file.filename == '':
+            return await self._respond(send, 400, {'error': 'No selected file'})
+
+        if not self._allowed_file(file.filename):
+            return await self._respond(send, 400, {'error': 'File type not allowed'})
+
+        # Slow uploads never hold an inference slot, only requests ready to run do
+        if self.pending >= self.max_pending:
+            return await self._overloaded(send)
+
+        use_cache = cache_allowed(query.get('cache', [None])[0], headers.get('cache-control'))
+        data = file.read()
+        if self.upload_store is not None:
+            self.upload_store.put(data, file.filename)
+
+        self.pending += 1
+        ASGI_PENDING.inc()
+        try:
+            await self._admit(deadline)
+            try:
+                # Under pressure, run at a reduced input size
+                degradations = self._degradations()
+                if degradations:
+                    options['imgsz'] = min(options.get('imgsz') or self.degrade_imgsz, self.degrade_imgsz)
+                # Run in a copy of this context so stages recorded on the executor thread reach this request
+                with self.registry.acquire(name) as model:
+                    detect = model.service.detect_bytes if fmt == 'json' else model.service.detect_boxes
+                    try:
+                        detect = functools.partial(detect, **with_classes(options, model.engine.names))
+                    except ValueError as e:
+                        return await self._respond(send, 400, {'error': str(e)})
+                    results, cache_status = await loop.run_in_executor(
+                        self.executor,
+                        contextvars.copy_context().run,
+                        self._run_before_deadline,
+                        deadline,
+                        detect,
+                        data,
+                        self.flask_app.config['YOLO_CONF'],
+                        use_cache
+                    )
+            finally:
+                if self.admission is not None:
+                    self.admission.release()
+        except Overloaded:
+            return await self._overloaded(send)
+        except InvalidImageError as e:
+            return await self._respond(send, 400, {'error': str(e)})
+        except DeadlineExceeded as e:
+            return await self._respond(send, 504, {'error': str(e)})
+        finally:
+            self.pending -= 1
+            ASGI_PENDING.dec()
+
+        extra_headers = [(b'x-cache', cache_status.encode()), (b'x-model', model.name.encode()), (b'vary', b'Accept')]
+        if degradations:
+            extra_headers.append((b'x-degraded', ', '.join(degradations).encode()))
+        if fmt == 'json':
+            payload = {'success': True, 'detections': results}
+            if degradations:
+                payload['degraded'] = degradations
+            return await self._respond(send, 200, payload, extra_headers)
+
+        with stage('serialize'):
+            body, mimetype, format_headers = encode_boxes(results, model.engine.names, fmt)
+        extra_headers += [(name.lower().encode(), value.encode()) for name, value in format_headers.items()]
+        await self._send(send, 200, body, mimetype.encode(), extra_headers)
+
+    async def _admit(self, deadline):
+        """Wait for a BULK slot in the shared admission queue without blocking the event loop."""
+        if self.admission is None:
+            return
+        future = self.admission_executor.submit(self.admission.acquire, BULK, deadline)
+        try:
+            await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # The client went away while queued, hand the slot back once it is granted
+            future.add_done_callback(
+                lambda done: None if done.cancelled() or done.exception() else self.admission.release()
+            )
+            raise
+
+    def _degradations(self):
+        """Degradations to apply, from the admission queue's pressure when admission control is on."""
+        if self.degrade_pressure <= 0:
+            return []
+        pressure = self.admission.pressure if self.admission is not None else self.pending / self.max_pending
+        return [f"imgsz={self.degrade_imgsz}"] if pressure >= self.degrade_pressure else []
+
+    @staticmethod
+    def _run_before_deadline(deadline, detect, *args):
+        # Requests whose client has given up while queued for the executor never reach the model
+        check_deadline(deadline)
+        return detect(*args)
+
+    async def _read_body(self, receive):
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return b''
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > self.max_content_length:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body', False):
+                return b''.join(chunks)
+
+    def _parse_files(self, body, headers):
+        environ = {
+            'REQUEST_METHOD': 'POST',
+            'CONTENT_TYPE': headers.get('content-type', ''),
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': BytesIO(body)
+        }
+        _, _, files = parse_form_data(environ, max_content_length=self.max_content_length)
+        return files
+
+    def _allowed_file(self, filename):
+        return '.' in filename and \
+               filename.rsplit('.', 1)[1].lower() in self.flask_app.config['ALLOWED_EXTENSIONS']
+
+    async def _overloaded(self, send):
+        await self._respond(send, 503, {'error': 'Server busy, retry later'},
+                            [(b'retry-after', str(self.retry_after).encode())])
+
+    async def _respond(self, send, status, payload, extra_headers=()):
+        with stage('serialize'):
+            body = json.dumps(payload).encode()
+        await self._send(send, status, body, b'application/json', extra_headers)
+
+    async def _send(self, send, status, body, content_type, extra_headers=()):
+        headers = [
+            (b'content-type', content_type),
+            (b'content-length', str(len(body)).encode()),
+            *extra_headers
+        ]
+        timings = current_request()
+        if timings is not None:
+            headers.append((b'server-timing', timings.server_timing().encode()))
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': headers
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+
+def create_asgi_app(config_name=None):
+    """Create the ASGI application, e.g. ``uvicorn --factory app.asgi:create_asgi_app``."""
+    return AsyncDetectionApp(create_app(config_name or os.getenv('FLASK_ENV', 'default')))
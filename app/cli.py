@@ -0,0 +1,206 @@
+import json
+import os
+import sys
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+
+def register_commands(app):
+    """Attach the model maintenance commands to the app's ``flask`` CLI."""
+    app.cli.add_command(quantize_command)
+    app.cli.add_command(quantization_report_command)
+    app.cli.add_command(benchmark_group)
+
+
+def _int_list(value):
+    return [int(item) for item in value.split(',') if item]
+
+
+def _size_list(value):
+    return [tuple(int(side) for side in item.split('x')) for item in value.split(',') if item]
+
+
+@click.command('quantize')
+@click.option('--mode', type=click.Choice(['dynamic', 'static']), default='dynamic', show_default=True)
+@click.option('--calibration-dir', type=click.Path(exists=True, file_okay=False),
+              help='Sample images for static calibration.')
+@with_appcontext
+def quantize_command(mode, calibration_dir):
+    """Build (or reuse) the cached INT8 ONNX model for YOLO_MODEL."""
+    from app.utils.quantization import quantize_model
+
+    config = current_app.config
+    path = quantize_model(
+        config['YOLO_MODEL'],
+        mode=mode,
+        calibration_dir=calibration_dir or config['QUANT_CALIBRATION_DIR'],
+        cache_dir=config['ONNX_CACHE_DIR'],
+        imgsz=config['YOLO_IMGSZ']
+    )
+    click.echo(path)
+
+
+@click.command('quantization-report')
+@click.option('--images', 'images_dir', type=click.Path(exists=True, file_okay=False), required=True,
+              help='Images to compare FP32 and INT8 detections on.')
+@click.option('--mode', type=click.Choice(['dynamic', 'static']), default='dynamic', show_default=True)
+@click.option('--calibration-dir', type=click.Path(exists=True, file_okay=False),
+              help='Sample images for static calibration, defaults to --images.')
+@click.option('--output', type=click.Path(dir_okay=False), help='Write the full JSON report here.')
+@with_appcontext
+def quantization_report_command(images_dir, mode, calibration_dir, output):
+    """Compare INT8 against FP32: box agreement and per-image latency."""
+    from app.utils.onnx_backend import OnnxBackend
+    from app.utils.quantization import compare_models, list_images
+
+    config = current_app.config
+    options = {
+        'cache_dir': config['ONNX_CACHE_DIR'],
+        'imgsz': config['YOLO_IMGSZ'],
+        'intra_op_threads': config['ONNX_INTRA_OP_THREADS'],
+        'inter_op_threads': config['ONNX_INTER_OP_THREADS']
+    }
+    reference = OnnxBackend(config['YOLO_MODEL'], **options)
+    candidate = OnnxBackend(
+        config['YOLO_MODEL'],
+        quantization=mode,
+        calibration_dir=calibration_dir or config['QUANT_CALIBRATION_DIR'] or images_dir,
+        **options
+    )
+
+    report = compare_models(reference, candidate, list_images(images_dir), conf=config['YOLO_CONF'])
+    report['summary']['mode'] = mode
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    for key, value in report['summary'].items():
+        click.echo(f"{key}: {value:.4f}" if isinstance(value, float) else f"{key}: {value}")
+
+
+@click.group('benchmark')
+def benchmark_group():
+    """Offline latency, throughput and cold-start benchmarks."""
+
+
+@benchmark_group.command('run')
+@click.option('--sizes', default='320x240,640x480,1280x720,1920x1080', show_default=True,
+              help='Image sizes (WxH) for single-image latency.')
+@click.option('--concurrency', default='1,2,4,8', show_default=True, help='Concurrent clients to try.')
+@click.option('--batch-sizes', default='1,4,8,16', show_default=True, help='Forward-pass sizes for /api/detect/batch.')
+@click.option('--requests', default=20, show_default=True, help='Timed requests per data point.')
+@click.option('--cold-start-runs', default=3, show_default=True, help='Fresh processes to time, 0 skips.')
+@click.option('--output', type=click.Path(dir_okay=False), help='Write the JSON results here.')
+@click.option('--baseline', type=click.Path(dir_okay=False),
+              help='Compare against this results file and fail on regressions.')
+@click.option('--tolerance', type=float, help='Allowed relative slowdown, defaults to BENCHMARK_TOLERANCE.')
+@with_appcontext
+def benchmark_run_command(sizes, concurrency, batch_sizes, requests, cold_start_runs, output, baseline, tolerance):
+    """Benchmark the app created by create_app for the current FLASK_ENV."""
+    from app.utils.benchmark import run_benchmarks
+
+    app = current_app._get_current_object()
+    # Measure serving, not the background warm-up
+    app.extensions['yolo_loader'].wait_ready(timeout=300)
+
+    report = run_benchmarks(
+        app,
+        os.getenv('FLASK_ENV', 'default'),
+        sizes=_size_list(sizes),
+        concurrency=_int_list(concurrency),
+        batch_sizes=_int_list(batch_sizes),
+        requests=requests,
+        cold_start_runs=cold_start_runs
+    )
+
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    for name, group in report['results'].items():
+        for key, summary in group.items():
+            if isinstance(summary, dict):
+                values = ', '.join(f"{k}={v:.2f}" for k, v in summary.items() if isinstance(v, float))
+                click.echo(f"{name}[{key}]: {values}")
+            else:
+                click.echo(f"{name}.{key}: {summary:.2f}")
+
+    if baseline:
+        _gate(baseline, report, tolerance)
+
+
+@benchmark_group.command('autotune')
+@click.option('--workers', default='', help='Worker process counts to try, powers of two up to the CPUs by default.')
+@click.option('--threads', default='', help='Intra-op threads per worker to try, same default.')
+@click.option('--size', default='640x480', show_default=True, help='Image size (WxH) to predict on.')
+@click.option('--seconds', default=10.0, show_default=True, help='Measured time per combination.')
+@click.option('--pinning', type=click.Choice(['off', 'on', 'both']), default='off', show_default=True,
+              help='Pin workers to their own cores.')
+@click.option('--oversubscribe', is_flag=True, help='Also try more threads in total than there are CPUs.')
+@click.option('--output', type=click.Path(dir_okay=False), help='Write the JSON results here.')
+@with_appcontext
+def benchmark_autotune_command(workers, threads, size, seconds, pinning, oversubscribe, output):
+    """Measure throughput across worker and thread counts and print the best settings."""
+    from app.utils.benchmark import bench_threads, thread_combinations
+
+    cpus = current_app.extensions['yolo_cpu_policy'].cpus
+    combinations = thread_combinations(cpus, _int_list(workers), _int_list(threads), oversubscribe=oversubscribe)
+    if not combinations:
+        raise click.ClickException(f"No combination fits in {cpus} CPUs, pass --oversubscribe to try anyway")
+
+    results = []
+    for pin in {'off': [False], 'on': [True], 'both': [False, True]}[pinning]:
+        results += bench_threads(os.getenv('FLASK_ENV', 'default'), combinations, size=_size_list(size)[0],
+                                 seconds=seconds, pin=pin)
+    results.sort(key=lambda result: result['images_per_second'], reverse=True)
+
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump({'cpus': cpus, 'results': results}, f, indent=2)
+
+    click.echo(f"{'workers':>7} {'threads':>7} {'pin':>5} {'images/s':>9} {'p50_ms':>8} {'p95_ms':>8}")
+    for result in results:
+        click.echo(f"{result['workers']:>7} {result['threads']:>7} {str(result['pin']).lower():>5} "
+                   f"{result['images_per_second']:>9.2f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f}")
+    best = results[0]
+    click.echo(f"Best on {cpus} CPUs: WEB_CONCURRENCY={best['workers']} TORCH_THREADS={best['threads']} "
+               f"CPU_PINNING={str(best['pin']).lower()}")
+
+
+@benchmark_group.command('compare')
+@click.argument('current', type=click.Path(exists=True, dir_okay=False))
+@click.option('--baseline', type=click.Path(dir_okay=False), help='Defaults to BENCHMARK_BASELINE.')
+@click.option('--tolerance', type=float, help='Allowed relative slowdown, defaults to BENCHMARK_TOLERANCE.')
+@with_appcontext
+def benchmark_compare_command(current, baseline, tolerance):
+    """Fail if a stored results file regressed against the baseline."""
+    with open(current) as f:
+        report = json.load(f)
+    _gate(baseline, report, tolerance)
+
+
+def _gate(baseline, report, tolerance):
+    """Print the comparison and exit non-zero on any regression."""
+    from app.utils.benchmark import compare_results
+
+    config = current_app.config
+    baseline = baseline or config['BENCHMARK_BASELINE']
+    tolerance = config['BENCHMARK_TOLERANCE'] if tolerance is None else tolerance
+    if not os.path.exists(baseline):
+        raise click.ClickException(f"Baseline not found: {baseline}")
+    with open(baseline) as f:
+        rows = compare_results(json.load(f), report, tolerance=tolerance)
+
+    regressions = [row for row in rows if row['regression']]
+    for row in rows:
+        flag = 'REGRESSION' if row['regression'] else 'ok'
+        click.echo(f"{flag:>10}  {row['metric']}: {row['baseline']:.2f} -> {row['current']:.2f} "
+                   f"({row['change'] * 100:+.1f}%)")
+    click.echo(f"{len(regressions)} regression(s) in {len(rows)} metrics, tolerance {tolerance:.0%}")
+    if regressions:
+        sys.exit(1)
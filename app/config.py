@@ -12,8 +12,84 @@ class Config:
     UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'app/static/uploads')
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB max-length
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+    UPLOAD_SPOOL_MAX_MEMORY = int(os.getenv('UPLOAD_SPOOL_MAX_MEMORY', 1024 * 1024))  # larger uploads spool to a temp file
+    UPLOAD_STORE_ENABLED = os.getenv('UPLOAD_STORE_ENABLED', 'false').lower() in ('1', 'true', 'yes')  # keep uploads in UPLOAD_FOLDER
+    UPLOAD_STORE_MAX_BYTES = int(os.getenv('UPLOAD_STORE_MAX_BYTES', 1024 * 1024 * 1024))  # 1GB kept at most
+    UPLOAD_STORE_MAX_AGE = float(os.getenv('UPLOAD_STORE_MAX_AGE', 7 * 24 * 3600))  # seconds
+    UPLOAD_STORE_ASYNC = os.getenv('UPLOAD_STORE_ASYNC', 'true').lower() in ('1', 'true', 'yes')  # write off the request thread
+    UPLOAD_STORE_QUEUE_SIZE = int(os.getenv('UPLOAD_STORE_QUEUE_SIZE', 64))  # uploads waiting for the writer before new ones are skipped
+    UPLOAD_STORE_EVICT_INTERVAL = float(os.getenv('UPLOAD_STORE_EVICT_INTERVAL', 60))  # seconds
+    BATCH_MAX_CONTENT_LENGTH = int(os.getenv('BATCH_MAX_CONTENT_LENGTH', 512 * 1024 * 1024))  # 512MB per batch request
+    BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', 8))  # images per forward pass in /api/detect/batch
+    VIDEO_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'webm', 'mjpeg', 'mjpg'}
+    VIDEO_MAX_CONTENT_LENGTH = int(os.getenv('VIDEO_MAX_CONTENT_LENGTH', 1024 * 1024 * 1024))  # 1GB per video
+    VIDEO_FRAME_STRIDE = int(os.getenv('VIDEO_FRAME_STRIDE', 1))  # run inference on every Nth frame
+    TILED_MAX_CONTENT_LENGTH = int(os.getenv('TILED_MAX_CONTENT_LENGTH', 256 * 1024 * 1024))  # 256MB per tiled image
+    TILE_SIZE = int(os.getenv('TILE_SIZE', 640))  # tile side in pixels
+    TILE_OVERLAP = float(os.getenv('TILE_OVERLAP', 0.2))  # fraction of a tile shared with its neighbour
+    TILE_BATCH_SIZE = int(os.getenv('TILE_BATCH_SIZE', 8))  # tiles per forward pass
+    TILE_IOU = float(os.getenv('TILE_IOU', 0.5))  # overlap above which duplicate boxes across tiles are merged
+    JOBS_ENABLED = os.getenv('JOBS_ENABLED', 'true').lower() in ('1', 'true', 'yes')  # background jobs under /api/jobs
+    JOBS_DIR = os.getenv('JOBS_DIR', 'jobs')  # job database, inputs and results
+    JOBS_MAX_CONCURRENT = int(os.getenv('JOBS_MAX_CONCURRENT', 1))  # jobs running at once per node, only one process runs them
+    JOBS_MAX_CONTENT_LENGTH = int(os.getenv('JOBS_MAX_CONTENT_LENGTH', 2 * 1024 * 1024 * 1024))  # 2GB per job
+    JOBS_POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', 1))  # seconds between looks for queued jobs and progress saves
+    JOBS_STALE_AFTER = float(os.getenv('JOBS_STALE_AFTER', 60))  # seconds without heartbeat before a running job is requeued
+    JOBS_MAX_AGE = float(os.getenv('JOBS_MAX_AGE', 7 * 24 * 3600))  # seconds finished jobs and their results are kept
+    ANNOTATION_FORMAT = os.getenv('ANNOTATION_FORMAT', 'jpeg')  # 'jpeg' or 'webp'
+    ANNOTATION_QUALITY = int(os.getenv('ANNOTATION_QUALITY', 90))
     YOLO_MODEL = os.getenv('YOLO_MODEL', 'yolov8n.pt')
     YOLO_CONF = float(os.getenv('YOLO_CONF', 0.25))
+    YOLO_MODELS = os.getenv('YOLO_MODELS', '')  # more selectable models, 'name=weights,...'
+    YOLO_MODEL_MEMORY_MB = float(os.getenv('YOLO_MODEL_MEMORY_MB', 0))  # 0 keeps every loaded model
+    YOLO_CASCADE = os.getenv('YOLO_CASCADE', '')  # 'small,large' model names served as ?model=cascade
+    YOLO_CASCADE_CONF = float(os.getenv('YOLO_CASCADE_CONF', 0.5))  # escalate when a detection is less confident
+    YOLO_MODEL_ADMIN = os.getenv('YOLO_MODEL_ADMIN', 'false').lower() in ('1', 'true', 'yes')  # allow PUT /api/models/<name>
+    YOLO_IMGSZ = int(os.getenv('YOLO_IMGSZ', 640))
+    YOLO_MAX_IMGSZ = int(os.getenv('YOLO_MAX_IMGSZ', 1280))  # largest ?imgsz= a request may ask for
+    YOLO_IOU = float(os.getenv('YOLO_IOU', 0.7))  # NMS IoU threshold
+    YOLO_MAX_DET = int(os.getenv('YOLO_MAX_DET', 300))  # most detections per image
+    YOLO_CLASSES = os.getenv('YOLO_CLASSES', '')  # comma-separated class names or ids to keep, empty keeps all
+    YOLO_HALF = os.getenv('YOLO_HALF', 'false').lower() in ('1', 'true', 'yes')  # FP16 inference, CUDA only
+    DECODE_REDUCED = os.getenv('DECODE_REDUCED', 'true').lower() in ('1', 'true', 'yes')  # decode large JPEGs at 1/2, 1/4 or 1/8 scale
+    YOLO_LOAD_MODE = os.getenv('YOLO_LOAD_MODE', 'background')  # 'lazy', 'background' or 'preload'
+    YOLO_WARMUP_SIZES = [int(size) for size in os.getenv('YOLO_WARMUP_SIZES', '640').split(',') if size]
+    YOLO_BACKEND = os.getenv('YOLO_BACKEND', 'torch')  # 'torch' or 'onnx'
+    ONNX_CACHE_DIR = os.getenv('ONNX_CACHE_DIR', 'models')
+    ONNX_INTRA_OP_THREADS = int(os.getenv('ONNX_INTRA_OP_THREADS', 0))  # 0 follows CPU_POLICY, or lets ONNX Runtime decide without it
+    ONNX_INTER_OP_THREADS = int(os.getenv('ONNX_INTER_OP_THREADS', 1))
+    YOLO_QUANTIZATION = os.getenv('YOLO_QUANTIZATION')  # 'dynamic' or 'static' INT8, needs the onnx backend
+    QUANT_CALIBRATION_DIR = os.getenv('QUANT_CALIBRATION_DIR')  # sample images for static quantization
+    YOLO_BATCH_SIZE = int(os.getenv('YOLO_BATCH_SIZE', 1))  # 1 disables micro-batching
+    YOLO_BATCH_WAIT_MS = float(os.getenv('YOLO_BATCH_WAIT_MS', 10))
+    YOLO_WORKERS = int(os.getenv('YOLO_WORKERS', 0))  # 0 runs inference in the web process
+    YOLO_THREADS_PER_WORKER = int(os.getenv('YOLO_THREADS_PER_WORKER', 1))
+    YOLO_CHANNELS_LAST = os.getenv('YOLO_CHANNELS_LAST', 'true').lower() in ('1', 'true', 'yes')  # NHWC conv weights, torch backend
+    CPU_POLICY = os.getenv('CPU_POLICY', 'true').lower() in ('1', 'true', 'yes')  # set thread pools (and pinning) per serving process
+    WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 1))  # serving processes sharing the CPUs
+    TORCH_THREADS = int(os.getenv('TORCH_THREADS', 0))  # intra-op threads per process, 0 splits the available CPUs
+    TORCH_INTEROP_THREADS = int(os.getenv('TORCH_INTEROP_THREADS', 1))
+    CPU_PINNING = os.getenv('CPU_PINNING', 'false').lower() in ('1', 'true', 'yes')  # pin each gunicorn worker to its own cores
+    DETECTION_CACHE_SIZE = int(os.getenv('DETECTION_CACHE_SIZE', 1024))  # 0 disables the cache
+    DETECTION_CACHE_TTL = float(os.getenv('DETECTION_CACHE_TTL', 3600))
+    DETECTION_CACHE_DB = os.getenv('DETECTION_CACHE_DB')  # SQLite file for a persistent tier
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')  # speedscope profiles, Chrome traces and summary.json
+    PROFILE_REQUESTS = int(os.getenv('PROFILE_REQUESTS', 0))  # profile the first N detection requests, 0 for none
+    PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 5))  # time between Python stack samples
+    PROFILE_TORCH = os.getenv('PROFILE_TORCH', 'true').lower() in ('1', 'true', 'yes')  # torch profiler around forward passes
+    PROFILE_ADMIN = os.getenv('PROFILE_ADMIN', 'false').lower() in ('1', 'true', 'yes')  # allow POST /api/profile and file downloads
+    BENCHMARK_BASELINE = os.getenv('BENCHMARK_BASELINE', 'benchmarks/baseline.json')  # results file the gate compares to
+    BENCHMARK_TOLERANCE = float(os.getenv('BENCHMARK_TOLERANCE', 0.10))  # allowed relative slowdown
+    ADMISSION_MAX_CONCURRENT = int(os.getenv('ADMISSION_MAX_CONCURRENT', 4))  # requests in inference at once, 0 disables admission control
+    ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', 32))  # requests waiting for a slot before 503
+    ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', 1))  # seconds
+    REQUEST_TIMEOUT_MS = float(os.getenv('REQUEST_TIMEOUT_MS', 0))  # default deadline, 0 for none; X-Request-Timeout-Ms overrides
+    DEGRADE_PRESSURE = float(os.getenv('DEGRADE_PRESSURE', 0.5))  # share of admission capacity in use before degrading, 0 disables
+    DEGRADE_IMGSZ = int(os.getenv('DEGRADE_IMGSZ', 320))  # input size used while degraded
+    ASGI_INFERENCE_THREADS = int(os.getenv('ASGI_INFERENCE_THREADS', 2))
+    ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', 16))  # threads serving the routes passed to Flask
+    ASGI_MAX_PENDING = int(os.getenv('ASGI_MAX_PENDING', 32))  # requests queued for inference before 503
+    ASGI_RETRY_AFTER = int(os.getenv('ASGI_RETRY_AFTER', 1))  # seconds
     HOST = os.getenv('HOST', '0.0.0.0')
     PORT = int(os.getenv('PORT', 5000))
 
@@ -29,6 +105,9 @@ class TestingConfig(Config):
     """Testing configuration."""
     TESTING = True
     DEBUG = True
+    YOLO_LOAD_MODE = 'lazy'
+    JOBS_ENABLED = False
+    CPU_POLICY = False
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'tests', 'uploads')
 
 config = {
@@ -0,0 +1,166 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+# Priority classes, lower is served first
+INTERACTIVE = 0
+BULK = 1
+
+
+class Overloaded(Exception):
+    """Raised when the admission queue is full or a queued request was shed for a more important one."""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's deadline passes before it reaches inference."""
+
+
+def request_deadline(start, timeout_ms):
+    """
+    Absolute deadline of a request on the ``time.perf_counter`` clock.
+
+    Args:
+        start (float): perf_counter value when the request arrived
+        timeout_ms (float or str): Time budget in milliseconds, 0 or empty for none
+
+    Returns:
+        float or None: Deadline, None when the request has no budget
+
+    Raises:
+        ValueError: If timeout_ms is not a number
+    """
+    timeout_ms = float(timeout_ms or 0)
+    return start + timeout_ms / 1000 if timeout_ms > 0 else None
+
+
+def check_deadline(deadline):
+    """Raise DeadlineExceeded if the deadline has passed."""
+    if deadline is not None and time.perf_counter() >= deadline:
+        raise DeadlineExceeded('Deadline exceeded before inference')
+
+
+class _Ticket:
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+        self.shed = False
+
+
+class AdmissionController:
+    """
+    Concurrency limiter in front of inference with a bounded priority queue.
+
+    At most ``max_concurrent`` requests run at once and at most ``max_queue``
+    wait. Waiting requests are served by priority class, then in arrival
+    order. When the queue is full, a new request displaces the newest
+    waiting request of a lower class, otherwise it is rejected. A request
+    whose deadline passes while it waits is dropped without running.
+    """
+
+    def __init__(self, max_concurrent=4, max_queue=32):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._waiting = []  # heap of (priority, sequence, ticket)
+        self._running = 0
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._counters = {'admitted': 0, 'rejected': 0, 'shed': 0, 'expired': 0}
+
+    @property
+    def pressure(self):
+        """Share of running and queue capacity in use, from 0 to 1."""
+        with self._lock:
+            return (self._running + len(self._waiting)) / (self.max_concurrent + self.max_queue)
+
+    @contextmanager
+    def admit(self, priority=BULK, deadline=None):
+        """
+        Hold an inference slot for the enclosed block.
+
+        Args:
+            priority (int): INTERACTIVE or BULK
+            deadline (float, optional): perf_counter deadline, see request_deadline
+
+        Raises:
+            Overloaded: If the request cannot be queued or was shed
+            DeadlineExceeded: If the deadline passed before a slot was free
+        """
+        self.acquire(priority, deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self, priority=BULK, deadline=None):
+        """Wait for an inference slot, see ``admit``."""
+        try:
+            check_deadline(deadline)
+        except DeadlineExceeded:
+            with self._lock:
+                self._counters['expired'] += 1
+            raise
+
+        with self._lock:
+            if self._running < self.max_concurrent and not self._waiting:
+                self._running += 1
+                self._counters['admitted'] += 1
+                return
+            if len(self._waiting) >= self.max_queue:
+                self._shed_locked(priority)
+            ticket = _Ticket()
+            entry = (priority, next(self._sequence), ticket)
+            heapq.heappush(self._waiting, entry)
+
+        timeout = None if deadline is None else max(deadline - time.perf_counter(), 0)
+        ticket.event.wait(timeout)
+
+        with self._lock:
+            if ticket.shed:
+                raise Overloaded('Server busy, retry later')
+            if not ticket.granted:
+                # Timed out while waiting
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._counters['expired'] += 1
+                raise DeadlineExceeded('Deadline exceeded while queued')
+            self._counters['admitted'] += 1
+
+        try:
+            # Granted as the deadline ran out, give the slot to the next request
+            check_deadline(deadline)
+        except DeadlineExceeded:
+            with self._lock:
+                self._counters['admitted'] -= 1
+                self._counters['expired'] += 1
+            self.release()
+            raise
+
+    def release(self):
+        """Free a slot and hand it to the most important waiting request."""
+        with self._lock:
+            self._running -= 1
+            while self._waiting and self._running < self.max_concurrent:
+                _, _, ticket = heapq.heappop(self._waiting)
+                ticket.granted = True
+                self._running += 1
+                ticket.event.set()
+
+    def stats(self):
+        """Counters, running and queued requests."""
+        with self._lock:
+            return dict(self._counters, running=self._running, queued=len(self._waiting),
+                        max_concurrent=self.max_concurrent, max_queue=self.max_queue)
+
+    def _shed_locked(self, priority):
+        """Make room in a full queue by dropping the newest request of the lowest class below ``priority``."""
+        victim = max(self._waiting) if self._waiting else None
+        if victim is None or victim[0] <= priority:
+            self._counters['rejected'] += 1
+            raise Overloaded('Server busy, retry later')
+        self._waiting.remove(victim)
+        heapq.heapify(self._waiting)
+        victim[2].shed = True
+        victim[2].event.set()
+        self._counters['shed'] += 1
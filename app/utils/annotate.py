@@ -0,0 +1,98 @@
+import cv2
+import numpy as np
+
+ENCODINGS = {
+    'jpeg': ('.jpg', 'image/jpeg', cv2.IMWRITE_JPEG_QUALITY),
+    'webp': ('.webp', 'image/webp', cv2.IMWRITE_WEBP_QUALITY)
+}
+
+
+class AnnotationRenderer:
+    """
+    Draws detection boxes and labels onto an image.
+
+    Box outlines and label backgrounds are drawn with one OpenCV call each
+    for all boxes; only the label text is drawn per box. Label sizes are
+    measured once per class name, which works because every label is the
+    class name followed by a fixed-width "0.00" confidence.
+    """
+
+    def __init__(self, color=(0, 255, 0), text_color=(0, 0, 0), font_scale=0.5, thickness=2):
+        self.color = color
+        self.text_color = text_color
+        self.font_scale = font_scale
+        self.thickness = thickness
+        self._label_sizes = {}
+
+    def label_size(self, class_name):
+        """Width and height of a label for this class, cached per class name."""
+        size = self._label_sizes.get(class_name)
+        if size is None:
+            size, _ = cv2.getTextSize(f"{class_name} 0.00", cv2.FONT_HERSHEY_SIMPLEX,
+                                      self.font_scale, self.thickness)
+            self._label_sizes[class_name] = size
+        return size
+
+    def render(self, image, boxes, names):
+        """
+        Draw boxes on a copy of the image.
+
+        Args:
+            image (numpy.ndarray): BGR image
+            boxes (numpy.ndarray): (N, 6) rows of x1, y1, x2, y2, confidence, class_id
+            names (dict): Mapping of class ids to class names
+
+        Returns:
+            numpy.ndarray: Annotated copy of the image
+        """
+        canvas = image.copy()
+        boxes = np.asarray(boxes).reshape(-1, 6)
+        if not len(boxes):
+            return canvas
+
+        corners = boxes[:, :4].astype(np.int32)
+        x1, y1, x2, y2 = corners.T
+        class_names = [names[class_id] for class_id in boxes[:, 5].astype(np.int64).tolist()]
+        sizes = np.array([self.label_size(name) for name in class_names], dtype=np.int32).reshape(-1, 2)
+
+        # All outlines in one call
+        outlines = np.stack([
+            np.stack([x1, y1], axis=1), np.stack([x2, y1], axis=1),
+            np.stack([x2, y2], axis=1), np.stack([x1, y2], axis=1)
+        ], axis=1)
+        cv2.polylines(canvas, list(outlines), True, self.color, self.thickness)
+
+        # All label backgrounds in one call, just above each box
+        top = y1 - sizes[:, 1] - 10
+        right = x1 + sizes[:, 0]
+        backgrounds = np.stack([
+            np.stack([x1, top], axis=1), np.stack([right, top], axis=1),
+            np.stack([right, y1], axis=1), np.stack([x1, y1], axis=1)
+        ], axis=1)
+        cv2.fillPoly(canvas, list(backgrounds), self.color)
+
+        for name, confidence, x, y in zip(class_names, boxes[:, 4].tolist(), x1.tolist(), y1.tolist()):
+            cv2.putText(canvas, f"{name} {confidence:.2f}", (x, y - 5), cv2.FONT_HERSHEY_SIMPLEX,
+                        self.font_scale, self.text_color, self.thickness)
+        return canvas
+
+
+def encode_image(image, fmt='jpeg', quality=90):
+    """
+    Encode an image into an in-memory buffer.
+
+    Args:
+        image (numpy.ndarray): BGR image
+        fmt (str): 'jpeg' or 'webp'
+        quality (int): Encoder quality (1-100)
+
+    Returns:
+        tuple: (bytes, mimetype)
+    """
+    if fmt not in ENCODINGS:
+        raise ValueError(f"Unsupported image format: {fmt}")
+    extension, mimetype, quality_flag = ENCODINGS[fmt]
+    ok, buffer = cv2.imencode(extension, image, [quality_flag, int(quality)])
+    if not ok:
+        raise ValueError(f"Could not encode image as {fmt}")
+    return buffer.tobytes(), mimetype
@@ -0,0 +1,153 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from app.utils.image_io import letterbox, scale_boxes
+from app.utils.boxes import boxes_to_detections
+from app.utils.inference_options import options_key
+
+
+class BatchScheduler:
+    """
+    Collects concurrent detection requests into batched forward passes.
+
+    Handler threads call ``detect`` and block until their slice of the batch
+    is ready. A single worker thread drains the queue, flushing as soon as
+    ``max_batch_size`` requests are waiting or the oldest one has waited
+    ``max_wait_ms``.
+    """
+
+    def __init__(self, detector, max_batch_size=8, max_wait_ms=10, imgsz=640):
+        self.detector = detector
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.imgsz = imgsz
+        self._queue = queue.Queue()
+        self._closed = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, image, conf=0.25, **options):
+        """
+        Queue an image for detection.
+
+        Args:
+            image (numpy.ndarray): Decoded BGR image
+            conf (float): Confidence threshold (0-1)
+            **options: imgsz (defaults to the scheduler's), iou, max_det,
+                classes and half
+
+        Returns:
+            concurrent.futures.Future: Resolves to an (N, 6) box array in image coordinates
+        """
+        if self._closed.is_set():
+            raise RuntimeError('BatchScheduler is closed')
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((image, conf, future, options_key(dict(options, imgsz=options.get('imgsz') or self.imgsz))))
+        return future
+
+    def detect_boxes(self, image, conf=0.25, **options):
+        """Detect objects in an image and return the raw (N, 6) box array."""
+        return self.submit(image, conf, **options).result()
+
+    def detect(self, image, conf=0.25, **options):
+        """Detect objects in an image, same result format as YOLODetector.detect."""
+        return boxes_to_detections(self.detect_boxes(image, conf, **options), self.detector.names)
+
+    @property
+    def queue_depth(self):
+        """Requests waiting for the next batch."""
+        return self._queue.qsize()
+
+    @property
+    def names(self):
+        """Mapping of class ids to class names."""
+        return self.detector.names
+
+    def predict(self, images, conf=0.25, **options):
+        """Detect objects in several images and return one (N, 6) box array per image."""
+        futures = [self.submit(image, conf, **options) for image in images]
+        return [future.result() for future in futures]
+
+    def detect_batch(self, images, conf=0.25, **options):
+        """Detect objects in several images, same result format as YOLODetector.detect_batch."""
+        futures = [self.submit(image, conf, **options) for image in images]
+        return [boxes_to_detections(future.result(), self.detector.names) for future in futures]
+
+    def close(self):
+        """Stop the worker thread once queued requests have been served."""
+        self._closed.set()
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join()
+
+    def _ensure_worker(self):
+        # Started on first use rather than in __init__: a thread started in a
+        # pre-fork master does not exist in the forked workers
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='yolo-batcher', daemon=True)
+                    self._thread.start()
+
+    def _collect(self):
+        """Block for the first request, then gather more until the batch is full or the wait expires."""
+        first = self._queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Serve what we have, then let the loop see the sentinel again
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            self._process(batch)
+
+    def _process(self, batch):
+        # Drop requests whose caller gave up before we got to them
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        # Only requests with the same model options share a forward pass
+        groups = {}
+        for item in batch:
+            groups.setdefault(item[3], []).append(item)
+        for key, group in groups.items():
+            self._forward(group, dict(key))
+
+    def _forward(self, batch, options):
+        # One forward pass at the lowest threshold, each caller filters to its own
+        min_conf = min(conf for _, conf, _, _ in batch)
+        letterboxed = [letterbox(image, options['imgsz']) for image, _, _, _ in batch]
+
+        try:
+            batch_boxes = self.detector.predict([padded for padded, _, _ in letterboxed],
+                                                conf=min_conf, **options)
+        except Exception as e:
+            for _, _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        for (image, conf, future, _), (_, ratio, pad), boxes in zip(batch, letterboxed, batch_boxes):
+            boxes = boxes[boxes[:, 4] >= conf]
+            future.set_result(scale_boxes(boxes, ratio, pad, image.shape[:2]))
@@ -0,0 +1,423 @@
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import cv2
+import numpy as np
+
+# Metrics where a larger value is an improvement, everything else is lower-is-better
+HIGHER_IS_BETTER = ('images_per_second',)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Child process for cold-start runs: imports, app creation and first request
+COLD_START_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+from app.utils.benchmark import peak_rss_mb, synthetic_image
+app = create_app(sys.argv[1])
+created = time.perf_counter()
+client = app.test_client()
+response = client.post('/api/detect?cache=0', data={'file': (synthetic_image(640, 480, 'png', seed=0), 'cold.png')})
+first = time.perf_counter()
+print(json.dumps({
+    'status': response.status_code,
+    'create_app_seconds': created - start,
+    'first_request_seconds': first - created,
+    'total_seconds': first - start,
+    'peak_rss_mb': peak_rss_mb()
+}))
+'''
+
+# Child process of a thread tuning run: one serving process predicting in a
+# loop once all processes of the combination are loaded
+THREAD_TUNE_SCRIPT = '''
+import json, sys, time
+import cv2, numpy as np
+from app import create_app
+from app.utils.benchmark import synthetic_image
+config_name, index, width, height, seconds = sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4]), float(sys.argv[5])
+app = create_app(config_name)
+app.extensions['yolo_cpu_policy'].apply(index=index)
+detector = app.extensions['yolo_loader'].detector
+image = cv2.imdecode(np.frombuffer(synthetic_image(width, height, seed=index).getvalue(), np.uint8), cv2.IMREAD_COLOR)
+conf = app.config['YOLO_CONF']
+for _ in range(2):
+    detector.predict([image], conf=conf)
+print('ready', flush=True)
+sys.stdin.readline()
+latencies = []
+start = time.perf_counter()
+while time.perf_counter() - start < seconds:
+    began = time.perf_counter()
+    detector.predict([image], conf=conf)
+    latencies.append(time.perf_counter() - began)
+print(json.dumps({'latencies': latencies, 'elapsed': time.perf_counter() - start}))
+'''
+
+
+def synthetic_image(width, height, fmt='jpeg', seed=0):
+    """
+    Generate a reproducible test image with textured background and shapes.
+
+    Args:
+        width (int): Image width in pixels
+        height (int): Image height in pixels
+        fmt (str): 'jpeg' or 'png'
+        seed (int): Random seed, the same seed always gives the same bytes
+
+    Returns:
+        BytesIO: Encoded image
+    """
+    rng = np.random.default_rng(seed)
+    image = cv2.resize(rng.integers(0, 256, (max(height // 16, 1), max(width // 16, 1), 3), dtype=np.uint8),
+                       (width, height), interpolation=cv2.INTER_LINEAR)
+    for _ in range(12):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        w, h = int(rng.integers(width // 20 + 1, width // 4 + 2)), int(rng.integers(height // 20 + 1, height // 4 + 2))
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        cv2.rectangle(image, (x, y), (x + w, y + h), color, -1)
+    ok, encoded = cv2.imencode('.png' if fmt == 'png' else '.jpg', image)
+    if not ok:
+        raise ValueError(f"Could not encode synthetic image as {fmt}")
+    return BytesIO(encoded.tobytes())
+
+
+def summarize(latencies, elapsed=None, images=None):
+    """
+    Latency percentiles in milliseconds and, given the wall time, throughput.
+
+    Args:
+        latencies (list): Per-request latencies in seconds
+        elapsed (float, optional): Wall time of the whole run in seconds
+        images (int, optional): Images processed, defaults to the request count
+
+    Returns:
+        dict: p50/p95/p99/mean in ms, request count and images_per_second
+    """
+    samples = np.asarray(latencies, dtype=np.float64) * 1000
+    summary = {
+        'requests': len(samples),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'p99_ms': float(np.percentile(samples, 99)),
+        'mean_ms': float(samples.mean())
+    }
+    if elapsed:
+        summary['images_per_second'] = (images if images is not None else len(samples)) / elapsed
+    return summary
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MiB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def _post(client, path, data):
+    start = time.perf_counter()
+    response = client.post(path, data=data)
+    # Streamed (NDJSON) bodies only do their work while being read
+    response.get_data()
+    latency = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f"{path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return latency
+
+
+def bench_latency(app, sizes, requests=20, warmup=2):
+    """
+    Sequential single-image latency per image size, result cache bypassed.
+
+    Args:
+        app: Flask app from create_app
+        sizes (list): (width, height) tuples
+        requests (int): Timed requests per size
+        warmup (int): Untimed requests per size
+
+    Returns:
+        dict: Summary per 'WxH'
+    """
+    client = app.test_client()
+    results = {}
+    for width, height in sizes:
+        payload = synthetic_image(width, height, seed=width * height).getvalue()
+        latencies = []
+        for i in range(warmup + requests):
+            latency = _post(client, '/api/detect?cache=0', {'file': (BytesIO(payload), 'bench.jpg')})
+            if i >= warmup:
+                latencies.append(latency)
+        results[f"{width}x{height}"] = summarize(latencies)
+    return results
+
+
+def bench_concurrency(app, levels, requests=40, size=(640, 480)):
+    """
+    Throughput and latency with several clients in flight at once.
+
+    Args:
+        app: Flask app from create_app
+        levels (list): Numbers of concurrent clients
+        requests (int): Requests per level
+        size (tuple): (width, height) of the test image
+
+    Returns:
+        dict: Summary per concurrency level
+    """
+    payload = synthetic_image(*size, seed=1).getvalue()
+    local = threading.local()
+
+    def one(_):
+        # One test client per thread, they are not meant to be shared
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        return _post(local.client, '/api/detect?cache=0', {'file': (BytesIO(payload), 'bench.jpg')})
+
+    results = {}
+    for level in levels:
+        with ThreadPoolExecutor(max_workers=level) as executor:
+            list(executor.map(one, range(level)))  # warm up every thread
+            start = time.perf_counter()
+            latencies = list(executor.map(one, range(requests)))
+            elapsed = time.perf_counter() - start
+        results[str(level)] = summarize(latencies, elapsed)
+    return results
+
+
+def bench_batch_sizes(app, batch_sizes, images=16, size=(640, 480)):
+    """
+    Throughput of /api/detect/batch with different forward-pass sizes.
+
+    Args:
+        app: Flask app from create_app
+        batch_sizes (list): Values of BATCH_CHUNK_SIZE to try
+        images (int): Images per request
+        size (tuple): (width, height) of the test images
+
+    Returns:
+        dict: Summary per batch size, latency is per request of ``images`` images
+    """
+    client = app.test_client()
+    payloads = [synthetic_image(*size, seed=seed).getvalue() for seed in range(images)]
+    original = app.config['BATCH_CHUNK_SIZE']
+    results = {}
+    try:
+        for batch_size in batch_sizes:
+            app.config['BATCH_CHUNK_SIZE'] = batch_size
+            latencies = []
+            start = time.perf_counter()
+            for _ in range(3):
+                files = [(BytesIO(payload), f'{i}.jpg') for i, payload in enumerate(payloads)]
+                latencies.append(_post(client, '/api/detect/batch?cache=0', {'files': files}))
+            elapsed = time.perf_counter() - start
+            results[str(batch_size)] = summarize(latencies, elapsed, images=3 * images)
+    finally:
+        app.config['BATCH_CHUNK_SIZE'] = original
+    return results
+
+
+def bench_cold_start(config_name, runs=3):
+    """
+    Time from a fresh interpreter to the first answered request.
+
+    Args:
+        config_name (str): Config passed to create_app in the child process
+        runs (int): Fresh processes to start
+
+    Returns:
+        dict: Median of each timing across runs, and the largest peak RSS
+    """
+    samples = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, '-c', COLD_START_SCRIPT, config_name],
+            capture_output=True, text=True, check=True, cwd=PROJECT_ROOT
+        )
+        samples.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return {
+        'runs': runs,
+        'create_app_seconds': float(np.median([s['create_app_seconds'] for s in samples])),
+        'first_request_seconds': float(np.median([s['first_request_seconds'] for s in samples])),
+        'total_seconds': float(np.median([s['total_seconds'] for s in samples])),
+        'peak_rss_mb': max(s['peak_rss_mb'] for s in samples)
+    }
+
+
+def thread_combinations(cpus, workers=None, threads=None, oversubscribe=False):
+    """
+    (workers, threads) pairs worth measuring.
+
+    Args:
+        cpus (int): Available CPUs
+        workers (list, optional): Process counts, powers of two up to cpus by default
+        threads (list, optional): Threads per process, same default
+        oversubscribe (bool): Keep pairs with more threads in total than CPUs
+
+    Returns:
+        list: (workers, threads) tuples
+    """
+    powers = [2 ** exponent for exponent in range(cpus.bit_length()) if 2 ** exponent <= cpus]
+    return [
+        (count, per_worker)
+        for count in (workers or powers)
+        for per_worker in (threads or powers)
+        if oversubscribe or count * per_worker <= cpus
+    ]
+
+
+def _wait_ready(child):
+    for line in child.stdout:
+        if line.strip() == 'ready':
+            return
+    raise RuntimeError(f"Tuning process exited with code {child.wait()}")
+
+
+def bench_threads(config_name, combinations, size=(640, 480), seconds=10.0, pin=False):
+    """
+    Throughput of every worker and thread count combination.
+
+    Each combination starts its workers as separate processes with
+    WEB_CONCURRENCY, TORCH_THREADS and CPU_PINNING set, like gunicorn
+    workers, and measures them predicting at the same time.
+
+    Args:
+        config_name (str): Config passed to create_app in the child processes
+        combinations (list): (workers, threads) tuples
+        size (tuple): Width and height of the synthetic image
+        seconds (float): Measured time per combination
+        pin (bool): Pin each worker to its own cores
+
+    Returns:
+        list: One summary per combination with workers, threads and pin,
+            highest images_per_second first
+    """
+    results = []
+    for workers, threads in combinations:
+        env = dict(
+            os.environ,
+            WEB_CONCURRENCY=str(workers),
+            TORCH_THREADS=str(threads),
+            CPU_PINNING='true' if pin else 'false',
+            YOLO_LOAD_MODE='lazy',
+            JOBS_ENABLED='false'
+        )
+        with tempfile.TemporaryFile('w+') as errors:
+            children = [
+                subprocess.Popen(
+                    [sys.executable, '-c', THREAD_TUNE_SCRIPT, config_name, str(index),
+                     str(size[0]), str(size[1]), str(seconds)],
+                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=errors,
+                    text=True, cwd=PROJECT_ROOT, env=env
+                )
+                for index in range(workers)
+            ]
+            try:
+                for child in children:
+                    _wait_ready(child)
+                for child in children:
+                    child.stdin.write('go\n')
+                    child.stdin.flush()
+                samples = [json.loads(child.communicate()[0].strip().splitlines()[-1]) for child in children]
+            except Exception as e:
+                errors.seek(0)
+                raise RuntimeError(f"{workers} workers x {threads} threads failed: {e}\n{errors.read()[-2000:]}") from e
+            finally:
+                for child in children:
+                    if child.poll() is None:
+                        child.kill()
+
+        summary = summarize([latency for sample in samples for latency in sample['latencies']])
+        summary['images_per_second'] = sum(len(sample['latencies']) / sample['elapsed'] for sample in samples)
+        results.append(dict(summary, workers=workers, threads=threads, pin=pin))
+    return sorted(results, key=lambda result: result['images_per_second'], reverse=True)
+
+
+def run_benchmarks(app, config_name, sizes, concurrency, batch_sizes, requests=20, cold_start_runs=3):
+    """
+    Run the whole suite against an app and collect machine-readable results.
+
+    Returns:
+        dict: 'meta' describing the run and 'results' per benchmark
+    """
+    results = {
+        'latency': bench_latency(app, sizes, requests=requests),
+        'concurrency': bench_concurrency(app, concurrency, requests=requests * 2),
+        'batch': bench_batch_sizes(app, batch_sizes)
+    }
+    if cold_start_runs:
+        results['cold_start'] = bench_cold_start(config_name, runs=cold_start_runs)
+    results['process'] = {'peak_rss_mb': peak_rss_mb()}
+
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'config': config_name,
+            'model': app.config['YOLO_MODEL'],
+            'backend': app.config['YOLO_BACKEND'],
+            'batch_size': app.config['YOLO_BATCH_SIZE'],
+            'workers': app.config['YOLO_WORKERS']
+        },
+        'results': results
+    }
+
+
+def _flatten(results, prefix=''):
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from _flatten(value, path)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, value
+
+
+def compare_results(baseline, current, tolerance=0.10):
+    """
+    Compare a run with a stored baseline.
+
+    Only latency, throughput, timing and memory metrics are compared; counts
+    and settings are ignored. A metric regresses when it is worse than the
+    baseline by more than ``tolerance`` (relative).
+
+    Args:
+        baseline (dict): Output of run_benchmarks stored earlier
+        current (dict): Output of run_benchmarks for this build
+        tolerance (float): Allowed relative slowdown, 0.10 is 10%
+
+    Returns:
+        list: One dict per metric present in both runs with 'metric',
+            'baseline', 'current', 'change' (relative, positive is worse)
+            and 'regression'
+    """
+    base = dict(_flatten(baseline['results']))
+    rows = []
+    for metric, value in _flatten(current['results']):
+        name = metric.rsplit('.', 1)[-1]
+        if metric not in base or not (name.endswith(('_ms', '_seconds', '_mb')) or name in HIGHER_IS_BETTER):
+            continue
+        reference = base[metric]
+        if reference == 0:
+            continue
+        change = (value - reference) / reference
+        if name in HIGHER_IS_BETTER:
+            change = -change
+        rows.append({
+            'metric': metric,
+            'baseline': reference,
+            'current': value,
+            'change': change,
+            'regression': change > tolerance
+        })
+    return rows
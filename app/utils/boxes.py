@@ -0,0 +1,44 @@
+import numpy as np
+
+
+def box_iou(a, b):
+    """
+    Pairwise intersection over union of two sets of boxes.
+
+    Args:
+        a (numpy.ndarray): Array of shape (N, >=4), first columns are x1, y1, x2, y2
+        b (numpy.ndarray): Array of shape (M, >=4)
+
+    Returns:
+        numpy.ndarray: (N, M) IoU matrix
+    """
+    a = np.asarray(a, dtype=np.float32)[:, :4]
+    b = np.asarray(b, dtype=np.float32)[:, :4]
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def boxes_to_detections(boxes, names):
+    """
+    Convert an (N, 6) box array into the API detection format.
+
+    Args:
+        boxes (numpy.ndarray): Rows of x1, y1, x2, y2, confidence, class_id
+        names (dict): Mapping of class ids to class names
+
+    Returns:
+        list: List of dictionaries containing 'class', 'confidence', and 'bbox'
+    """
+    return [
+        {
+            'class': names[int(class_id)],
+            'confidence': float(confidence),
+            'bbox': [float(x1), float(y1), float(x2), float(y2)]
+        }
+        for x1, y1, x2, y2, confidence, class_id in boxes.tolist()
+    ]
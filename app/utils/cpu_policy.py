@@ -0,0 +1,166 @@
+import math
+import os
+import sys
+
+import cv2
+
+# Thread pools of the native libraries torch, numpy and OpenCV link against.
+# They read these once when loaded, so the values must be set before import.
+THREAD_ENV = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+CGROUP_V2_MAX = '/sys/fs/cgroup/cpu.max'
+CGROUP_V1_QUOTA = '/sys/fs/cgroup/cpu/cpu.cfs_quota_us'
+CGROUP_V1_PERIOD = '/sys/fs/cgroup/cpu/cpu.cfs_period_us'
+
+# (pid, policy) last applied, a forked child has to apply its own
+_applied = None
+
+
+def affinity_cores():
+    """CPU ids this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit(v2_path=CGROUP_V2_MAX, v1_quota_path=CGROUP_V1_QUOTA, v1_period_path=CGROUP_V1_PERIOD):
+    """
+    CPU time the container may use, in CPUs.
+
+    A quota of 150000us per 100000us period is a limit of 1.5 CPUs, even
+    when the affinity mask lists every core of the host.
+
+    Returns:
+        float or None: The limit, None without a quota
+    """
+    value = _read(v2_path)
+    if value:
+        quota, _, period = value.partition(' ')
+        if quota != 'max':
+            return int(quota) / int(period or 100000)
+        return None
+
+    quota, period = _read(v1_quota_path), _read(v1_period_path)
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def available_cpus(cores=None, limit=None):
+    """
+    CPUs this process can actually keep busy.
+
+    Args:
+        cores (list, optional): Affinity mask, defaults to this process's
+        limit (float, optional): cgroup limit, read from the cgroup files
+            when None
+
+    Returns:
+        int: The smaller of the affinity mask and the rounded up quota, at least 1
+    """
+    count = len(cores if cores is not None else affinity_cores())
+    limit = cgroup_cpu_limit() if limit is None else limit
+    if limit:
+        count = min(count, math.ceil(limit))
+    return max(count, 1)
+
+
+def thread_budget(processes, cpus=None):
+    """Intra-op threads per process when ``processes`` share the available CPUs."""
+    cpus = available_cpus() if cpus is None else cpus
+    return max(cpus // max(processes, 1), 1)
+
+
+class CpuPolicy:
+    """
+    How a serving process uses the CPU.
+
+    Every gunicorn worker runs its own torch intra-op pool, by default one
+    thread per core, so several workers oversubscribe the machine and spend
+    their time switching threads. The policy gives each of ``processes``
+    an equal share of the available CPUs, affinity mask and cgroup quota
+    taken into account, and can pin each to its own cores.
+
+    Args:
+        threads (int): Intra-op threads per process, 0 derives them from
+            the available CPUs
+        interop_threads (int): torch inter-op threads
+        processes (int): Processes sharing the CPUs, e.g. WEB_CONCURRENCY
+        pin (bool): Restrict each process to its own slice of cores
+        cores (list, optional): CPU ids to share, defaults to the affinity mask
+        cpus (int, optional): Usable CPUs, defaults to available_cpus()
+    """
+
+    def __init__(self, threads=0, interop_threads=1, processes=1, pin=False, cores=None, cpus=None):
+        self.cores = list(cores) if cores is not None else affinity_cores()
+        self.cpus = cpus or available_cpus(self.cores)
+        self.processes = max(processes, 1)
+        self.threads = threads or thread_budget(self.processes, self.cpus)
+        self.interop_threads = interop_threads
+        self.pin = pin
+
+    def cores_for(self, index):
+        """Cores of the ``index``-th process, wrapping around when they run out."""
+        count = len(self.cores)
+        start = (index % self.processes) * self.threads
+        return sorted({self.cores[(start + offset) % count] for offset in range(self.threads)})
+
+    def apply(self, index=None):
+        """
+        Apply the policy to this process.
+
+        Sets the thread environment variables for libraries loaded later,
+        OpenCV's pool and, if torch is already imported, torch's pools.
+
+        Args:
+            index (int, optional): Position of this process among
+                ``processes``, needed for pinning
+
+        Returns:
+            dict: The applied settings
+        """
+        global _applied
+        pinned = None
+        if self.pin and index is not None and hasattr(os, 'sched_setaffinity'):
+            pinned = self.cores_for(index)
+            os.sched_setaffinity(0, pinned)
+        for name in THREAD_ENV:
+            os.environ[name] = str(self.threads)
+        cv2.setNumThreads(self.threads)
+        _applied = (os.getpid(), self)
+
+        torch = sys.modules.get('torch')
+        if torch is not None:
+            self.apply_torch(torch)
+        return dict(self.status(), pinned_cores=pinned)
+
+    def apply_torch(self, torch):
+        torch.set_num_threads(self.threads)
+        try:
+            torch.set_num_interop_threads(self.interop_threads)
+        except RuntimeError:
+            # Only possible before the inter-op pool first runs, keep what it has
+            pass
+
+    def status(self):
+        return {
+            'cpus': self.cpus,
+            'processes': self.processes,
+            'threads': self.threads,
+            'interop_threads': self.interop_threads,
+            'pin': self.pin
+        }
+
+
+def apply_torch_policy(torch):
+    """Apply the policy this process applied before importing torch to torch itself."""
+    if _applied is not None and _applied[0] == os.getpid():
+        _applied[1].apply_torch(torch)
@@ -0,0 +1,142 @@
+import numpy as np
+
+from app.utils.boxes import boxes_to_detections
+from app.utils.image_io import decode_image, decode_image_reduced
+from app.utils.inference_options import options_tag, rescale_boxes, rescale_detections
+from app.utils.metrics import stage
+
+
+class InvalidImageError(ValueError):
+    """Raised when uploaded bytes cannot be decoded as an image."""
+
+
+def cache_allowed(cache_param=None, cache_control=None):
+    """
+    Check whether a request allows the result cache.
+
+    Args:
+        cache_param (str, optional): Value of the ``cache`` query/form parameter
+        cache_control (str, optional): Value of the Cache-Control header
+
+    Returns:
+        bool: False when the caller asked to bypass the cache
+    """
+    if cache_control and 'no-cache' in cache_control:
+        return False
+    return (cache_param or '1').lower() not in ('0', 'false', 'no')
+
+
+class DetectionService:
+    """
+    Single-image detection path shared by the WSGI routes and the ASGI adapter.
+
+    Wraps the inference engine (detector, batch scheduler or worker pool)
+    with the result cache so every front end serves identical results.
+
+    Args:
+        engine: Detector, batch scheduler or worker pool
+        model_name (str): Identifies the model in cache keys
+        cache: Optional detection result cache
+        decode_size (int, optional): Default model input size; large JPEGs
+            are decoded at reduced scale when they still cover it. None
+            always decodes at full size
+    """
+
+    def __init__(self, engine, model_name, cache=None, decode_size=None):
+        self.engine = engine
+        self.model_name = model_name
+        self.cache = cache
+        self.decode_size = decode_size
+
+    def detect_bytes(self, data, conf=0.25, use_cache=True, **options):
+        """
+        Detect objects in an encoded image.
+
+        Args:
+            data (bytes): Encoded image as uploaded
+            conf (float): Confidence threshold (0-1)
+            use_cache (bool): Whether the result cache may be used
+            **options: imgsz, iou, max_det, classes (ids) and half, see
+                YOLODetector.predict
+
+        Returns:
+            tuple: (list of detection dictionaries, cache status 'HIT', 'MISS' or 'BYPASS')
+
+        Raises:
+            InvalidImageError: If the bytes are not a readable image
+        """
+        use_cache = use_cache and self.cache is not None
+        if use_cache:
+            # Identical bytes with identical settings give identical detections
+            cache_key = self.cache.make_key(data, self.cache_name(options=options), conf)
+            results = self.cache.get(cache_key)
+            if results is not None:
+                return results, 'HIT'
+
+        image, scale = self.decode(data, options.get('imgsz'))
+        if options:
+            boxes = self.engine.predict([image], conf=conf, **options)[0]
+            results = boxes_to_detections(rescale_boxes(boxes, scale), self.engine.names)
+        else:
+            results = rescale_detections(self.engine.detect(image, conf=conf), scale)
+        if use_cache:
+            self.cache.set(cache_key, results)
+        return results, 'MISS' if use_cache else 'BYPASS'
+
+    def detect_boxes(self, data, conf=0.25, use_cache=True, **options):
+        """
+        Detect objects in an encoded image and keep the raw box array.
+
+        Used by the columnar response formats, which never build per-box
+        dictionaries. Cached separately from ``detect_bytes`` results.
+
+        Args:
+            data (bytes): Encoded image as uploaded
+            conf (float): Confidence threshold (0-1)
+            use_cache (bool): Whether the result cache may be used
+            **options: See detect_bytes
+
+        Returns:
+            tuple: (float32 array of shape (N, 6), cache status 'HIT', 'MISS' or 'BYPASS')
+
+        Raises:
+            InvalidImageError: If the bytes are not a readable image
+        """
+        use_cache = use_cache and self.cache is not None
+        if use_cache:
+            cache_key = self.cache.make_key(data, self.cache_name('boxes', options), conf)
+            rows = self.cache.get(cache_key)
+            if rows is not None:
+                return np.asarray(rows, dtype=np.float32).reshape(-1, 6), 'HIT'
+
+        image, scale = self.decode(data, options.get('imgsz'))
+        boxes = np.asarray(self.engine.predict([image], conf=conf, **options)[0], dtype=np.float32).reshape(-1, 6)
+        boxes = rescale_boxes(boxes, scale)
+        if use_cache:
+            self.cache.set(cache_key, boxes.tolist())
+        return boxes, 'MISS' if use_cache else 'BYPASS'
+
+    def cache_name(self, kind=None, options=None):
+        """Model part of a cache key, results with other model options are never shared."""
+        name = f"{self.model_name}:{kind}" if kind else self.model_name
+        tag = options_tag(options or {})
+        return f"{name}@{tag}" if tag else name
+
+    def decode(self, data, imgsz=None):
+        """
+        Decode an upload for inference, straight from memory.
+
+        Returns:
+            tuple: (BGR image, (x, y) factors mapping its coordinates to the full-size image)
+
+        Raises:
+            InvalidImageError: If the bytes are not a readable image
+        """
+        with stage('decode'):
+            if self.decode_size:
+                image, scale = decode_image_reduced(data, imgsz or self.decode_size)
+            else:
+                image, scale = decode_image(data), (1.0, 1.0)
+        if image is None:
+            raise InvalidImageError('Invalid image file')
+        return image, scale
@@ -0,0 +1,110 @@
+import json
+
+import numpy as np
+
+# Response formats for /api/detect, keyed by the name accepted in ?format=
+FORMATS = {
+    'json': 'application/json',
+    'compact': 'application/vnd.yolo.compact+json',
+    'msgpack': 'application/msgpack',
+    'binary': 'application/vnd.yolo.boxes'
+}
+
+# Other media types clients commonly send for the same formats
+ALIASES = {
+    'application/x-msgpack': 'msgpack',
+    'application/octet-stream': 'binary'
+}
+
+
+def negotiate(accept, format_param=None):
+    """
+    Pick the response format for a request.
+
+    Args:
+        accept (werkzeug.datastructures.MIMEAccept): Parsed Accept header
+        format_param (str, optional): Explicit ``format`` query parameter,
+            wins over the Accept header
+
+    Returns:
+        str or None: Format name, or None if nothing acceptable is offered
+
+    Raises:
+        ValueError: If format_param names an unknown format
+    """
+    if format_param:
+        if format_param not in FORMATS:
+            raise ValueError(f"Unsupported format, use one of: {', '.join(FORMATS)}")
+        return format_param
+
+    # JSON stays the default for clients that accept anything
+    offered = list(FORMATS.values()) + list(ALIASES)
+    if not accept or accept.best == '*/*':
+        return 'json'
+    best = accept.best_match(offered)
+    if best is None:
+        return None
+    return ALIASES.get(best) or next(name for name, mimetype in FORMATS.items() if mimetype == best)
+
+
+def class_table(class_ids, names):
+    """Names of the classes present, one lookup per distinct class rather than per box."""
+    return {str(class_id): names[class_id] for class_id in np.unique(class_ids).tolist()}
+
+
+def encode_boxes(boxes, names, fmt):
+    """
+    Serialize a box array into a columnar response body.
+
+    Nothing is built per box: columns are sliced from the array and either
+    converted in one ``tolist`` call or emitted as raw little-endian bytes.
+
+    Args:
+        boxes (numpy.ndarray): (N, 6) rows of x1, y1, x2, y2, confidence, class_id
+        names (dict): Mapping of class ids to class names
+        fmt (str): 'compact', 'msgpack' or 'binary'
+
+    Returns:
+        tuple: (body bytes, mimetype, dict of extra headers)
+
+    Layouts:
+        compact: JSON object of parallel arrays ``boxes`` (N x 4),
+            ``confidences``, ``class_ids`` and a ``classes`` id-to-name table
+        msgpack: map with ``count``, ``classes`` and ``boxes`` (float32,
+            N x 4), ``confidences`` (float32) and ``class_ids`` (uint16) as
+            little-endian binary
+        binary: N x 6 little-endian float32 rows as the body, the class
+            table in the ``X-Classes`` header as JSON
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+    class_ids = boxes[:, 5].astype(np.uint16)
+    classes = class_table(class_ids, names)
+    headers = {'X-Detections-Count': str(len(boxes))}
+
+    if fmt == 'compact':
+        body = json.dumps({
+            'success': True,
+            'count': len(boxes),
+            'boxes': boxes[:, :4].tolist(),
+            'confidences': boxes[:, 4].tolist(),
+            'class_ids': class_ids.tolist(),
+            'classes': classes
+        }, separators=(',', ':')).encode()
+    elif fmt == 'msgpack':
+        import msgpack
+
+        body = msgpack.packb({
+            'success': True,
+            'count': len(boxes),
+            'boxes': boxes[:, :4].astype('<f4').tobytes(),
+            'confidences': boxes[:, 4].astype('<f4').tobytes(),
+            'class_ids': class_ids.astype('<u2').tobytes(),
+            'classes': classes
+        })
+    elif fmt == 'binary':
+        body = boxes.astype('<f4').tobytes()
+        headers['X-Classes'] = json.dumps(classes, separators=(',', ':'))
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+    return body, FORMATS[fmt], headers
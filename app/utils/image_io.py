@@ -0,0 +1,125 @@
+from io import BytesIO
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+def decode_image(data, flags=cv2.IMREAD_COLOR):
+    """
+    Decode encoded image bytes into a BGR array without touching the disk.
+
+    Args:
+        data (bytes): Encoded image (PNG, JPEG, GIF, ...)
+        flags (int): OpenCV imread flags
+
+    Returns:
+        numpy.ndarray or None: Decoded image, or None if the data is not a readable image
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    if buf.size == 0:
+        return None
+
+    image = cv2.imdecode(buf, flags)
+    if image is not None:
+        return image
+
+    # Older OpenCV builds cannot decode GIF, fall back to Pillow (first frame only)
+    try:
+        with Image.open(BytesIO(data)) as pil_image:
+            return cv2.cvtColor(np.asarray(pil_image.convert('RGB')), cv2.COLOR_RGB2BGR)
+    except Exception:
+        return None
+
+
+def letterbox(image, new_shape=640, color=(114, 114, 114)):
+    """
+    Resize an image to fit a square canvas, keeping aspect ratio and padding the rest.
+
+    Args:
+        image (numpy.ndarray): BGR image
+        new_shape (int): Side of the output canvas in pixels
+        color (tuple): Padding color
+
+    Returns:
+        tuple: (padded image, scale ratio, (pad_x, pad_y))
+    """
+    height, width = image.shape[:2]
+    ratio = min(new_shape / height, new_shape / width)
+    resized_w, resized_h = int(round(width * ratio)), int(round(height * ratio))
+
+    if (resized_w, resized_h) != (width, height):
+        image = cv2.resize(image, (resized_w, resized_h), interpolation=cv2.INTER_LINEAR)
+
+    pad_x = (new_shape - resized_w) / 2
+    pad_y = (new_shape - resized_h) / 2
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    padded = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return padded, ratio, (left, top)
+
+
+def scale_boxes(boxes, ratio, pad, shape):
+    """
+    Map boxes from letterboxed coordinates back to the original image.
+
+    Args:
+        boxes (numpy.ndarray): Array of shape (N, >=4) whose first columns are x1, y1, x2, y2
+        ratio (float): Scale ratio returned by letterbox
+        pad (tuple): (pad_x, pad_y) returned by letterbox
+        shape (tuple): (height, width) of the original image
+
+    Returns:
+        numpy.ndarray: Copy of boxes with rescaled, clipped coordinates
+    """
+    boxes = np.array(boxes, dtype=np.float32, copy=True)
+    boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad[0]) / ratio).clip(0, shape[1])
+    boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad[1]) / ratio).clip(0, shape[0])
+    return boxes
+
+
+# libjpeg can decode straight to 1/2, 1/4 or 1/8 scale by skipping DCT coefficients
+REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+
+def jpeg_size(data):
+    """(width, height) from a JPEG header, or None for other formats."""
+    if data[:3] != b'\xff\xd8\xff':
+        return None
+    try:
+        # Pillow only parses the headers here, no pixels are decoded
+        with Image.open(BytesIO(data)) as pil_image:
+            return pil_image.size
+    except Exception:
+        return None
+
+
+def decode_image_reduced(data, target_size):
+    """
+    Decode an image no larger than needed for a model input of ``target_size``.
+
+    Large JPEGs are decoded at 1/2, 1/4 or 1/8 scale when the long side
+    still covers ``target_size``, which costs a fraction of a full decode
+    followed by a resize. Other formats are decoded at full size.
+
+    Args:
+        data (bytes): Encoded image
+        target_size (int): Model input size the image will be letterboxed to
+
+    Returns:
+        tuple: (image or None, (x, y) factors mapping decoded coordinates
+            back to the full-size image)
+    """
+    size = jpeg_size(data) if target_size else None
+    if size is not None:
+        for factor, flags in REDUCED_FLAGS:
+            if max(size) // factor >= target_size:
+                image = decode_image(data, flags)
+                if image is None:
+                    break
+                width, height = size
+                if (image.shape[1] > image.shape[0]) != (width > height):
+                    # EXIF orientation rotated the image while decoding
+                    width, height = height, width
+                return image, (width / image.shape[1], height / image.shape[0])
+    return decode_image(data), (1.0, 1.0)
@@ -0,0 +1,127 @@
+import numpy as np
+
+MAX_DET_LIMIT = 1000
+STRIDE = 32
+
+
+def parse_inference_options(params, max_imgsz=1280):
+    """
+    Read per-request inference options from query or form parameters.
+
+    Only options present in ``params`` are returned, so engine and config
+    defaults apply to the rest. Class filters are kept as the raw names or
+    ids until the model's classes are known, see resolve_classes.
+
+    Args:
+        params (werkzeug.datastructures.MultiDict or dict): Request parameters
+        max_imgsz (int): Largest input size a request may ask for
+
+    Returns:
+        dict: Subset of imgsz, iou, max_det, classes and half
+
+    Raises:
+        ValueError: If a value is malformed or out of range
+    """
+    options = {}
+    if params.get('imgsz'):
+        try:
+            imgsz = int(params['imgsz'])
+        except ValueError:
+            raise ValueError('imgsz must be an integer')
+        if not STRIDE <= imgsz <= max_imgsz:
+            raise ValueError(f"imgsz must be between {STRIDE} and {max_imgsz}")
+        # The network downsamples by 32, round up like ultralytics does
+        options['imgsz'] = -(-imgsz // STRIDE) * STRIDE
+    if params.get('iou'):
+        try:
+            iou = float(params['iou'])
+        except ValueError:
+            raise ValueError('iou must be a number')
+        if not 0 < iou <= 1:
+            raise ValueError('iou must be in (0, 1]')
+        options['iou'] = iou
+    if params.get('max_det'):
+        try:
+            max_det = int(params['max_det'])
+        except ValueError:
+            raise ValueError('max_det must be an integer')
+        if not 1 <= max_det <= MAX_DET_LIMIT:
+            raise ValueError(f"max_det must be between 1 and {MAX_DET_LIMIT}")
+        options['max_det'] = max_det
+    if params.get('classes'):
+        options['classes'] = tuple(token.strip() for token in params['classes'].split(',') if token.strip())
+    if params.get('half'):
+        options['half'] = params['half'].lower() in ('1', 'true', 'yes')
+    return options
+
+
+def resolve_classes(tokens, names):
+    """
+    Turn class names or ids into a sorted tuple of class ids.
+
+    Args:
+        tokens (iterable): Class names (case-insensitive) or numeric ids
+        names (dict): Mapping of class ids to class names of the model
+
+    Returns:
+        tuple: Class ids
+
+    Raises:
+        ValueError: If a class is not known to the model
+    """
+    by_name = {str(name).lower(): class_id for class_id, name in names.items()}
+    ids = set()
+    for token in tokens:
+        token = str(token).strip()
+        if token.isdigit() and int(token) in names:
+            ids.add(int(token))
+        elif token.lower() in by_name:
+            ids.add(by_name[token.lower()])
+        else:
+            raise ValueError(f"Unknown class: {token}")
+    return tuple(sorted(ids))
+
+
+def with_classes(options, names):
+    """Copy of options with the class filter resolved against the model's names."""
+    if not options.get('classes'):
+        return options
+    return dict(options, classes=resolve_classes(options['classes'], names))
+
+
+def options_key(options):
+    """Hashable, order-independent form of options, used for cache keys and batch grouping."""
+    return tuple(sorted((name, value) for name, value in options.items() if value is not None))
+
+
+def options_tag(options):
+    """Short text form of options for cache keys, empty when there are none."""
+    return ';'.join(f"{name}={value}" for name, value in options_key(options))
+
+
+def rescale_boxes(boxes, scale):
+    """
+    Map (N, >=4) boxes from a reduced decode back to original image coordinates.
+
+    Args:
+        boxes (numpy.ndarray): Rows whose first columns are x1, y1, x2, y2
+        scale (tuple): (x, y) factors from the reduced decode
+
+    Returns:
+        numpy.ndarray: Rescaled copy, or boxes unchanged when the scale is 1
+    """
+    if scale == (1.0, 1.0):
+        return boxes
+    boxes = np.array(boxes, dtype=np.float32, copy=True).reshape(-1, 6)
+    boxes[:, [0, 2]] *= scale[0]
+    boxes[:, [1, 3]] *= scale[1]
+    return boxes
+
+
+def rescale_detections(detections, scale):
+    """Same as rescale_boxes for detection dictionaries, modified in place."""
+    if scale != (1.0, 1.0):
+        for detection in detections:
+            x1, y1, x2, y2 = detection['bbox']
+            detection['bbox'] = [x1 * scale[0], y1 * scale[1], x2 * scale[0], y2 * scale[1]]
+    return detections
@@ -0,0 +1,419 @@
+import contextlib
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+RESULTS_FILE = 'results.ndjson'
+INPUT_DIR = 'input'
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job when its cancellation was requested."""
+
+
+class Job:
+    """
+    State of one job as stored in the database.
+
+    Handlers may set ``total`` once they know how many result lines the job
+    will produce; the runner persists it with the progress.
+    """
+
+    COLUMNS = ('id', 'kind', 'params', 'status', 'done', 'total', 'error', 'created', 'started', 'finished')
+
+    def __init__(self, root, id, kind, params, status=QUEUED, done=0, total=None, error=None, created=None,
+                 started=None, finished=None):
+        self.id = id
+        self.kind = kind
+        self.params = params
+        self.status = status
+        self.done = done
+        self.total = total
+        self.error = error
+        self.created = created
+        self.started = started
+        self.finished = finished
+        self.dir = os.path.join(root, id)
+
+    @property
+    def input_dir(self):
+        return os.path.join(self.dir, INPUT_DIR)
+
+    @property
+    def results_path(self):
+        return os.path.join(self.dir, RESULTS_FILE)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': {'done': self.done, 'total': self.total},
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished
+        }
+
+
+class JobStore:
+    """
+    Job state in a SQLite file plus one directory per job for inputs and results.
+
+    The database is the only shared state, so several processes can serve
+    the same job directory: a job is claimed by a single atomic update and
+    jobs survive restarts.
+
+    Args:
+        root (str): Directory holding ``jobs.db`` and the job directories
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.db_path = os.path.join(root, 'jobs.db')
+        self._db = None
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def create(self, kind, params, inputs=()):
+        """
+        Add a queued job.
+
+        Args:
+            kind (str): Handler that runs the job
+            params (dict): JSON-serializable job parameters
+            inputs (iterable): (filename, upload) pairs saved to the job's input
+                directory, uploads need a ``save(path)`` method
+
+        Returns:
+            Job: The queued job
+        """
+        job = Job(self.root, uuid.uuid4().hex, kind, params, created=time.time())
+        os.makedirs(job.input_dir)
+        try:
+            for filename, upload in inputs:
+                upload.save(os.path.join(job.input_dir, filename))
+            with self._lock:
+                db = self._connection()
+                db.execute(
+                    'INSERT INTO jobs (id, kind, params, status, done, created) VALUES (?, ?, ?, ?, 0, ?)',
+                    (job.id, kind, json.dumps(params), QUEUED, job.created)
+                )
+                db.commit()
+        except Exception:
+            shutil.rmtree(job.dir, ignore_errors=True)
+            raise
+        return job
+
+    def get(self, job_id):
+        """The job with this id, or None."""
+        with self._lock:
+            row = self._connection().execute(
+                f"SELECT {', '.join(Job.COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._job(row) if row else None
+
+    def list(self, status=None, limit=50):
+        """Most recent jobs first, optionally only those in one state."""
+        query = f"SELECT {', '.join(Job.COLUMNS)} FROM jobs"
+        args = ()
+        if status:
+            query += ' WHERE status = ?'
+            args = (status,)
+        with self._lock:
+            rows = self._connection().execute(query + ' ORDER BY created DESC LIMIT ?', args + (limit,)).fetchall()
+        return [self._job(row) for row in rows]
+
+    def claim(self, owner):
+        """
+        Take the oldest queued job for ``owner``.
+
+        Returns:
+            Job or None: The job, now running, None when nothing is queued
+        """
+        while True:
+            with self._lock:
+                db = self._connection()
+                row = db.execute('SELECT id FROM jobs WHERE status = ? ORDER BY created LIMIT 1', (QUEUED,)).fetchone()
+                if row is None:
+                    return None
+                now = time.time()
+                # Another process may have taken it since the SELECT
+                claimed = db.execute(
+                    'UPDATE jobs SET status = ?, owner = ?, started = ?, heartbeat = ?, done = 0 '
+                    'WHERE id = ? AND status = ?',
+                    (RUNNING, owner, now, now, row[0], QUEUED)
+                ).rowcount
+                db.commit()
+            if claimed:
+                return self.get(row[0])
+
+    def progress(self, job):
+        """Persist a running job's progress."""
+        with self._lock:
+            db = self._connection()
+            db.execute('UPDATE jobs SET done = ?, total = ?, heartbeat = ? WHERE id = ?',
+                       (job.done, job.total, time.time(), job.id))
+            db.commit()
+
+    def finish(self, job, status, error=None):
+        """Record the final state of a job."""
+        job.status, job.error, job.finished = status, error, time.time()
+        with self._lock:
+            db = self._connection()
+            db.execute('UPDATE jobs SET status = ?, error = ?, done = ?, total = ?, finished = ? WHERE id = ?',
+                       (status, error, job.done, job.total, job.finished, job.id))
+            db.commit()
+
+    def request_cancel(self, job_id):
+        """
+        Cancel a job: a queued one at once, a running one at its next result.
+
+        Returns:
+            Job or None: The job after the request, None if unknown
+        """
+        with self._lock:
+            db = self._connection()
+            db.execute('UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status = ?',
+                       (CANCELLED, time.time(), job_id, QUEUED))
+            db.execute('UPDATE jobs SET cancel = 1 WHERE id = ? AND status = ?', (job_id, RUNNING))
+            db.commit()
+        return self.get(job_id)
+
+    def heartbeat(self, owner):
+        """
+        Mark the running jobs of ``owner`` as alive.
+
+        Returns:
+            set: Ids of those jobs whose cancellation was requested
+        """
+        with self._lock:
+            db = self._connection()
+            db.execute('UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status = ?', (time.time(), owner, RUNNING))
+            rows = db.execute('SELECT id FROM jobs WHERE owner = ? AND status = ? AND cancel = 1',
+                              (owner, RUNNING)).fetchall()
+            db.commit()
+        return {row[0] for row in rows}
+
+    def requeue_stale(self, stale_after):
+        """
+        Queue running jobs again whose process stopped sending heartbeats,
+        e.g. because it was restarted. They run again from the start.
+
+        Returns:
+            int: Number of jobs requeued or, if cancelled meanwhile, finished
+        """
+        with self._lock:
+            db = self._connection()
+            count = db.execute(
+                'UPDATE jobs SET status = CASE cancel WHEN 1 THEN ? ELSE ? END, owner = NULL, done = 0 '
+                'WHERE status = ? AND heartbeat < ?',
+                (CANCELLED, QUEUED, RUNNING, time.time() - stale_after)
+            ).rowcount
+            db.commit()
+        return count
+
+    def purge(self, max_age):
+        """Delete finished jobs older than ``max_age`` seconds with their files."""
+        with self._lock:
+            db = self._connection()
+            rows = db.execute(
+                f"SELECT id FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED))}) AND finished < ?",
+                FINISHED + (time.time() - max_age,)
+            ).fetchall()
+            db.executemany('DELETE FROM jobs WHERE id = ?', rows)
+            db.commit()
+        for (job_id,) in rows:
+            shutil.rmtree(os.path.join(self.root, job_id), ignore_errors=True)
+        return len(rows)
+
+    def stats(self):
+        """Number of jobs in each state."""
+        with self._lock:
+            rows = self._connection().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        counts = dict.fromkeys((QUEUED, RUNNING) + FINISHED, 0)
+        counts.update(rows)
+        return counts
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _connection(self):
+        # Opened on first use so a store created before a fork works in the children
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL, status TEXT NOT NULL, '
+                'done INTEGER NOT NULL DEFAULT 0, total INTEGER, error TEXT, cancel INTEGER NOT NULL DEFAULT 0, '
+                'owner TEXT, created REAL NOT NULL, started REAL, finished REAL, heartbeat REAL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)')
+            self._db.commit()
+        return self._db
+
+    def _job(self, row):
+        values = dict(zip(Job.COLUMNS, row))
+        values['params'] = json.loads(values['params'])
+        return Job(self.root, **values)
+
+
+class JobRunner:
+    """
+    Runs queued jobs in background threads, at most ``max_concurrent`` at once.
+
+    A handler is called with the Job and yields result lines, which are
+    appended to the job's results file. Progress is saved and cancellation
+    checked between lines, so handlers for multi-frame work should yield
+    often. Every ``poll_interval`` seconds the dispatcher thread looks for
+    queued jobs (including those submitted by other processes), sends
+    heartbeats for its running jobs, requeues jobs whose process died and
+    deletes finished jobs older than ``max_age``.
+
+    Args:
+        store (JobStore): Job state
+        handlers (dict): Job kind to handler callable
+        max_concurrent (int): Jobs running at once in this process
+        poll_interval (float): Seconds between dispatcher rounds
+        stale_after (float): Seconds without heartbeat before a running job
+            is taken to be orphaned
+        max_age (float): Seconds finished jobs are kept
+    """
+
+    def __init__(self, store, handlers, max_concurrent=1, poll_interval=1.0, stale_after=60.0,
+                 max_age=7 * 24 * 3600):
+        self.store = store
+        self.handlers = handlers
+        self.max_concurrent = max_concurrent
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.max_age = max_age
+        self.owner = None
+        self._active = {}  # job id -> cancel event
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the dispatcher thread in this process, once."""
+        with self._lock:
+            if self._thread is None and not self._closed.is_set():
+                self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+                self._thread = threading.Thread(target=self._dispatch, name='yolo-jobs', daemon=True)
+                self._thread.start()
+        return self._thread
+
+    def submit(self, kind, params, inputs=()):
+        """
+        Queue a job, see JobStore.create.
+
+        Raises:
+            ValueError: If no handler exists for ``kind``
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = self.store.create(kind, params, inputs)
+        self.start()
+        self._wake.set()
+        return job
+
+    def cancel(self, job_id):
+        """Request cancellation, see JobStore.request_cancel."""
+        job = self.store.request_cancel(job_id)
+        with self._lock:
+            event = self._active.get(job_id)
+        if event is not None:
+            event.set()
+        if job is not None and job.status == CANCELLED:
+            shutil.rmtree(job.input_dir, ignore_errors=True)
+        return job
+
+    def stats(self):
+        """Jobs per state and the ones running in this process."""
+        with self._lock:
+            active = len(self._active)
+        return dict(self.store.stats(), active=active, max_concurrent=self.max_concurrent)
+
+    def close(self, timeout=5):
+        """Stop taking jobs and cancel the running ones."""
+        self._closed.set()
+        self._wake.set()
+        with self._lock:
+            events = list(self._active.values())
+        for event in events:
+            event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _dispatch(self):
+        while not self._closed.is_set():
+            try:
+                self._maintain()
+                while not self._closed.is_set():
+                    with self._lock:
+                        if len(self._active) >= self.max_concurrent:
+                            break
+                    job = self.store.claim(self.owner)
+                    if job is None:
+                        break
+                    with self._lock:
+                        self._active[job.id] = threading.Event()
+                    threading.Thread(target=self._run, args=(job,), name=f"yolo-job-{job.id[:8]}", daemon=True).start()
+            except sqlite3.Error as e:
+                print(f"Error dispatching jobs: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _maintain(self):
+        cancelled = self.store.heartbeat(self.owner)
+        with self._lock:
+            for job_id in cancelled:
+                if job_id in self._active:
+                    self._active[job_id].set()
+        self.store.requeue_stale(self.stale_after)
+        self.store.purge(self.max_age)
+
+    def _run(self, job):
+        with self._lock:
+            cancel = self._active[job.id]
+        status, error = SUCCEEDED, None
+        last_saved = time.monotonic()
+        try:
+            with open(job.results_path, 'w') as results, contextlib.closing(iter(self.handlers[job.kind](job))) as lines:
+                for line in lines:
+                    if cancel.is_set():
+                        raise JobCancelled()
+                    results.write(line)
+                    job.done += 1
+                    if time.monotonic() - last_saved >= self.poll_interval:
+                        results.flush()
+                        self.store.progress(job)
+                        last_saved = time.monotonic()
+        except JobCancelled:
+            status = CANCELLED
+        except Exception as e:
+            status, error = FAILED, str(e) or type(e).__name__
+        finally:
+            self.store.finish(job, status, error)
+            shutil.rmtree(job.input_dir, ignore_errors=True)
+            with self._lock:
+                del self._active[job.id]
+            self._wake.set()
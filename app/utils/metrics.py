@@ -0,0 +1,175 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Process-wide metrics, recorded by the stage hooks below
+REGISTRY = CollectorRegistry()
+
+STAGE_SECONDS = Histogram(
+    'yolo_stage_seconds',
+    'Time spent in each stage of a detection request',
+    ['stage'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+    registry=REGISTRY
+)
+REQUEST_SECONDS = Histogram(
+    'yolo_request_seconds',
+    'End-to-end handler latency',
+    ['endpoint'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    registry=REGISTRY
+)
+BATCH_SIZE = Histogram(
+    'yolo_batch_size',
+    'Images per forward pass',
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+    registry=REGISTRY
+)
+ASGI_PENDING = Gauge(
+    'yolo_asgi_pending_requests',
+    'Requests waiting for or running inference in the ASGI front end',
+    registry=REGISTRY
+)
+CASCADE_IMAGES = Counter(
+    'yolo_cascade_images',
+    'Images answered by each stage of the model cascade',
+    ['model'],
+    registry=REGISTRY
+)
+
+_current = ContextVar('yolo_request_timings', default=None)
+
+
+class RequestTimings:
+    """Stage durations of one request, rendered as a Server-Timing header."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def server_timing(self):
+        """Header value, durations in milliseconds."""
+        entries = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in self.stages.items()]
+        entries.append(f"total;dur={self.elapsed() * 1000:.2f}")
+        return ', '.join(entries)
+
+
+def start_request():
+    """
+    Begin collecting stage timings for the current request.
+
+    Returns:
+        tuple: (RequestTimings, token for end_request)
+    """
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def current_request():
+    """RequestTimings of the request being handled, or None."""
+    return _current.get()
+
+
+def end_request(token):
+    """Stop attributing stages to the request started with this token."""
+    _current.reset(token)
+
+
+def observe_stage(stage, seconds):
+    """Record a stage duration in the histogram and the current request, if any."""
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    timings = _current.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as one request stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - start)
+
+
+def observe_batch(size):
+    """Record the number of images in one forward pass."""
+    BATCH_SIZE.observe(size)
+
+
+class AppCollector:
+    """
+    Reads state owned by one app at scrape time: engine queue depth,
+    result cache counters, model load/warm-up durations and the admission
+    queue.
+    """
+
+    def __init__(self, engine, cache=None, loader=None, admission=None):
+        self.engine = engine
+        self.cache = cache
+        self.loader = loader
+        self.admission = admission
+
+    def collect(self):
+        # Never load a lazy model just to report on it
+        depth = 0
+        if getattr(self.engine, 'loaded', True):
+            depth = getattr(self.engine, 'queue_depth', 0)
+        yield GaugeMetricFamily('yolo_queue_depth', 'Images waiting for a forward pass', value=depth)
+
+        if self.cache is not None:
+            stats = self.cache.stats()
+            lookups = CounterMetricFamily('yolo_cache_lookups', 'Result cache lookups', labels=['result'])
+            lookups.add_metric(['hit'], stats['hits'])
+            lookups.add_metric(['disk_hit'], stats['disk_hits'])
+            lookups.add_metric(['miss'], stats['misses'])
+            yield lookups
+            yield GaugeMetricFamily('yolo_cache_hit_ratio', 'Result cache hit rate', value=stats['hit_rate'])
+            yield GaugeMetricFamily('yolo_cache_entries', 'Entries in the in-memory cache', value=stats['entries'])
+
+        if self.loader is not None:
+            status = self.loader.status()
+            yield GaugeMetricFamily('yolo_model_load_seconds', 'Time taken to load the model',
+                                    value=status['load_seconds'] or 0)
+            yield GaugeMetricFamily('yolo_model_warmup_seconds', 'Time taken to warm up the model',
+                                    value=status['warmup_seconds'] or 0)
+            yield GaugeMetricFamily('yolo_model_ready', 'Whether the model is ready to serve',
+                                    value=int(status['ready']))
+
+        if self.admission is not None:
+            stats = self.admission.stats()
+            outcomes = CounterMetricFamily('yolo_admission_requests', 'Admission decisions', labels=['result'])
+            for result in ('admitted', 'rejected', 'shed', 'expired'):
+                outcomes.add_metric([result], stats[result])
+            yield outcomes
+            yield GaugeMetricFamily('yolo_admission_running', 'Requests holding an inference slot',
+                                    value=stats['running'])
+            yield GaugeMetricFamily('yolo_admission_queued', 'Requests waiting for an inference slot',
+                                    value=stats['queued'])
+
+
+def render_metrics(app_registry):
+    """
+    Render process-wide and per-app metrics in the Prometheus text format.
+
+    When ``PROMETHEUS_MULTIPROC_DIR`` is set (gunicorn workers), the
+    histograms are aggregated across processes.
+    """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(app_registry)
@@ -0,0 +1,152 @@
+import threading
+import time
+
+import numpy as np
+
+from app.utils.metrics import observe_stage
+
+
+class LazyModel:
+    """
+    Proxy that builds the wrapped detector or engine on first use.
+
+    Attribute access is forwarded to the loaded object, so callers use it
+    exactly like the real thing. Loading is thread-safe and happens once.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._target = None
+        self._lock = threading.Lock()
+        self.load_seconds = None
+
+    @property
+    def loaded(self):
+        return self._target is not None
+
+    def load(self):
+        """Build the wrapped object if needed and return it."""
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    start = time.perf_counter()
+                    target = self._factory()
+                    self.load_seconds = time.perf_counter() - start
+                    observe_stage('model_load', self.load_seconds)
+                    self._target = target
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+
+class ModelLoader:
+    """
+    Controls when the model is loaded and warmed up.
+
+    Modes:
+        lazy: load on the first request, no warm-up
+        background: load and warm up in a thread started at app creation
+        preload: load (and fuse) the weights now without running inference,
+            so a pre-forking server shares them copy-on-write; each worker
+            calls ``start_warmup`` after the fork
+    """
+
+    MODES = ('lazy', 'background', 'preload')
+
+    def __init__(self, engine, detector, mode='background', warmup_sizes=(640,), conf=0.25):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown model load mode: {mode}")
+        self.engine = engine
+        self.detector = detector
+        self.mode = mode
+        self.warmup_sizes = tuple(warmup_sizes)
+        self.conf = conf
+        self.warmup_seconds = None
+        self.error = None
+        self._warmed_up = threading.Event()
+        self._warmup_thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        """Lazy mode never gates traffic, other modes are ready once warmed up."""
+        return self.mode == 'lazy' or self._warmed_up.is_set()
+
+    def start(self):
+        """Apply the configured mode at app creation."""
+        if self.mode == 'background':
+            self.start_warmup()
+        elif self.mode == 'preload':
+            self.preload()
+
+    def preload(self):
+        """Load weights in this process without touching the intra-op thread pool."""
+        if self.engine is not self.detector and (
+            # A lazy engine other than the detector is a worker pool; looking up
+            # attributes on it would build the pool here, before the fork
+            isinstance(self.engine, LazyModel) or getattr(self.engine, 'detector', None) is not self.detector
+        ):
+            # Worker pools load their own copies in child processes
+            return
+
+        import torch
+
+        # A thread pool started before fork is unusable in the children
+        threads = torch.get_num_threads()
+        torch.set_num_threads(1)
+        try:
+            detector = self.detector.load()
+            detector.prepare()
+        finally:
+            torch.set_num_threads(threads)
+
+    def adopt(self, engine):
+        """
+        Report on an engine hot-swapped in for the model this loader started.
+
+        The registry warms swapped-in engines up before they take traffic,
+        so the new engine is ready as soon as it is adopted.
+        """
+        with self._lock:
+            self.engine = engine
+            # vars() rather than getattr: a lazy engine would load to answer
+            self.detector = vars(engine).get('detector', engine)
+            self.warmup_seconds = None
+            self.error = None
+            self._warmed_up.set()
+
+    def start_warmup(self):
+        """Warm up in a background thread, once."""
+        with self._lock:
+            if self._warmup_thread is None:
+                self._warmup_thread = threading.Thread(target=self.warm_up, name='yolo-warmup', daemon=True)
+                self._warmup_thread.start()
+        return self._warmup_thread
+
+    def warm_up(self):
+        """Run dummy inferences at every configured input size."""
+        start = time.perf_counter()
+        try:
+            for size in self.warmup_sizes:
+                self.engine.predict([np.zeros((size, size, 3), dtype=np.uint8)], conf=self.conf)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            print(f"Error during model warm-up: {self.error}")
+            return
+        self.warmup_seconds = time.perf_counter() - start
+        self._warmed_up.set()
+
+    def wait_ready(self, timeout=None):
+        return self.ready or self._warmed_up.wait(timeout)
+
+    def status(self):
+        """Readiness details for the health endpoints."""
+        return {
+            'ready': self.ready,
+            'mode': self.mode,
+            'model_loaded': self.detector.loaded or getattr(self.engine, 'loaded', False),
+            'load_seconds': self.detector.load_seconds,
+            'warmup_seconds': self.warmup_seconds,
+            'error': self.error
+        }
@@ -0,0 +1,427 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+from app.utils.boxes import boxes_to_detections
+from app.utils.detection_service import DetectionService
+from app.utils.metrics import CASCADE_IMAGES
+from app.utils.onnx_backend import file_digest
+
+# Names with a special meaning in the ``model`` request parameter
+DEFAULT = 'default'
+CASCADE = 'cascade'
+
+
+class UnknownModelError(ValueError):
+    """Raised when a request names a model that is not configured."""
+
+
+def model_name(weights):
+    """Name a model after its weights file, 'models/yolov8s.pt' is 'yolov8s'."""
+    return os.path.splitext(os.path.basename(weights))[0]
+
+
+def parse_models(value):
+    """
+    Parse a model list such as ``yolov8s=yolov8s.pt,large=models/yolov8m.pt``.
+
+    Entries without a name are named after their weights file.
+
+    Returns:
+        dict: Model name to weights path, in the given order
+    """
+    models = {}
+    for item in (value or '').split(','):
+        item = item.strip()
+        if item:
+            name, _, weights = item.rpartition('=')
+            models[name.strip() or model_name(weights)] = weights.strip()
+    return models
+
+
+def weights_size_mb(weights):
+    """Memory estimate of a model, the size of its weights file in MiB."""
+    try:
+        return os.path.getsize(weights) / (1024 * 1024)
+    except OSError:
+        return 0.0
+
+
+class ModelEntry:
+    """A loaded model: its engine, the detection service bound to it and usage bookkeeping."""
+
+    def __init__(self, name, weights, engine, cache=None, size_mb=0.0, pinned=False, key=None, decode_size=None):
+        self.name = name
+        self.weights = weights
+        self.engine = engine
+        # Results are cached per weights so a swapped model never serves stale detections
+        self.key = key or weights
+        self.service = DetectionService(engine, self.key, cache=cache, decode_size=decode_size)
+        self.size_mb = size_mb
+        self.pinned = pinned
+        self.in_flight = 0
+        self.retired = False
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+
+    def close(self):
+        # Never load a lazy model just to close it
+        if getattr(self.engine, 'loaded', True):
+            close = getattr(self.engine, 'close', None)
+            if close is not None:
+                close()
+
+    def status(self):
+        return {
+            'name': self.name,
+            'weights': self.weights,
+            'size_mb': self.size_mb,
+            'pinned': self.pinned,
+            'in_flight': self.in_flight,
+            'loaded_at': self.loaded_at,
+            'last_used': self.last_used
+        }
+
+
+class CurrentModel:
+    """
+    Forwards attribute access to the engine or service of whichever entry
+    serves a model right now.
+
+    References taken at startup, such as the metrics collector's, follow hot
+    swaps instead of reporting on the retired model.
+    """
+
+    def __init__(self, registry, attribute, name=None):
+        self._registry = registry
+        self._attribute = attribute
+        self._name = name
+
+    def __getattr__(self, name):
+        return getattr(getattr(self._registry.current(self._name), self._attribute), name)
+
+
+class CascadeEngine:
+    """
+    Runs a small model on every image and a larger one only on hard images.
+
+    An image is hard when any of the small model's detections has a
+    confidence below ``escalate_conf``; the large model's boxes then replace
+    the small model's for that image. Images where the small model is sure,
+    or finds nothing, never reach the large model. Both models must share
+    the same classes.
+    """
+
+    def __init__(self, small, large, escalate_conf=0.5):
+        self.small = small
+        self.large = large
+        self.escalate_conf = escalate_conf
+
+    @property
+    def names(self):
+        """Mapping of class ids to class names."""
+        return self.small.names
+
+    def predict(self, images, conf=0.25, **options):
+        """Detect objects in several images and return one (N, 6) box array per image."""
+        images = list(images)
+        results = [np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+                   for boxes in self.small.predict(images, conf=conf, **options)]
+        hard = [i for i, boxes in enumerate(results) if len(boxes) and boxes[:, 4].min() < self.escalate_conf]
+        if hard:
+            for i, boxes in zip(hard, self.large.predict([images[i] for i in hard], conf=conf, **options)):
+                results[i] = np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+        CASCADE_IMAGES.labels('small').inc(len(images) - len(hard))
+        CASCADE_IMAGES.labels('large').inc(len(hard))
+        return results
+
+    def detect(self, image, conf=0.25, **options):
+        """Detect objects in an image, same result format as YOLODetector.detect."""
+        return boxes_to_detections(self.predict([image], conf=conf, **options)[0], self.names)
+
+    def detect_batch(self, images, conf=0.25, **options):
+        """Detect objects in several images, same result format as YOLODetector.detect_batch."""
+        return [boxes_to_detections(boxes, self.names) for boxes in self.predict(images, conf=conf, **options)]
+
+
+class ModelRegistry:
+    """
+    Keeps several models loaded and hands them out per request.
+
+    Models are loaded on first use and the least recently used ones are
+    unloaded when their estimated memory exceeds ``memory_budget_mb``.
+    Requests hold a model through ``acquire``; a model that is evicted or
+    swapped out while requests are using it is closed only after the last
+    one has finished, so nothing in flight is dropped.
+
+    Args:
+        build (callable): Builds an engine for a weights path
+        models (dict, optional): Model name to weights path of the models
+            that may be loaded on demand
+        cache: Shared detection result cache
+        memory_budget_mb (float): Total estimated size of loaded models, 0
+            for no limit
+        cascade (tuple, optional): (small, large) model names served as 'cascade'
+        cascade_conf (float): Confidence below which the cascade escalates
+        warmup_sizes (tuple): Input sizes run through a swapped-in model
+            before it receives traffic
+        conf (float): Confidence threshold of the warm-up runs
+        sizer (callable): Memory estimate in MiB of a weights path
+        decode_size (int, optional): Passed to each model's DetectionService
+        on_swap (callable, optional): Called with the new entry after a swap
+        cache_tag (str): Appended to every model's cache key, identifies the
+            settings models are built with
+    """
+
+    def __init__(self, build, models=None, cache=None, memory_budget_mb=0, cascade=None, cascade_conf=0.5,
+                 warmup_sizes=(640,), conf=0.25, sizer=weights_size_mb, decode_size=None, on_swap=None,
+                 cache_tag=''):
+        self.build = build
+        self.models = dict(models or {})
+        self.cache = cache
+        self.memory_budget_mb = memory_budget_mb
+        self.cascade = tuple(cascade) if cascade else None
+        self.cascade_conf = cascade_conf
+        self.warmup_sizes = tuple(warmup_sizes)
+        self.conf = conf
+        self.sizer = sizer
+        self.decode_size = decode_size
+        self.on_swap = on_swap
+        self.cache_tag = cache_tag
+        self.default = None
+        self._entries = OrderedDict()  # name -> ModelEntry, least recently used first
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._counters = {'loads': 0, 'evictions': 0, 'swaps': 0}
+
+    def register(self, name, weights, engine, pinned=False):
+        """
+        Add an already built engine, the first one registered is the default.
+
+        Returns:
+            ModelEntry: The new entry
+        """
+        entry = self._entry(name, weights, engine, pinned=pinned)
+        with self._lock:
+            self.models[name] = weights
+            self._entries[name] = entry
+            if self.default is None:
+                self.default = name
+        return entry
+
+    def resolve(self, name=None):
+        """
+        Check a requested model name.
+
+        Args:
+            name (str, optional): Model name, 'default' or 'cascade'; None
+                means the default model
+
+        Returns:
+            str: Name of a servable model
+
+        Raises:
+            UnknownModelError: If the name is not configured
+        """
+        if not name or name == DEFAULT:
+            return self.default
+        if name == CASCADE and self.cascade is not None:
+            return name
+        if name not in self.models:
+            raise UnknownModelError(f"Unknown model '{name}', use one of: {', '.join(self.available())}")
+        return name
+
+    def available(self):
+        """Names a request may ask for."""
+        names = list(self.models)
+        if self.cascade is not None:
+            names.append(CASCADE)
+        return names
+
+    def current(self, name=None):
+        """
+        Entry serving a model now, without loading it or counting a use.
+
+        Returns:
+            ModelEntry or None: None if the model is not loaded
+        """
+        name = self.resolve(name)
+        with self._lock:
+            return self._entries.get(name)
+
+    @contextmanager
+    def acquire(self, name=None):
+        """
+        Use a model for the duration of a request.
+
+        Yields:
+            ModelEntry: Entry whose ``engine`` and ``service`` serve the request
+
+        Raises:
+            UnknownModelError: If the name is not configured
+        """
+        name = self.resolve(name)
+        if name != CASCADE:
+            entry = self._checkout(name)
+            try:
+                yield entry
+            finally:
+                self._release(entry)
+            return
+
+        small = self._checkout(self.cascade[0])
+        try:
+            large = self._checkout(self.cascade[1])
+            try:
+                yield ModelEntry(
+                    CASCADE, None, CascadeEngine(small.engine, large.engine, self.cascade_conf),
+                    cache=self.cache,
+                    key=f"cascade:{small.key}>{large.key}@{self.cascade_conf}",
+                    decode_size=self.decode_size
+                )
+            finally:
+                self._release(large)
+        finally:
+            self._release(small)
+
+    def swap(self, name, weights):
+        """
+        Load new weights under a name and switch traffic to them atomically.
+
+        The new model is built and warmed up before it replaces the old one,
+        requests already using the old model finish on it.
+
+        Returns:
+            ModelEntry: The new entry
+        """
+        if name in (DEFAULT, CASCADE):
+            raise UnknownModelError(f"'{name}' is reserved")
+        engine = self.build(weights)
+        try:
+            for size in self.warmup_sizes:
+                engine.predict([np.zeros((size, size, 3), dtype=np.uint8)], conf=self.conf)
+        except Exception:
+            ModelEntry(name, weights, engine).close()
+            raise
+
+        with self._lock:
+            old = self._entries.pop(name, None)
+            entry = self._entry(name, weights, engine, pinned=old is not None and old.pinned)
+            self._entries[name] = entry
+            self.models[name] = weights
+            self._counters['swaps'] += 1
+            retired = [old] if old is not None else []
+            retired += self._evict_locked(keep=name)
+            closable = self._retire_locked(retired)
+        for old_entry in closable:
+            old_entry.close()
+        if self.on_swap is not None:
+            self.on_swap(entry)
+        return entry
+
+    def stats(self):
+        """Loaded models and counters."""
+        with self._lock:
+            return dict(
+                self._counters,
+                default=self.default,
+                available=self.available(),
+                cascade=list(self.cascade) if self.cascade else None,
+                memory_budget_mb=self.memory_budget_mb,
+                loaded_mb=sum(entry.size_mb for entry in self._entries.values()),
+                loaded=[entry.status() for entry in self._entries.values()]
+            )
+
+    def close(self):
+        """Close every loaded model."""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            entry.close()
+
+    def entry_key(self, weights):
+        """
+        Model part of the cache keys of a weights file.
+
+        Keyed by the file's content, so new weights written over the same
+        path never hit results cached for the old ones.
+        """
+        try:
+            key = f"{weights}@{file_digest(weights)}"
+        except OSError:
+            # Not a local file (yet), e.g. released weights ultralytics resolves by name
+            key = weights
+        return f"{key}#{self.cache_tag}" if self.cache_tag else key
+
+    def _entry(self, name, weights, engine, pinned=False):
+        return ModelEntry(name, weights, engine, cache=self.cache, size_mb=self.sizer(weights), pinned=pinned,
+                          key=self.entry_key(weights), decode_size=self.decode_size)
+
+    def _checkout(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                return self._use_locked(entry)
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # Load outside the registry lock so other models keep serving
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(name)
+                if entry is not None:
+                    return self._use_locked(entry)
+                weights = self.models[name]
+            engine = self.build(weights)
+            with self._lock:
+                entry = self._entry(name, weights, engine)
+                self._entries[name] = entry
+                self._counters['loads'] += 1
+                closable = self._retire_locked(self._evict_locked(keep=name))
+                self._use_locked(entry)
+        for old_entry in closable:
+            old_entry.close()
+        return entry
+
+    def _use_locked(self, entry):
+        entry.in_flight += 1
+        entry.last_used = time.time()
+        if self._entries.get(entry.name) is entry:
+            self._entries.move_to_end(entry.name)
+        return entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry.in_flight -= 1
+            closable = entry.retired and entry.in_flight == 0
+        if closable:
+            entry.close()
+
+    def _evict_locked(self, keep):
+        """Drop least recently used models until under the memory budget."""
+        if not self.memory_budget_mb:
+            return []
+        evicted = []
+        total = sum(entry.size_mb for entry in self._entries.values())
+        for name in list(self._entries):
+            if total <= self.memory_budget_mb:
+                break
+            entry = self._entries[name]
+            if entry.pinned or name == keep:
+                continue
+            del self._entries[name]
+            total -= entry.size_mb
+            evicted.append(entry)
+        self._counters['evictions'] += len(evicted)
+        return evicted
+
+    @staticmethod
+    def _retire_locked(entries):
+        """Mark entries as unloaded, returning those no request is using."""
+        for entry in entries:
+            entry.retired = True
+        return [entry for entry in entries if entry.in_flight == 0]
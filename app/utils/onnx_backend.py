@@ -0,0 +1,147 @@
+import ast
+import hashlib
+import os
+
+import cv2
+import numpy as np
+
+from app.utils.image_io import letterbox, scale_boxes
+from app.utils.metrics import stage
+
+
+def file_digest(path, length=16):
+    """Short sha256 of a file, used to key exported artifacts to their source weights."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:length]
+
+
+def preprocess(images, imgsz):
+    """
+    Build an NCHW float32 input batch the way the ultralytics predictor does.
+
+    Args:
+        images (list): Decoded BGR images
+        imgsz (int): Square input size
+
+    Returns:
+        tuple: (batch array, list of letterbox (image, ratio, pad) tuples)
+    """
+    letterboxed = [letterbox(image, imgsz) for image in images]
+    batch = np.stack([cv2.cvtColor(padded, cv2.COLOR_BGR2RGB) for padded, _, _ in letterboxed])
+    batch = np.ascontiguousarray(batch.transpose(0, 3, 1, 2), dtype=np.float32) / 255.0
+    return batch, letterboxed
+
+
+def export_onnx(model_name, cache_dir='models', imgsz=640):
+    """
+    Export a YOLO model to ONNX once and cache the artifact on disk.
+
+    Args:
+        model_name (str): Ultralytics weights, e.g. 'yolov8n.pt'
+        cache_dir (str): Directory holding exported models
+        imgsz (int): Export input size, the graph keeps dynamic batch and spatial axes
+
+    Returns:
+        str: Path to the cached .onnx file
+    """
+    model = None
+    if os.path.isfile(model_name):
+        weights_path = model_name
+    else:
+        # Let ultralytics download released weights it knows by name
+        from ultralytics import YOLO
+        model = YOLO(model_name)
+        weights_path = model.ckpt_path or model_name
+    stem = os.path.splitext(os.path.basename(weights_path))[0]
+    target = os.path.join(cache_dir, f"{stem}-{file_digest(weights_path)}-{imgsz}.onnx")
+    if os.path.exists(target):
+        return target
+
+    if model is None:
+        from ultralytics import YOLO
+        model = YOLO(weights_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    exported = model.export(format='onnx', imgsz=imgsz, dynamic=True)
+    external = f"{exported}.data"
+    if os.path.exists(external):
+        # Newer torch exporters keep the weights in a side file next to the
+        # source weights; fold them into the cached model so none is left behind
+        import onnx
+        onnx.save_model(onnx.load(exported), exported)
+        os.remove(external)
+    # Publish atomically so concurrent workers never load a partial file
+    os.replace(exported, target)
+    return target
+
+
+class OnnxBackend:
+    """
+    Runs an exported YOLO model through ONNX Runtime on CPU.
+
+    With ``quantization`` set to 'dynamic' or 'static' the INT8 artifact
+    produced by ``app.utils.quantization`` is loaded instead of FP32.
+
+    Preprocessing (letterbox, BGR to RGB, NCHW float32) and postprocessing
+    (NMS, mapping boxes back to the original image) mirror what ultralytics
+    does in its PyTorch predictor so both backends return the same detections.
+    """
+
+    def __init__(self, model_name='yolov8n.pt', cache_dir='models', imgsz=640,
+                 intra_op_threads=0, inter_op_threads=1, iou=0.7, onnx_path=None,
+                 quantization=None, calibration_dir=None):
+        import onnxruntime as ort
+
+        self.imgsz = imgsz
+        self.iou = iou
+        if onnx_path is None and quantization:
+            from app.utils.quantization import quantize_model
+            onnx_path = quantize_model(model_name, quantization, calibration_dir, cache_dir, imgsz)
+        self.onnx_path = onnx_path or export_onnx(model_name, cache_dir, imgsz)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        self.session = ort.InferenceSession(self.onnx_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata['names']) if 'names' in metadata else {}
+
+    def predict(self, images, conf=0.25, imgsz=None, iou=None, max_det=300, classes=None, half=None):
+        """
+        Run one forward pass over a batch of decoded images.
+
+        Args:
+            images (list): Decoded BGR images
+            conf (float): Confidence threshold (0-1)
+            imgsz (int, optional): Input size, defaults to the export size
+            iou (float, optional): NMS IoU threshold, defaults to the backend's
+            max_det (int): Most detections kept per image
+            classes (list, optional): Class ids to keep
+            half (bool, optional): Ignored, the exported graph runs in float32
+
+        Returns:
+            list: One float32 array of shape (N, 6) per image
+        """
+        import torch
+        from ultralytics.utils.ops import non_max_suppression
+
+        if not images:
+            return []
+
+        with stage('preprocess'):
+            batch, letterboxed = preprocess(images, imgsz or self.imgsz)
+        with stage('inference'):
+            output = self.session.run(None, {self.input_name: batch})[0]
+        with stage('postprocess'):
+            detections = non_max_suppression(torch.from_numpy(output), conf_thres=conf, iou_thres=iou or self.iou,
+                                             classes=classes, max_det=max_det)
+            return [
+                scale_boxes(boxes.numpy(), ratio, pad, image.shape[:2])
+                for boxes, (_, ratio, pad), image in zip(detections, letterboxed, images)
+            ]
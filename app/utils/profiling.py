@@ -0,0 +1,308 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import nullcontext
+
+from app.utils.metrics import current_request
+
+# Stack samples kept per capture, sampling stops beyond this
+MAX_SAMPLES = 200000
+# Operators listed in the summary
+TOP_OPS = 30
+
+_NULL = nullcontext()
+
+# Capture whose torch profiler runs around forward passes, None when off.
+# Read without a lock on every forward pass, so switching it costs nothing there.
+_forward_capture = None
+_captures = []
+_captures_lock = threading.Lock()
+# The torch profiler is process-wide, concurrent forward passes run unprofiled
+_torch_lock = threading.Lock()
+
+
+def _track(capture, running):
+    """Keep the newest running capture as the one profiling forward passes."""
+    global _forward_capture
+    with _captures_lock:
+        if running:
+            _captures.append(capture)
+        elif capture in _captures:
+            _captures.remove(capture)
+        _forward_capture = _captures[-1] if _captures else None
+
+
+def forward_section():
+    """
+    Context manager around a torch forward pass.
+
+    A no-op unless a profiling capture is running, in which case the pass
+    is recorded with the torch profiler. The torch profiler only sees ops
+    of the thread that started it, so it has to run where the forward pass
+    runs rather than on the request thread.
+    """
+    capture = _forward_capture
+    if capture is None or not _torch_lock.acquire(blocking=False):
+        return _NULL
+    return _TorchSection(capture)
+
+
+class StackSampler:
+    """
+    Samples the Python stacks of every thread at a fixed interval.
+
+    Inference may run on executor, batcher or job threads, so all threads
+    are sampled, each becoming one profile in the speedscope output.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.frames = []
+        self._frame_ids = {}
+        self.threads = {}  # thread id -> (name, samples, weights)
+        self._stop = threading.Event()
+        self._thread = None
+        self.start_time = None
+        self.end_time = None
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='yolo-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.end_time = time.perf_counter()
+
+    def to_speedscope(self, name):
+        """Profile in the speedscope file format, https://www.speedscope.app"""
+        duration = (self.end_time or time.perf_counter()) - self.start_time
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'yolo-api',
+            'shared': {'frames': self.frames},
+            'profiles': [
+                {
+                    'type': 'sampled',
+                    'name': thread_name,
+                    'unit': 'seconds',
+                    'startValue': 0,
+                    'endValue': duration,
+                    'samples': samples,
+                    'weights': weights
+                }
+                for thread_name, samples, weights in self.threads.values() if samples
+            ]
+        }
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        count = 0
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval) and count < MAX_SAMPLES:
+            now = time.perf_counter()
+            weight, last = now - last, now
+            frames = sys._current_frames()
+            if len(names) != len(frames):
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in frames.items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_id(frame))
+                    frame = frame.f_back
+                stack.reverse()
+                _, samples, weights = self.threads.setdefault(
+                    thread_id, (names.get(thread_id, str(thread_id)), [], [])
+                )
+                samples.append(stack)
+                weights.append(weight)
+                count += 1
+
+    def _frame_id(self, frame):
+        code = frame.f_code
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        frame_id = self._frame_ids.get(key)
+        if frame_id is None:
+            frame_id = self._frame_ids[key] = len(self.frames)
+            self.frames.append({'name': code.co_name, 'file': code.co_filename, 'line': code.co_firstlineno})
+        return frame_id
+
+
+class Capture:
+    """Profile of one request: Python stack samples, torch forward passes and stage timings."""
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.sampler = StackSampler(profiler.interval)
+        self.files = []
+        self.forward_passes = 0
+
+    def start(self):
+        if self.profiler.torch_ops:
+            _track(self, True)
+        self.sampler.start()
+        return self
+
+    def stop(self):
+        """Stop sampling and write the files, call while the request's timings are current."""
+        self.sampler.stop()
+        _track(self, False)
+        timings = current_request()
+        stages = dict(timings.stages) if timings is not None else {}
+        stages['total'] = self.sampler.end_time - self.sampler.start_time
+        path = self.profiler.write(f"{self.name}.speedscope.json", self.sampler.to_speedscope(self.name))
+        self.files.append(path)
+        self.profiler.finish(self, stages)
+
+
+class _TorchSection:
+    def __init__(self, capture):
+        self.capture = capture
+        self.profile = None
+
+    def __enter__(self):
+        try:
+            import torch
+            from torch.profiler import ProfilerActivity, profile
+
+            activities = [ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(ProfilerActivity.CUDA)
+            self.profile = profile(activities=activities)
+            self.profile.__enter__()
+        except Exception:
+            self.profile = None
+            _torch_lock.release()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profile is None:
+            return False
+        try:
+            self.profile.__exit__(*exc)
+            capture = self.capture
+            capture.forward_passes += 1
+            path = capture.profiler.path(f"{capture.name}-forward{capture.forward_passes}.trace.json")
+            self.profile.export_chrome_trace(path)
+            capture.files.append(path)
+            capture.profiler.add_ops(self.profile.key_averages())
+        finally:
+            _torch_lock.release()
+        return False
+
+
+class Profiler:
+    """
+    Opt-in sampling profiler for detection requests.
+
+    ``arm(n)`` profiles the next n requests. Each one writes a speedscope
+    file of Python stack samples and, for the torch backend, one Chrome
+    trace per forward pass to ``directory``. Per-op and per-stage times
+    are added up across captures in ``summary``. When nothing is armed a
+    request costs one attribute check.
+
+    Args:
+        directory (str): Where profile files are written
+        interval (float): Seconds between stack samples
+        torch_ops (bool): Record forward passes with the torch profiler
+        labels (dict, optional): Settings reported with the summary, e.g.
+            backend and thread counts, to compare runs
+    """
+
+    def __init__(self, directory, interval=0.005, torch_ops=True, labels=None):
+        self.directory = directory
+        self.interval = interval
+        self.torch_ops = torch_ops
+        self.labels = dict(labels or {})
+        self.remaining = 0
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._captures = []
+        self._ops = {}
+        self._stages = {}
+        self._requests = 0
+
+    def arm(self, requests, torch_ops=None):
+        """Profile the next ``requests`` requests, replacing any pending count."""
+        with self._lock:
+            self.remaining = max(int(requests), 0)
+            if torch_ops is not None:
+                self.torch_ops = torch_ops
+
+    def start(self, name):
+        """
+        Start profiling a request if the profiler is armed.
+
+        Args:
+            name (str): Endpoint, used in file names
+
+        Returns:
+            Capture or None: Running capture, stop it when the request ends
+        """
+        if self.remaining <= 0:
+            return None
+        with self._lock:
+            if self.remaining <= 0:
+                return None
+            self.remaining -= 1
+            self._sequence += 1
+            sequence = self._sequence
+        return Capture(self, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{sequence}-{name}").start()
+
+    def path(self, filename):
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, filename)
+
+    def write(self, filename, payload):
+        path = self.path(filename)
+        with open(path, 'w') as f:
+            json.dump(payload, f)
+        return path
+
+    def add_ops(self, averages):
+        """Add torch profiler ``key_averages()`` to the per-op totals."""
+        with self._lock:
+            for event in averages:
+                totals = self._ops.setdefault(event.key, {'calls': 0, 'cpu_total_us': 0.0, 'self_cpu_us': 0.0})
+                totals['calls'] += event.count
+                totals['cpu_total_us'] += event.cpu_time_total
+                totals['self_cpu_us'] += event.self_cpu_time_total
+
+    def finish(self, capture, stages):
+        """Record a finished capture and refresh summary.json."""
+        with self._lock:
+            self._requests += 1
+            for stage, seconds in stages.items():
+                self._stages[stage] = self._stages.get(stage, 0.0) + seconds
+            self._captures.append({'name': capture.name, 'forward_passes': capture.forward_passes,
+                                   'files': [os.path.basename(path) for path in capture.files]})
+        self.write('summary.json', self.summary())
+
+    def summary(self):
+        """Captures so far, mean stage times and the operators with the most self CPU time."""
+        with self._lock:
+            requests = self._requests
+            ops = sorted(self._ops.items(), key=lambda item: item[1]['self_cpu_us'], reverse=True)[:TOP_OPS]
+            return {
+                'remaining': self.remaining,
+                'torch_ops': self.torch_ops,
+                'labels': self.labels,
+                'requests': requests,
+                'stages_ms': {stage: seconds * 1000 / requests for stage, seconds in self._stages.items()},
+                'ops': [dict(totals, name=name) for name, totals in ops],
+                'captures': list(self._captures)
+            }
+
+    def reset(self):
+        """Forget the totals, files already written are kept."""
+        with self._lock:
+            self._captures, self._ops, self._stages, self._requests = [], {}, {}, 0
@@ -0,0 +1,196 @@
+import hashlib
+import os
+import time
+
+import cv2
+import numpy as np
+
+from app.utils.boxes import box_iou
+from app.utils.onnx_backend import export_onnx, preprocess
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+
+
+def list_images(directory, limit=None):
+    """Sorted image paths in a directory, optionally capped at ``limit``."""
+    paths = sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    return paths[:limit] if limit else paths
+
+
+class ImageCalibrationReader:
+    """Feeds letterboxed sample images to ONNX Runtime's static calibrator one at a time."""
+
+    def __init__(self, paths, input_name, imgsz=640):
+        self.paths = list(paths)
+        self.input_name = input_name
+        self.imgsz = imgsz
+        self._iter = iter(self.paths)
+
+    def get_next(self):
+        for path in self._iter:
+            image = cv2.imread(path)
+            if image is None:
+                continue
+            batch, _ = preprocess([image], self.imgsz)
+            return {self.input_name: batch}
+        return None
+
+    def rewind(self):
+        self._iter = iter(self.paths)
+
+
+def quantize_model(model_name, mode='dynamic', calibration_dir=None, cache_dir='models', imgsz=640,
+                   max_calibration_images=200):
+    """
+    Produce a cached INT8 ONNX model.
+
+    Args:
+        model_name (str): Ultralytics weights, e.g. 'yolov8n.pt'
+        mode (str): 'dynamic' quantizes weights only, 'static' also calibrates
+            activation ranges on sample images
+        calibration_dir (str, optional): Directory of sample images, required for 'static'
+        cache_dir (str): Directory holding exported models
+        imgsz (int): Model input size
+        max_calibration_images (int): Cap on calibration images used
+
+    Returns:
+        str: Path to the quantized .onnx file
+    """
+    from onnxruntime.quantization import (
+        CalibrationMethod, QuantFormat, QuantType, quant_pre_process, quantize_dynamic, quantize_static
+    )
+
+    if mode not in ('dynamic', 'static'):
+        raise ValueError(f"Unknown quantization mode: {mode}")
+
+    fp32_path = export_onnx(model_name, cache_dir, imgsz)
+    stem = os.path.splitext(fp32_path)[0]
+
+    calibration = []
+    if mode == 'static':
+        if not calibration_dir:
+            raise ValueError('Static quantization needs a calibration image directory')
+        calibration = list_images(calibration_dir, max_calibration_images)
+        if not calibration:
+            raise ValueError(f"No calibration images found in {calibration_dir}")
+        # Key the artifact to the calibration set as well as the weights
+        digest = hashlib.sha256('\n'.join(os.path.basename(p) for p in calibration).encode()).hexdigest()[:8]
+        target = f"{stem}-int8-static-{digest}.onnx"
+    else:
+        target = f"{stem}-int8-dynamic.onnx"
+
+    if os.path.exists(target):
+        return target
+
+    prepared = f"{target}.prep.onnx"
+    partial = f"{target}.partial"
+    quant_pre_process(fp32_path, prepared, skip_symbolic_shape=True)
+    try:
+        if mode == 'static':
+            import onnxruntime as ort
+            input_name = ort.InferenceSession(prepared, providers=['CPUExecutionProvider']).get_inputs()[0].name
+            quantize_static(
+                prepared,
+                partial,
+                ImageCalibrationReader(calibration, input_name, imgsz),
+                quant_format=QuantFormat.QDQ,
+                per_channel=True,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+                calibrate_method=CalibrationMethod.MinMax
+            )
+        else:
+            quantize_dynamic(prepared, partial, weight_type=QuantType.QUInt8)
+        os.replace(partial, target)
+    finally:
+        for leftover in (prepared, partial):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    return target
+
+
+def compare_models(reference, candidate, image_paths, conf=0.25, iou_threshold=0.5):
+    """
+    Measure how closely a candidate detector agrees with a reference, and how fast each is.
+
+    Reference boxes are matched greedily to candidate boxes of the same class
+    with IoU above ``iou_threshold``. Recall is the share of reference boxes
+    the candidate found, precision the share of candidate boxes that match one.
+
+    Args:
+        reference: FP32 detector exposing ``predict``
+        candidate: Quantized detector exposing ``predict``
+        image_paths (list): Images to compare on
+        conf (float): Confidence threshold (0-1)
+        iou_threshold (float): Minimum IoU for two boxes to count as the same object
+
+    Returns:
+        dict: 'images' with per-image numbers and 'summary' with aggregates
+    """
+    rows = []
+    warmed_up = False
+    for path in image_paths:
+        image = cv2.imread(path)
+        if image is None:
+            continue
+
+        if not warmed_up:
+            # Keep one-off graph initialisation out of the latency numbers
+            reference.predict([image], conf=conf)
+            candidate.predict([image], conf=conf)
+            warmed_up = True
+
+        start = time.perf_counter()
+        expected = reference.predict([image], conf=conf)[0]
+        reference_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        actual = candidate.predict([image], conf=conf)[0]
+        candidate_ms = (time.perf_counter() - start) * 1000
+
+        matched_ious = []
+        if len(expected) and len(actual):
+            iou = box_iou(expected, actual)
+            iou[expected[:, 5][:, None] != actual[:, 5][None, :]] = 0
+            used = np.zeros(len(actual), dtype=bool)
+            for row in np.argsort(-expected[:, 4]):
+                candidates = np.where(~used & (iou[row] >= iou_threshold))[0]
+                if len(candidates):
+                    best = candidates[iou[row, candidates].argmax()]
+                    used[best] = True
+                    matched_ious.append(float(iou[row, best]))
+
+        matches = len(matched_ious)
+        rows.append({
+            'image': os.path.basename(path),
+            'reference_boxes': int(len(expected)),
+            'candidate_boxes': int(len(actual)),
+            'matches': matches,
+            'recall': matches / len(expected) if len(expected) else 1.0,
+            'precision': matches / len(actual) if len(actual) else 1.0,
+            'mean_iou': float(np.mean(matched_ious)) if matched_ious else None,
+            'reference_ms': reference_ms,
+            'candidate_ms': candidate_ms
+        })
+
+    def mean(key):
+        values = [row[key] for row in rows if row[key] is not None]
+        return float(np.mean(values)) if values else None
+
+    def median(key):
+        return float(np.median([row[key] for row in rows])) if rows else None
+
+    summary = {
+        'images': len(rows),
+        'recall': mean('recall'),
+        'precision': mean('precision'),
+        'mean_iou': mean('mean_iou'),
+        'reference_p50_ms': median('reference_ms'),
+        'candidate_p50_ms': median('candidate_ms')
+    }
+    if summary['candidate_p50_ms']:
+        summary['speedup'] = summary['reference_p50_ms'] / summary['candidate_p50_ms']
+    return {'summary': summary, 'images': rows}
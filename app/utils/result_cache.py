@@ -0,0 +1,142 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def settings_digest(settings, length=12):
+    """
+    Short digest of the settings a model runs with.
+
+    Added to the model part of cache keys so results computed with another
+    backend, quantization mode, input size or decoding are never served,
+    also from the persistent tier after a restart with a changed config.
+
+    Args:
+        settings (dict): JSON-serializable settings
+
+    Returns:
+        str: Hex digest
+    """
+    encoded = json.dumps(settings, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()[:length]
+
+
+class DetectionCache:
+    """
+    Content-addressed cache of detection results.
+
+    Entries live in a bounded in-memory LRU and expire after ``ttl`` seconds.
+    When ``db_path`` is set, entries are also written to a SQLite file so
+    they survive restarts; disk hits are promoted back into memory.
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600, db_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        self._db = None
+        self._writes = 0
+
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS detections '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)'
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(data, model_name, conf):
+        """
+        Build a cache key from the image bytes and the parameters that affect the result.
+
+        Args:
+            data (bytes): Encoded image as uploaded
+            model_name (str): Model that produces the detections
+            conf (float): Confidence threshold (0-1)
+
+        Returns:
+            str: Hex digest identifying the request
+        """
+        digest = hashlib.sha256(data)
+        digest.update(f"|{model_name}|{float(conf):.6f}".encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached detections for key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, value = entry
+                if now - created <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self._counters['hits'] += 1
+                    return value
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    'SELECT value, created FROM detections WHERE key = ? AND created >= ?',
+                    (key, now - self.ttl)
+                ).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._store(key, value, row[1])
+                    self._counters['disk_hits'] += 1
+                    return value
+
+            self._counters['misses'] += 1
+            return None
+
+    def set(self, key, value):
+        """Store detections for key in memory and, if configured, on disk."""
+        now = time.time()
+        with self._lock:
+            self._store(key, value, now)
+            if self._db is not None:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO detections (key, value, created) VALUES (?, ?, ?)',
+                    (key, json.dumps(value), now)
+                )
+                self._writes += 1
+                # Purge expired rows every so often instead of on every write
+                if self._writes % 256 == 0:
+                    self._db.execute('DELETE FROM detections WHERE created < ?', (now - self.ttl,))
+                self._db.commit()
+
+    def stats(self):
+        """Return hit/miss counters and the current size."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """Drop every entry from memory and disk."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM detections')
+                self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _store(self, key, value, created):
+        self._entries[key] = (created, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters['evictions'] += 1
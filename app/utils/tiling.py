@@ -0,0 +1,170 @@
+from contextlib import nullcontext
+
+import cv2
+import numpy as np
+
+from app.utils.boxes import box_iou
+
+
+def tile_origins(length, tile_size, overlap):
+    """
+    Start offsets of overlapping tiles along one axis.
+
+    The last tile is aligned with the far edge so every tile has full size
+    when the image is at least one tile long.
+
+    Args:
+        length (int): Image size along the axis in pixels
+        tile_size (int): Tile size in pixels
+        overlap (float): Fraction of a tile shared with its neighbour, in [0, 1)
+
+    Returns:
+        list: Sorted start offsets
+    """
+    if length <= tile_size:
+        return [0]
+    step = max(int(tile_size * (1 - overlap)), 1)
+    origins = list(range(0, length - tile_size, step))
+    origins.append(length - tile_size)
+    return origins
+
+
+def iter_tiles(image, tile_size, overlap):
+    """
+    Split an image into overlapping tiles.
+
+    Args:
+        image (numpy.ndarray): BGR image
+        tile_size (int): Tile size in pixels
+        overlap (float): Fraction of a tile shared with its neighbour, in [0, 1)
+
+    Yields:
+        tuple: (x offset, y offset, contiguous tile copy)
+    """
+    height, width = image.shape[:2]
+    for y in tile_origins(height, tile_size, overlap):
+        for x in tile_origins(width, tile_size, overlap):
+            yield x, y, np.ascontiguousarray(image[y:y + tile_size, x:x + tile_size])
+
+
+def box_ios(a, b):
+    """
+    Pairwise intersection over the smaller box's area.
+
+    Better than IoU at matching an object cut off at a tile edge with its
+    full detection from the neighbouring tile.
+
+    Args:
+        a (numpy.ndarray): Array of shape (N, >=4), first columns are x1, y1, x2, y2
+        b (numpy.ndarray): Array of shape (M, >=4)
+
+    Returns:
+        numpy.ndarray: (N, M) overlap matrix
+    """
+    a = np.asarray(a, dtype=np.float32)[:, :4]
+    b = np.asarray(b, dtype=np.float32)[:, :4]
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    smaller = np.minimum(area_a[:, None], area_b[None, :])
+    return np.divide(intersection, smaller, out=np.zeros_like(intersection), where=smaller > 0)
+
+
+def merge_detections(boxes, iou_threshold=0.5, metric='ios'):
+    """
+    Vectorized class-aware NMS over detections gathered from several tiles.
+
+    Uses matrix ("fast") NMS: a box is dropped when any higher-scoring box
+    of the same class overlaps it by more than the threshold, computed with
+    one overlap matrix per class instead of a Python loop over boxes.
+
+    Args:
+        boxes (numpy.ndarray): (N, 6) rows of x1, y1, x2, y2, confidence, class_id
+            in global coordinates
+        iou_threshold (float): Overlap above which the weaker box is dropped
+        metric (str): 'ios' (intersection over smaller) or 'iou'
+
+    Returns:
+        numpy.ndarray: Kept boxes, sorted by descending confidence
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+    if len(boxes) < 2:
+        return boxes
+
+    boxes = boxes[np.argsort(-boxes[:, 4], kind='stable')]
+    overlap_fn = box_ios if metric == 'ios' else box_iou
+    keep = np.ones(len(boxes), dtype=bool)
+    # One overlap matrix per class keeps memory proportional to the largest class
+    for class_id in np.unique(boxes[:, 5]):
+        index = np.flatnonzero(boxes[:, 5] == class_id)
+        if len(index) < 2:
+            continue
+        # Only compare each box with the higher-scoring boxes before it
+        overlap = np.triu(overlap_fn(boxes[index], boxes[index]), k=1)
+        keep[index] = overlap.max(axis=0) <= iou_threshold
+    return boxes[keep]
+
+
+def tiled_predict(engine, image, conf=0.25, tile_size=640, overlap=0.2, batch_size=8,
+                  iou_threshold=0.5, full_image=True, guard=nullcontext, **options):
+    """
+    Detect objects in a large image tile by tile.
+
+    Tiles are sent to the engine in batches of ``batch_size``, their boxes
+    are shifted to global coordinates and merged across tile seams.
+
+    Args:
+        engine: Detector, batch scheduler or worker pool exposing ``predict``
+        image (numpy.ndarray): BGR image
+        conf (float): Confidence threshold (0-1)
+        tile_size (int): Tile size in pixels
+        overlap (float): Fraction of a tile shared with its neighbour, in [0, 1)
+        batch_size (int): Tiles per forward pass
+        iou_threshold (float): Overlap threshold for merging, see merge_detections
+        full_image (bool): Also run the downscaled full image so objects larger
+            than a tile are found
+        guard (callable): Context manager factory entered around each forward
+            pass, e.g. to hold an admission slot
+        **options: Inference options passed to ``engine.predict``, e.g. imgsz, iou or classes
+
+    Returns:
+        numpy.ndarray: (N, 6) boxes in image coordinates
+    """
+    height, width = image.shape[:2]
+    found = []
+
+    def run(batch):
+        with guard():
+            results = engine.predict([tile for _, _, tile in batch], conf=conf, **options)
+        for (x, y, _), boxes in zip(batch, results):
+            boxes = np.array(boxes, dtype=np.float32).reshape(-1, 6)
+            boxes[:, [0, 2]] += x
+            boxes[:, [1, 3]] += y
+            found.append(boxes)
+
+    batch = []
+    for tile in iter_tiles(image, tile_size, overlap):
+        batch.append(tile)
+        if len(batch) >= batch_size:
+            run(batch)
+            batch = []
+    if batch:
+        run(batch)
+
+    if full_image and max(height, width) > tile_size:
+        # Downscale once here rather than handing the engine the full-resolution frame
+        scale = tile_size / max(height, width)
+        small = cv2.resize(image, (max(int(width * scale), 1), max(int(height * scale), 1)),
+                           interpolation=cv2.INTER_AREA)
+        with guard():
+            boxes = engine.predict([small], conf=conf, **options)[0]
+        boxes = np.array(boxes, dtype=np.float32).reshape(-1, 6)
+        boxes[:, :4] /= scale
+        found.append(boxes)
+
+    boxes = np.concatenate(found) if found else np.zeros((0, 6), dtype=np.float32)
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+    return merge_detections(boxes, iou_threshold)
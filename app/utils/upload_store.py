@@ -0,0 +1,188 @@
+import hashlib
+import os
+import queue
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class UploadStore:
+    """
+    Content-addressed storage for uploaded images with bounded retention.
+
+    Files are named by the SHA-256 of their bytes, so the same image
+    uploaded twice is stored once and two uploads can never overwrite each
+    other. Files older than ``max_age`` seconds are evicted, then the least
+    recently stored files until the total is under ``max_bytes``; a
+    background thread does this every ``evict_interval`` seconds.
+
+    With ``async_writes`` the request thread only enqueues the bytes and a
+    writer thread hashes and persists them. When the bounded queue is full
+    the upload is not stored rather than blocking the request.
+    """
+
+    def __init__(self, root, max_bytes=1024 * 1024 * 1024, max_age=7 * 24 * 3600, async_writes=True,
+                 queue_size=64, evict_interval=60):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.async_writes = async_writes
+        self.evict_interval = evict_interval
+        self._files = OrderedDict()  # path -> size, least recently stored first
+        self._total = 0
+        self._lock = threading.Lock()
+        self._counters = {'writes': 0, 'dedupe_hits': 0, 'evictions': 0, 'dropped': 0}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._closed = threading.Event()
+        self._threads = []
+
+        os.makedirs(root, exist_ok=True)
+        self._scan()
+
+    def put(self, data, filename):
+        """
+        Store an upload.
+
+        Args:
+            data (bytes): Uploaded bytes
+            filename (str): Original filename, only its extension is kept
+
+        Returns:
+            str or None: Stored path relative to the root, None when the
+                write was handed to the writer thread or dropped
+        """
+        extension = os.path.splitext(filename)[1].lower()
+        self._ensure_threads()
+        if not self.async_writes:
+            return self._write(data, extension)
+
+        try:
+            self._queue.put_nowait((data, extension))
+        except queue.Full:
+            with self._lock:
+                self._counters['dropped'] += 1
+        return None
+
+    def evict(self, now=None):
+        """Remove expired files, then the oldest ones until under the size budget."""
+        now = time.time() if now is None else now
+        removed = []
+        with self._lock:
+            for path in list(self._files):
+                try:
+                    expired = now - os.path.getmtime(path) > self.max_age
+                except FileNotFoundError:
+                    expired = True
+                if not expired and self._total <= self.max_bytes:
+                    # Files are in storage order, the rest are newer
+                    break
+                self._total -= self._files.pop(path)
+                removed.append(path)
+            self._counters['evictions'] += len(removed)
+
+        for path in removed:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return len(removed)
+
+    def flush(self):
+        """Wait until queued uploads are written."""
+        if self.async_writes and self._threads:
+            self._queue.join()
+
+    def stats(self):
+        """Counters, number of stored files and their total size in bytes."""
+        with self._lock:
+            return dict(self._counters, files=len(self._files), bytes=self._total,
+                        pending=self._queue.qsize())
+
+    def close(self):
+        """Write what is queued and stop the background threads."""
+        self._closed.set()
+        if self._threads:
+            if self.async_writes:
+                self._queue.put(None)
+            for thread in self._threads:
+                thread.join(timeout=5)
+
+    def _path(self, digest, extension):
+        # Shard by the first byte of the hash to keep directories small
+        return os.path.join(self.root, digest[:2], digest + extension)
+
+    def _write(self, data, extension):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest, extension)
+        with self._lock:
+            if path in self._files:
+                # Already stored, refresh it so retention counts from now
+                self._files.move_to_end(path)
+                self._counters['dedupe_hits'] += 1
+                stored = True
+            else:
+                stored = False
+        if stored:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+            return os.path.relpath(path, self.root)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary name and rename, readers never see partial files
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._total += len(data) - self._files.pop(path, 0)
+            self._files[path] = len(data)
+            self._counters['writes'] += 1
+            over_budget = self._total > self.max_bytes
+        if over_budget:
+            self.evict()
+        return os.path.relpath(path, self.root)
+
+    def _scan(self):
+        """Index files left by earlier runs, oldest first."""
+        found = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(directory, name)
+                stat = os.stat(path)
+                found.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(found):
+            self._files[path] = size
+            self._total += size
+
+    def _ensure_threads(self):
+        # Started on first use so a store created before a fork works in the children
+        with self._lock:
+            if self._threads or self._closed.is_set():
+                return
+            self._threads = [threading.Thread(target=self._evictor, name='upload-evictor', daemon=True)]
+            if self.async_writes:
+                self._threads.append(threading.Thread(target=self._writer, name='upload-writer', daemon=True))
+            for thread in self._threads:
+                thread.start()
+
+    def _writer(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except OSError as e:
+                print(f"Error storing upload: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _evictor(self):
+        while not self._closed.wait(self.evict_interval):
+            self.evict()
@@ -0,0 +1,112 @@
+import os
+import tarfile
+import tempfile
+import zipfile
+
+import numpy as np
+from flask import Request
+
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+
+def is_archive(filename):
+    """Check whether an uploaded filename looks like a supported archive."""
+    return filename.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def iter_archive(fileobj, filename, allowed_extensions, max_member_size):
+    """
+    Yield images from a zip or tar archive one member at a time.
+
+    Args:
+        fileobj: Binary file object holding the archive
+        filename (str): Archive name, used to pick the format
+        allowed_extensions (set): Image extensions to extract, others are skipped
+        max_member_size (int): Members larger than this are reported instead of read
+
+    Yields:
+        tuple: (member name, bytes, error), bytes is None when error is set
+    """
+    def wanted(name):
+        return '.' in name and name.rsplit('.', 1)[1].lower() in allowed_extensions
+
+    if filename.lower().endswith('.zip'):
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not wanted(info.filename):
+                    continue
+                if info.file_size > max_member_size:
+                    yield info.filename, None, 'File too large'
+                    continue
+                yield info.filename, archive.read(info), None
+        return
+
+    # Stream mode reads members sequentially without seeking
+    with tarfile.open(fileobj=fileobj, mode='r|*') as archive:
+        for member in archive:
+            if not member.isfile() or not wanted(member.name):
+                continue
+            if member.size > max_member_size:
+                yield member.name, None, 'File too large'
+                continue
+            yield member.name, archive.extractfile(member).read(), None
+
+
+def iter_uploads(files, allowed_extensions, max_member_size):
+    """
+    Flatten uploaded files and archives into a stream of images.
+
+    Args:
+        files (list): werkzeug FileStorage objects
+        allowed_extensions (set): Image extensions accepted
+        max_member_size (int): Largest single image accepted from an archive
+
+    Yields:
+        tuple: (name, bytes, error), bytes is None when error is set
+    """
+    for file in files:
+        if not file.filename:
+            continue
+        if is_archive(file.filename):
+            try:
+                yield from iter_archive(file.stream, file.filename, allowed_extensions, max_member_size)
+            except (zipfile.BadZipFile, tarfile.TarError):
+                yield file.filename, None, 'Invalid archive'
+        elif '.' in file.filename and file.filename.rsplit('.', 1)[1].lower() in allowed_extensions:
+            yield file.filename, file.read(), None
+        else:
+            yield file.filename, None, 'File type not allowed'
+
+
+def disk_stream_factory(total_content_length, content_type, filename, content_length=None):
+    """werkzeug stream factory that always spools file parts to an anonymous temporary file."""
+    return tempfile.TemporaryFile('w+b')
+
+
+def map_upload(file):
+    """
+    Memory-map an upload spooled by disk_stream_factory.
+
+    Args:
+        file: werkzeug FileStorage backed by a real file
+
+    Returns:
+        numpy.ndarray: Read-only uint8 view of the uploaded bytes, pages are
+            loaded by the OS on access instead of being copied into memory
+    """
+    file.stream.flush()
+    if os.fstat(file.stream.fileno()).st_size == 0:
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(file.stream, dtype=np.uint8, mode='r')
+
+
+def spooled_request_class(max_memory):
+    """
+    Build a Flask request class whose uploads stay in memory up to ``max_memory``
+    bytes per file and spill to a temporary file beyond that.
+    """
+    class SpooledRequest(Request):
+        def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+            return tempfile.SpooledTemporaryFile(max_size=max_memory, mode='rb+')
+
+    return SpooledRequest
@@ -0,0 +1,275 @@
+from contextlib import nullcontext
+
+import cv2
+import numpy as np
+
+from app.utils.boxes import box_iou
+from app.utils.image_io import decode_image
+
+JPEG_START = b'\xff\xd8'
+JPEG_END = b'\xff\xd9'
+
+# Markers without a length field: TEM, RST0-7, SOI
+STANDALONE_MARKERS = frozenset([0x01, *range(0xd0, 0xd8), 0xd8])
+START_OF_SCAN = 0xda
+END_OF_IMAGE = 0xd9
+
+
+def iter_video_frames(capture, stride=1):
+    """
+    Yield frames from an opened cv2.VideoCapture, decoding only keyframes.
+
+    Args:
+        capture (cv2.VideoCapture): Opened capture, released when the generator finishes
+        stride (int): Run detection on every ``stride``-th frame
+
+    Yields:
+        tuple: (frame index, BGR image or None for skipped frames)
+    """
+    index = 0
+    try:
+        while True:
+            # grab() demuxes without the color conversion retrieve() pays for
+            if not capture.grab():
+                break
+            if index % stride == 0:
+                ok, frame = capture.retrieve()
+                if not ok:
+                    break
+                yield index, frame
+            else:
+                yield index, None
+            index += 1
+    finally:
+        capture.release()
+
+
+def _scan_jpeg(buffer, pos, in_scan):
+    """
+    Walk the segments of a JPEG from ``pos`` towards its EOI marker.
+
+    Segments are skipped by their length field, so an EXIF thumbnail with
+    its own SOI/EOI inside APP1 does not end the frame. Only entropy-coded
+    scan data is searched byte by byte, where 0xff is always stuffed or a
+    restart marker until the next real marker.
+
+    Args:
+        buffer (bytearray): Buffered stream
+        pos (int): Offset to resume at
+        in_scan (bool): Whether ``pos`` is inside entropy-coded data
+
+    Returns:
+        tuple: (offset of EOI or None, offset to resume at, in_scan)
+    """
+    size = len(buffer)
+    while pos + 2 <= size:
+        if in_scan:
+            marker = buffer.find(b'\xff', pos)
+            if marker < 0 or marker + 2 > size:
+                return None, size if marker < 0 else marker, True
+            code = buffer[marker + 1]
+            if code == 0 or 0xd0 <= code <= 0xd7:
+                # Stuffed byte or restart marker, still scan data
+                pos = marker + 2
+            elif code == 0xff:
+                pos = marker + 1
+            else:
+                pos, in_scan = marker, False
+            continue
+
+        if buffer[pos] != 0xff:
+            # Not a marker, resynchronize on the next one
+            in_scan = True
+            continue
+        code = buffer[pos + 1]
+        if code == END_OF_IMAGE:
+            return pos, pos, False
+        if code == 0xff:
+            pos += 1
+        elif code in STANDALONE_MARKERS:
+            pos += 2
+        elif pos + 4 > size:
+            break
+        else:
+            pos += 2 + int.from_bytes(buffer[pos + 2:pos + 4], 'big')
+            in_scan = code == START_OF_SCAN
+    return None, pos, in_scan
+
+
+def iter_mjpeg_frames(stream, stride=1, chunk_size=64 * 1024, max_frame_size=16 * 1024 * 1024):
+    """
+    Split a stream of concatenated JPEGs (MJPEG, multipart/x-mixed-replace) into frames.
+
+    Each frame is parsed once, resuming where the previous read stopped,
+    so the cost stays linear in the stream length whatever the chunk size.
+
+    Args:
+        stream: Binary file-like object, e.g. the request input stream
+        stride (int): Decode every ``stride``-th frame, others are only delimited
+        chunk_size (int): Bytes read per call
+        max_frame_size (int): Largest single JPEG accepted
+
+    Yields:
+        tuple: (frame index, BGR image or None for skipped or undecodable frames)
+    """
+    buffer = bytearray()
+    index = 0
+    # Offset the current frame's parse resumes at, None before its SOI is found
+    pos = None
+    in_scan = False
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        buffer.extend(chunk)
+
+        while True:
+            if pos is None:
+                start = buffer.find(JPEG_START)
+                if start < 0:
+                    # Keep a trailing 0xff in case the marker is split across reads
+                    del buffer[:max(len(buffer) - 1, 0)]
+                    break
+                del buffer[:start]
+                pos, in_scan = len(JPEG_START), False
+
+            end, pos, in_scan = _scan_jpeg(buffer, pos, in_scan)
+            if end is None:
+                if len(buffer) > max_frame_size:
+                    raise ValueError('MJPEG frame exceeds maximum size')
+                break
+
+            frame = None
+            if index % stride == 0:
+                frame = decode_image(bytes(buffer[:end + 2]))
+            yield index, frame
+            index += 1
+            del buffer[:end + 2]
+            pos = None
+
+
+class BoxTracker:
+    """
+    Lightweight IoU tracker that carries boxes between keyframes.
+
+    Keyframe detections are matched to existing tracks by class and IoU.
+    Between keyframes every track is extrapolated with the constant velocity
+    measured across its last two keyframes.
+    """
+
+    def __init__(self, iou_threshold=0.3):
+        self.iou_threshold = iou_threshold
+        self._next_id = 0
+        self._frame = 0
+        self._boxes = np.zeros((0, 6), dtype=np.float32)
+        self._velocity = np.zeros((0, 4), dtype=np.float32)
+        self._ids = np.zeros((0,), dtype=np.int64)
+
+    def update(self, boxes, frame_index):
+        """
+        Match keyframe detections to tracks.
+
+        Args:
+            boxes (numpy.ndarray): (N, 6) detections for the keyframe
+            frame_index (int): Index of the keyframe
+
+        Returns:
+            tuple: (boxes, track ids) for the keyframe
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+        ids = np.full(len(boxes), -1, dtype=np.int64)
+        velocity = np.zeros((len(boxes), 4), dtype=np.float32)
+
+        if len(boxes) and len(self._boxes):
+            iou = box_iou(self._boxes, boxes)
+            iou[self._boxes[:, 5][:, None] != boxes[:, 5][None, :]] = 0
+            elapsed = max(frame_index - self._frame, 1)
+
+            # Greedy assignment, best overlaps first
+            matched = np.zeros(len(self._boxes), dtype=bool)
+            for flat in np.argsort(iou, axis=None)[::-1]:
+                track, det = divmod(int(flat), iou.shape[1])
+                if iou[track, det] < self.iou_threshold:
+                    break
+                if matched[track] or ids[det] >= 0:
+                    continue
+                matched[track] = True
+                ids[det] = self._ids[track]
+                velocity[det] = (boxes[det, :4] - self._boxes[track, :4]) / elapsed
+
+        new = ids < 0
+        ids[new] = np.arange(self._next_id, self._next_id + new.sum())
+        self._next_id += int(new.sum())
+
+        self._boxes, self._velocity, self._ids, self._frame = boxes, velocity, ids, frame_index
+        return boxes, ids
+
+    def predict(self, frame_index):
+        """Extrapolate the current tracks to a skipped frame."""
+        boxes = self._boxes.copy()
+        boxes[:, :4] += self._velocity * (frame_index - self._frame)
+        return boxes, self._ids
+
+
+def track_stream(engine, frames, conf=0.25, batch_size=8, tracker=None, guard=nullcontext, **options):
+    """
+    Run detection over a frame stream, batching keyframes and tracking between them.
+
+    At most ``batch_size`` decoded keyframes are held at once, so memory is
+    bounded by the pipeline depth and not by the length of the video.
+
+    Args:
+        engine: Detector or scheduler exposing ``predict`` and ``names``
+        frames (iterable): (frame index, image or None) pairs, None marks a skipped frame
+        conf (float): Confidence threshold (0-1)
+        batch_size (int): Keyframes per forward pass
+        tracker (BoxTracker, optional): Tracker to carry boxes between keyframes
+        guard (callable): Context manager factory entered around each forward
+            pass, e.g. to hold an admission slot
+        **options: Inference options passed to ``engine.predict``, e.g. imgsz, iou or classes
+
+    Yields:
+        dict: Per-frame result with 'frame', 'keyframe' and 'detections'
+    """
+    tracker = tracker or BoxTracker()
+    pending = []
+    keyframes = 0
+
+    for index, frame in frames:
+        pending.append((index, frame))
+        if frame is not None:
+            keyframes += 1
+        if keyframes >= batch_size:
+            yield from _flush(engine, pending, conf, tracker, guard, options)
+            pending, keyframes = [], 0
+
+    yield from _flush(engine, pending, conf, tracker, guard, options)
+
+
+def _flush(engine, pending, conf, tracker, guard, options):
+    images = [frame for _, frame in pending if frame is not None]
+    results = []
+    if images:
+        with guard():
+            results = engine.predict(images, conf=conf, **options)
+    results = iter(results)
+    names = engine.names
+
+    for index, frame in pending:
+        if frame is not None:
+            boxes, ids = tracker.update(next(results), index)
+        else:
+            boxes, ids = tracker.predict(index)
+        yield {
+            'frame': index,
+            'keyframe': frame is not None,
+            'detections': [
+                {
+                    'track_id': int(track_id),
+                    'class': names[int(class_id)],
+                    'confidence': float(confidence),
+                    'bbox': [float(x1), float(y1), float(x2), float(y2)]
+                }
+                for (x1, y1, x2, y2, confidence, class_id), track_id in zip(boxes.tolist(), ids.tolist())
+            ]
+        }
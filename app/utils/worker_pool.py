@@ -0,0 +1,226 @@
+import itertools
+import multiprocessing as mp
+import queue
+import threading
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from app.utils.image_io import letterbox, scale_boxes
+from app.utils.boxes import boxes_to_detections
+
+
+def _load_detector(model_name, **options):
+    from app.utils.yolo_detector import YOLODetector
+    return YOLODetector(model_name, **options)
+
+
+def _worker_main(worker_id, model_name, threads, imgsz, factory, detector_options, task_queue, result_queue):
+    """Entry point of an inference worker process."""
+    import torch
+
+    # Pin the intra-op pool so workers don't fight over the same cores
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+    detector = factory(model_name, **detector_options)
+    result_queue.put(('ready', worker_id, dict(detector.names)))
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+
+        task_id, shm_name, shape, dtype, conf, options = task
+        size = options.pop('imgsz', None) or imgsz
+        shm = shared_memory.SharedMemory(name=shm_name)
+        try:
+            # Letterboxing copies the frame, so the shared buffer is released right away
+            frame = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            padded, ratio, pad = letterbox(frame, size)
+            del frame
+            boxes = detector.predict([padded], conf=conf, imgsz=size, **options)[0]
+            result_queue.put(('result', task_id, scale_boxes(boxes, ratio, pad, shape[:2])))
+        except Exception as e:
+            result_queue.put(('error', task_id, f"{type(e).__name__}: {e}"))
+        finally:
+            shm.close()
+
+
+class _Worker:
+    def __init__(self, process, task_queue):
+        self.process = process
+        self.task_queue = task_queue
+        self.inflight = set()
+
+
+class InferencePool:
+    """
+    Pool of inference worker processes, each holding its own model.
+
+    Frames are handed over through ``multiprocessing.shared_memory`` buffers,
+    only the buffer name and shape travel over the task queue. Box arrays
+    come back over a shared result queue. Workers that die are restarted and
+    the requests they were holding fail with ``RuntimeError``.
+    """
+
+    def __init__(self, model_name='yolov8n.pt', workers=2, threads_per_worker=1, imgsz=640,
+                 factory=_load_detector, detector_options=None, monitor_interval=1.0):
+        self.model_name = model_name
+        self.detector_options = detector_options or {}
+        self.threads_per_worker = threads_per_worker
+        self.imgsz = imgsz
+        self.factory = factory
+        self.names = None
+
+        self._ctx = mp.get_context('spawn')
+        self._result_queue = self._ctx.Queue()
+        self._workers = {}
+        self._pending = {}
+        self._task_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._closed = threading.Event()
+
+        for worker_id in range(workers):
+            self._start_worker(worker_id)
+
+        self._collector = threading.Thread(target=self._collect, name='yolo-pool-collector', daemon=True)
+        self._collector.start()
+        self._monitor_interval = monitor_interval
+        self._monitor = threading.Thread(target=self._watch, name='yolo-pool-monitor', daemon=True)
+        self._monitor.start()
+
+    @property
+    def queue_depth(self):
+        """Images submitted and not yet answered."""
+        return len(self._pending)
+
+    def wait_ready(self, timeout=None):
+        """Block until at least one worker has loaded its model."""
+        return self._ready.wait(timeout)
+
+    def submit(self, image, conf=0.25, **options):
+        """
+        Hand a decoded frame to the least busy worker.
+
+        Args:
+            image (numpy.ndarray): Decoded BGR image
+            conf (float): Confidence threshold (0-1)
+            **options: imgsz (defaults to the pool's), iou, max_det, classes
+                and half
+
+        Returns:
+            concurrent.futures.Future: Resolves to an (N, 6) box array in image coordinates
+        """
+        if self._closed.is_set():
+            raise RuntimeError('InferencePool is closed')
+
+        image = np.ascontiguousarray(image)
+        shm = shared_memory.SharedMemory(create=True, size=image.nbytes)
+        np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)[:] = image
+
+        future = Future()
+        task_id = next(self._task_ids)
+        with self._lock:
+            worker_id, worker = min(self._workers.items(), key=lambda item: len(item[1].inflight))
+            worker.inflight.add(task_id)
+            self._pending[task_id] = (future, shm, worker_id)
+        worker.task_queue.put((task_id, shm.name, image.shape, image.dtype.str, conf, options))
+        return future
+
+    def detect_boxes(self, image, conf=0.25, **options):
+        """Detect objects in an image and return the raw (N, 6) box array."""
+        return self.submit(image, conf, **options).result()
+
+    def detect(self, image, conf=0.25, **options):
+        """Detect objects in an image, same result format as YOLODetector.detect."""
+        boxes = self.detect_boxes(image, conf, **options)
+        return boxes_to_detections(boxes, self.names)
+
+    def predict(self, images, conf=0.25, **options):
+        """Detect objects in several images and return one (N, 6) box array per image."""
+        futures = [self.submit(image, conf, **options) for image in images]
+        return [future.result() for future in futures]
+
+    def detect_batch(self, images, conf=0.25, **options):
+        """Detect objects in several images, same result format as YOLODetector.detect_batch."""
+        futures = [self.submit(image, conf, **options) for image in images]
+        return [boxes_to_detections(future.result(), self.names) for future in futures]
+
+    def close(self, timeout=5):
+        """Stop all workers and fail anything still pending."""
+        self._closed.set()
+        with self._lock:
+            workers = list(self._workers.values())
+        for worker in workers:
+            worker.task_queue.put(None)
+        for worker in workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        with self._lock:
+            pending = list(self._pending)
+        for task_id in pending:
+            self._finish(task_id, error=RuntimeError('InferencePool closed'))
+        self._result_queue.put(None)
+
+    def _start_worker(self, worker_id):
+        task_queue = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.model_name, self.threads_per_worker, self.imgsz,
+                  self.factory, self.detector_options, task_queue, self._result_queue),
+            name=f'yolo-worker-{worker_id}',
+            daemon=True
+        )
+        process.start()
+        self._workers[worker_id] = _Worker(process, task_queue)
+
+    def _finish(self, task_id, result=None, error=None):
+        with self._lock:
+            entry = self._pending.pop(task_id, None)
+            if entry is None:
+                return
+            future, shm, worker_id = entry
+            worker = self._workers.get(worker_id)
+            if worker is not None:
+                worker.inflight.discard(task_id)
+
+        shm.close()
+        shm.unlink()
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _collect(self):
+        while True:
+            message = self._result_queue.get()
+            if message is None:
+                return
+
+            kind = message[0]
+            if kind == 'ready':
+                self.names = message[2]
+                self._ready.set()
+            elif kind == 'result':
+                self._finish(message[1], result=message[2])
+            elif kind == 'error':
+                self._finish(message[1], error=RuntimeError(message[2]))
+
+    def _watch(self):
+        while not self._closed.wait(self._monitor_interval):
+            with self._lock:
+                dead = [(worker_id, worker) for worker_id, worker in self._workers.items()
+                        if not worker.process.is_alive()]
+            for worker_id, worker in dead:
+                print(f"Inference worker {worker_id} exited with code {worker.process.exitcode}, restarting")
+                # Swap in the replacement before failing orphans so no new task lands on the dead queue
+                with self._lock:
+                    if not self._closed.is_set():
+                        self._start_worker(worker_id)
+                    orphaned = list(worker.inflight)
+                for task_id in orphaned:
+                    self._finish(task_id, error=RuntimeError('Inference worker crashed'))
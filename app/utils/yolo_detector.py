@@ -4,20 +4,141 @@ from ultralytics import YOLO
 import cv2
 import numpy as np
 
+from app.utils.boxes import boxes_to_detections
+from app.utils.cpu_policy import apply_torch_policy
+from app.utils.inference_options import with_classes
+from app.utils.metrics import observe_batch, observe_stage
+from app.utils.profiling import forward_section
+
+
 class YOLODetector:
-    def __init__(self, model_name='yolov8n.pt'):
-        """Initialize YOLO detector with specified model."""
+    def __init__(self, model_name='yolov8n.pt', backend='torch', inference_defaults=None, channels_last=False,
+                 **backend_options):
+        """
+        Initialize YOLO detector with specified model.
+        
+        Args:
+            model_name (str): Ultralytics weights, e.g. 'yolov8n.pt'
+            backend (str): 'torch' to run the PyTorch model, 'onnx' to run an
+                exported copy through ONNX Runtime
+            inference_defaults (dict, optional): imgsz, iou, max_det, classes
+                and half used when a call does not set them
+            channels_last (bool): Keep the torch model's conv weights in
+                channels-last (NHWC) layout, faster for oneDNN on CPU
+            **backend_options: Passed to the ONNX backend (cache_dir, imgsz, threads)
+        """
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        self.model = YOLO(model_name)
-        self.model.to(self.device)
+        self.backend = backend
+        self.runtime = None
+        self.channels_last = channels_last
+        
+        if backend == 'onnx':
+            from app.utils.onnx_backend import OnnxBackend
+            self.runtime = OnnxBackend(model_name, **backend_options)
+            self.model = None
+        elif backend == 'torch':
+            # Thread settings of the CPU policy, when this process applied one
+            apply_torch_policy(torch)
+            self.model = YOLO(model_name)
+            self.model.to(self.device)
+            if channels_last:
+                # ultralytics fuses on the first prediction, which would
+                # replace converted weights with freshly allocated ones
+                self.prepare()
+        else:
+            raise ValueError(f"Unknown detector backend: {backend}")
+        
+        # Class filters may be configured by name
+        self.defaults = with_classes(dict(inference_defaults or {}), self.names)
+
+    def prepare(self):
+        """
+        Finish model setup without running inference.
+        
+        Fusing conv and batch-norm layers up front means processes forked
+        afterwards share the final weights instead of each fusing its own copy.
+        """
+        if self.model is not None:
+            with torch.no_grad():
+                self.model.fuse()
+                if self.channels_last:
+                    self.model.model.to(memory_format=torch.channels_last)
+
+    @property
+    def names(self):
+        """Mapping of class ids to class names."""
+        return self.runtime.names if self.runtime is not None else self.model.names
+
+    def _options(self, options):
+        """Call options over the configured defaults, unset ones dropped."""
+        merged = dict(self.defaults)
+        merged.update((name, value) for name, value in options.items() if value is not None)
+        if merged.get('classes') is not None:
+            merged['classes'] = list(merged['classes'])
+        return merged
+
+    def _infer(self, source, **kwargs):
+        """
+        Run the configured backend.
+        
+        Returns:
+            list: One (boxes, names, image) tuple per input image, boxes is an
+                 array of shape (N, 6)
+        """
+        if self.runtime is None:
+            with torch.inference_mode(), forward_section():
+                results = self.model(source, **kwargs)
+            observe_batch(len(results))
+            if results:
+                # ultralytics reports per-image milliseconds averaged over the batch
+                for stage, ms in results[0].speed.items():
+                    if ms is not None:
+                        observe_stage(stage, ms * len(results) / 1000)
+            return [
+                (r.boxes.data.cpu().numpy().reshape(-1, 6), r.names, r.orig_img)
+                for r in results
+            ]
+        
+        images = source if isinstance(source, list) else [source]
+        images = [self._load(image) for image in images]
+        observe_batch(len(images))
+        batch_boxes = self.runtime.predict(images, **kwargs)
+        return [(boxes, self.runtime.names, image) for boxes, image in zip(batch_boxes, images)]
+
+    @staticmethod
+    def _load(image):
+        """Read an image path, decoded arrays are passed through."""
+        if not isinstance(image, str):
+            return image
+        img = cv2.imread(image)
+        if img is None:
+            raise FileNotFoundError(f"Image not found: {image}")
+        return img
 
-    def detect(self, image_path, conf=0.25):
+    def predict(self, images, conf=0.25, **options):
         """
-        Detect objects in an image and save the annotated image.
+        Run a single forward pass over a batch of images.
         
         Args:
-            image_path (str): Path to the image file
+            images (list): Image paths or decoded BGR images
             conf (float): Confidence threshold (0-1)
+            **options: imgsz, iou, max_det, classes (ids) and half,
+                overriding the defaults
+            
+        Returns:
+            list: One float32 array of shape (N, 6) per image,
+                 rows are x1, y1, x2, y2, confidence, class_id
+        """
+        return [boxes for boxes, _, _ in self._infer(list(images), conf=conf, **self._options(options))]
+
+    def detect(self, image, conf=0.25, **options):
+        """
+        Detect objects in an image.
+        
+        Args:
+            image (str or numpy.ndarray): Path to the image file or a decoded BGR image
+            conf (float): Confidence threshold (0-1)
+            **options: See predict
             
         Returns:
             list: List of dictionaries containing detection results
@@ -25,42 +146,28 @@ class YOLODetector:
         """
         try:
             # Run inference
-            results = self.model(image_path, conf=conf)[0]
-            
-            # Get the original image
-            img = cv2.imread(image_path)
-            
-            # Draw bounding boxes on the image
-            for r in results.boxes.data.tolist():
-                x1, y1, x2, y2, confidence, class_id = r
-                x1, y1, x2, y2 = map(int, [x1, y1, x2, y2])
-                class_name = results.names[int(class_id)]
-                
-                # Draw rectangle
-                cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                
-                # Add label with class name and confidence
-                label = f"{class_name} {confidence:.2f}"
-                (label_width, label_height), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)
-                cv2.rectangle(img, (x1, y1 - label_height - 10), (x1 + label_width, y1), (0, 255, 0), -1)
-                cv2.putText(img, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 2)
-            
-            # Save the annotated image
-            cv2.imwrite(image_path, img)
-            
-            # Process results for return
-            detections = []
-            for r in results.boxes.data.tolist():
-                x1, y1, x2, y2, confidence, class_id = r
-                detection = {
-                    'class': results.names[int(class_id)],
-                    'confidence': float(confidence),
-                    'bbox': [float(x1), float(y1), float(x2), float(y2)]
-                }
-                detections.append(detection)
-            
-            return detections
+            boxes, names, _ = self._infer(image, conf=conf, **self._options(options))[0]
+            return boxes_to_detections(boxes, names)
             
         except Exception as e:
             print(f"Error during detection: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+
+    def detect_batch(self, images, conf=0.25, **options):
+        """
+        Detect objects in several images with one forward pass.
+        
+        Args:
+            images (list): Image paths or decoded BGR images
+            conf (float): Confidence threshold (0-1)
+            **options: See predict
+            
+        Returns:
+            list: One list of detection dictionaries per image, in input order
+        """
+        if not images:
+            return []
+        return [
+            boxes_to_detections(boxes, names)
+            for boxes, names, _ in self._infer(list(images), conf=conf, **self._options(options))
+        ]
@@ -0,0 +1,41 @@
+import gc
+import itertools
+import os
+
+# Load the weights once in the master; forked workers share them copy-on-write
+os.environ.setdefault('YOLO_LOAD_MODE', 'preload')
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5000')}"
+# The app splits the CPUs between this many workers, see CPU_POLICY
+workers = int(os.environ.setdefault('WEB_CONCURRENCY', '2'))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'uvicorn.workers.UvicornWorker')
+wsgi_app = os.getenv('GUNICORN_APP', 'wsgi:asgi_app')
+preload_app = True
+timeout = 120
+
+
+def when_ready(server):
+    # Move everything loaded so far out of the collector's reach, so garbage
+    # collection in the workers doesn't write to (and un-share) those pages
+    gc.freeze()
+
+
+def pre_fork(server, worker):
+    # Runs in the master, where the slots of live workers are known. A
+    # replacement takes the lowest free slot, the one its predecessor held.
+    taken = {getattr(live, 'cpu_slot', None) for live in server.WORKERS.values()}
+    worker.cpu_slot = next(slot for slot in itertools.count() if slot not in taken)
+
+
+def post_fork(server, worker):
+    # The entry point gunicorn loaded from wsgi_app, the Flask app itself or its ASGI wrapper
+    loaded = server.app.wsgi()
+    app = getattr(loaded, 'flask_app', loaded)
+    if app.config['CPU_POLICY']:
+        # Each worker is pinned to the core slice of its slot
+        app.extensions['yolo_cpu_policy'].apply(index=worker.cpu_slot)
+    app.extensions['yolo_loader'].start_warmup()
+    # Every worker accepts jobs, one runs them so JOBS_MAX_CONCURRENT holds for
+    # the whole server. Its replacement takes over the slot and the runner.
+    if app.extensions['yolo_jobs'] is not None and worker.cpu_slot == 0:
+        app.extensions['yolo_jobs'].start()
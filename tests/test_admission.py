@@ -0,0 +1,181 @@
+import time
+import threading
+import pytest
+import numpy as np
+import cv2
+from io import BytesIO
+from unittest.mock import patch
+from app.utils.admission import (BULK, INTERACTIVE, AdmissionController, DeadlineExceeded, Overloaded,
+                                 request_deadline)
+
+def wait_queued(controller, count):
+    """Block until ``count`` requests are waiting."""
+    for _ in range(200):
+        if controller.stats()['queued'] == count:
+            return
+        time.sleep(0.005)
+    raise AssertionError(f"expected {count} queued requests")
+
+def enqueue(controller, priority, order, label, deadline=None):
+    """Start a thread that waits for a slot and records when it got one."""
+    def run():
+        try:
+            with controller.admit(priority, deadline):
+                order.append(label)
+        except (Overloaded, DeadlineExceeded) as e:
+            order.append((label, type(e).__name__))
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+@pytest.mark.unit
+class TestAdmissionController:
+    def test_request_deadline(self):
+        """Test the budget is relative to arrival and optional."""
+        assert request_deadline(10.0, '250') == pytest.approx(10.25)
+        assert request_deadline(10.0, 0) is None
+        with pytest.raises(ValueError):
+            request_deadline(10.0, 'soon')
+
+    def test_interactive_served_first(self):
+        """Test waiting interactive requests get the next slot ahead of earlier bulk ones."""
+        controller = AdmissionController(max_concurrent=1, max_queue=4)
+        order = []
+        controller.acquire()
+        threads = [enqueue(controller, BULK, order, 'bulk')]
+        wait_queued(controller, 1)
+        threads.append(enqueue(controller, INTERACTIVE, order, 'interactive'))
+        wait_queued(controller, 2)
+
+        controller.release()
+        for thread in threads:
+            thread.join()
+
+        assert order == ['interactive', 'bulk']
+
+    def test_full_queue_sheds_bulk_for_interactive(self):
+        """Test a full queue drops a waiting bulk request for an interactive one, and rejects more bulk."""
+        controller = AdmissionController(max_concurrent=1, max_queue=1)
+        order = []
+        controller.acquire()
+        bulk = enqueue(controller, BULK, order, 'bulk')
+        wait_queued(controller, 1)
+
+        with pytest.raises(Overloaded):
+            controller.acquire(BULK)
+        interactive = enqueue(controller, INTERACTIVE, order, 'interactive')
+        bulk.join()
+        controller.release()
+        interactive.join()
+
+        assert order == [('bulk', 'Overloaded'), 'interactive']
+        stats = controller.stats()
+        assert (stats['shed'], stats['rejected']) == (1, 1)
+
+    def test_deadline_expires_while_queued(self):
+        """Test a request is dropped when its deadline passes before a slot frees up."""
+        controller = AdmissionController(max_concurrent=1, max_queue=4)
+        controller.acquire()
+
+        with pytest.raises(DeadlineExceeded):
+            controller.acquire(BULK, deadline=time.perf_counter() + 0.02)
+
+        stats = controller.stats()
+        assert (stats['queued'], stats['expired']) == (0, 1)
+        controller.release()
+        assert controller.stats()['running'] == 0
+
+    def test_expired_before_queueing(self):
+        """Test a request already past its deadline never takes a slot."""
+        controller = AdmissionController(max_concurrent=1, max_queue=4)
+        with pytest.raises(DeadlineExceeded):
+            controller.acquire(BULK, deadline=time.perf_counter() - 1)
+        assert controller.stats()['running'] == 0
+
+@pytest.mark.integration
+class TestAdmissionAPI:
+    def test_expired_deadline(self, client, sample_image):
+        """Test a request whose budget is spent gets 504 without running inference."""
+        with open(sample_image, 'rb') as img, \
+             patch('app.utils.yolo_detector.YOLODetector.detect') as detect:
+            response = client.post('/api/detect?cache=0', data={'file': (img, 'test.png')},
+                                   headers={'X-Request-Timeout-Ms': '0.001'})
+
+        assert response.status_code == 504
+        detect.assert_not_called()
+
+    def test_invalid_deadline(self, client):
+        """Test a malformed budget is rejected."""
+        response = client.get('/api/admission/stats', headers={'X-Request-Timeout-Ms': 'soon'})
+        assert response.status_code == 400
+
+    def test_overloaded(self, app, client, sample_image):
+        """Test a full admission queue answers 503 with Retry-After."""
+        admission = app.extensions['yolo_admission']
+        admission.max_queue = 0
+        for _ in range(admission.max_concurrent):
+            admission.acquire()
+
+        with open(sample_image, 'rb') as img:
+            response = client.post('/api/detect', data={'file': (img, 'test.png')})
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+
+    @pytest.mark.parametrize('route', ['/api/detect/batch', '/api/detect/tiled', '/api/detect/video'])
+    def test_overloaded_bulk_routes(self, app, client, route):
+        """Test batch, tiled and video detection wait for the same admission queue."""
+        admission = app.extensions['yolo_admission']
+        admission.max_queue = 0
+        for _ in range(admission.max_concurrent):
+            admission.acquire()
+        _, encoded = cv2.imencode('.jpg', np.zeros((64, 64, 3), dtype=np.uint8))
+
+        with patch('app.utils.yolo_detector.YOLODetector.predict') as predict:
+            if route == '/api/detect/video':
+                response = client.post(route, data=encoded.tobytes(), content_type='video/x-motion-jpeg')
+            else:
+                response = client.post(route, data={'file': (BytesIO(encoded.tobytes()), 'test.jpg')})
+
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+        predict.assert_not_called()
+
+    def test_expired_deadline_bulk_route(self, client, sample_image):
+        """Test the deadline is checked before the forward passes of a streamed batch."""
+        with open(sample_image, 'rb') as img, \
+             patch('app.utils.yolo_detector.YOLODetector.predict') as predict:
+            response = client.post('/api/detect/batch?cache=0', data={'file': (img, 'test.png')},
+                                   headers={'X-Request-Timeout-Ms': '0.001'})
+
+        assert response.status_code == 504
+        predict.assert_not_called()
+
+    def test_degraded_under_pressure(self, app, client, sample_image):
+        """Test the reduced input size is used and reported."""
+        app.config['DEGRADE_PRESSURE'] = 0.01
+        boxes = [np.array([[0, 0, 10, 10, 0.9, 0]], dtype=np.float32)]
+
+        with open(sample_image, 'rb') as img, \
+             patch('app.utils.yolo_detector.YOLODetector.predict', return_value=boxes) as predict, \
+             patch('app.utils.yolo_detector.YOLODetector.names', {0: 'person'}):
+            response = client.post('/api/detect?cache=0', data={'file': (img, 'test.png')})
+
+        assert response.status_code == 200
+        assert response.headers['X-Degraded'] == 'imgsz=320'
+        assert response.get_json()['degraded'] == ['imgsz=320']
+        assert predict.call_args.kwargs['imgsz'] == 320
+
+    def test_web_detect_skips_annotation(self, app, client, sample_image):
+        """Test interactive requests under pressure come back without the annotated image."""
+        app.config['DEGRADE_PRESSURE'] = 0.01
+        boxes = [np.array([[0, 0, 10, 10, 0.9, 0]], dtype=np.float32)]
+
+        with open(sample_image, 'rb') as img, \
+             patch('app.utils.yolo_detector.YOLODetector.predict', return_value=boxes), \
+             patch('app.utils.yolo_detector.YOLODetector.names', {0: 'person'}):
+            response = client.post('/detect', data={'file': (img, 'test.png')})
+
+        data = response.get_json()
+        assert 'result_image' not in data
+        assert data['degraded'] == ['imgsz=320', 'no-annotation']
@@ -0,0 +1,59 @@
+import pytest
+import numpy as np
+import cv2
+from app.utils.annotate import AnnotationRenderer, encode_image
+
+@pytest.mark.unit
+class TestAnnotationRenderer:
+    def test_render_draws_on_copy(self):
+        """Test boxes are drawn on a copy and the input is left untouched."""
+        image = np.zeros((100, 100, 3), dtype=np.uint8)
+        boxes = np.array([[10, 30, 50, 80, 0.9, 0]], dtype=np.float32)
+        
+        annotated = AnnotationRenderer().render(image, boxes, {0: 'person'})
+        
+        assert not image.any()
+        assert annotated.shape == image.shape
+        # Box outline and label background are drawn in the box color
+        assert tuple(annotated[55, 10]) == (0, 255, 0)
+        assert tuple(annotated[30, 12]) == (0, 255, 0)
+        assert not annotated[55, 30].any()
+
+    def test_label_sizes_cached_per_class(self):
+        """Test text is measured once per class name."""
+        renderer = AnnotationRenderer()
+        image = np.zeros((200, 200, 3), dtype=np.uint8)
+        boxes = np.array([
+            [10, 30, 50, 80, 0.9, 0],
+            [60, 60, 100, 100, 0.5, 0],
+            [120, 120, 180, 180, 0.7, 1]
+        ], dtype=np.float32)
+        
+        renderer.render(image, boxes, {0: 'person', 1: 'car'})
+        
+        assert set(renderer._label_sizes) == {'person', 'car'}
+
+    def test_render_no_boxes(self):
+        """Test an empty result returns an unchanged copy."""
+        image = np.ones((10, 10, 3), dtype=np.uint8)
+        annotated = AnnotationRenderer().render(image, np.zeros((0, 6), dtype=np.float32), {})
+        
+        np.testing.assert_array_equal(annotated, image)
+        assert annotated is not image
+
+@pytest.mark.unit
+class TestEncodeImage:
+    @pytest.mark.parametrize('fmt,mimetype', [('jpeg', 'image/jpeg'), ('webp', 'image/webp')])
+    def test_encode(self, fmt, mimetype):
+        """Test images encode into memory and decode back."""
+        image = np.full((20, 30, 3), 128, dtype=np.uint8)
+        body, result_mimetype = encode_image(image, fmt=fmt, quality=80)
+        
+        assert result_mimetype == mimetype
+        decoded = cv2.imdecode(np.frombuffer(body, np.uint8), cv2.IMREAD_COLOR)
+        assert decoded.shape == (20, 30, 3)
+
+    def test_unsupported_format(self):
+        """Test unknown formats are rejected."""
+        with pytest.raises(ValueError):
+            encode_image(np.zeros((2, 2, 3), dtype=np.uint8), fmt='bmp')
@@ -1,5 +1,10 @@
 import os
+import io
+import json
+import zipfile
 import pytest
+import numpy as np
+import cv2
 from io import BytesIO
 from unittest.mock import patch
 from werkzeug.datastructures import FileStorage
@@ -72,12 +77,24 @@ class TestAPI:
         response = client.post('/api/detect', data=data)
         assert response.status_code == 413  # Request Entity Too Large
 
-    def test_upload_folder_creation(self, app, client, sample_image):
-        """Test upload folder is created if it doesn't exist."""
-        # Remove upload folder if it exists
-        if os.path.exists(app.config['UPLOAD_FOLDER']):
-            os.rmdir(app.config['UPLOAD_FOLDER'])
+    def test_web_detect_writes_nothing(self, app, client, sample_image):
+        """Test the web endpoint returns the annotated image inline instead of saving it."""
+        boxes = np.array([[10, 30, 50, 80, 0.95, 0]], dtype=np.float32)
         
+        with open(sample_image, 'rb') as img, \
+             patch('app.utils.yolo_detector.YOLODetector.predict', return_value=[boxes]), \
+             patch('app.utils.yolo_detector.YOLODetector.names', {0: 'person'}):
+            
+            data = {}
+            data['file'] = (img, 'test.png')
+            response = client.post('/detect', data=data)
+            
+            assert response.status_code == 200
+            assert os.listdir(app.config['UPLOAD_FOLDER']) == []
+            assert response.get_json()['result_image'].startswith('data:image/jpeg;base64,')
+
+    def test_detect_endpoint_writes_nothing(self, app, client, sample_image):
+        """Test the JSON API decodes in memory and never touches the upload folder."""
         mock_results = [
             {
                 'class': 'person',
@@ -87,14 +104,154 @@ class TestAPI:
         ]
 
         with open(sample_image, 'rb') as img, \
-             patch('app.utils.yolo_detector.YOLODetector.detect', return_value=mock_results):
+             patch('app.utils.yolo_detector.YOLODetector.detect', return_value=mock_results) as mock_detect:
             
             data = {}
             data['file'] = (img, 'test.png')
             response = client.post('/api/detect', data=data)
             
             assert response.status_code == 200
-            assert os.path.exists(app.config['UPLOAD_FOLDER'])
+            assert os.listdir(app.config['UPLOAD_FOLDER']) == []
+            image = mock_detect.call_args.args[0]
+            assert image.shape == (100, 100, 3)
+
+    def test_detect_endpoint_undecodable_image(self, client):
+        """Test detect endpoint with an allowed extension but unreadable content."""
+        data = {}
+        data['file'] = (BytesIO(b'not an image'), 'test.png')
+        response = client.post('/api/detect', data=data)
+        assert response.status_code == 400
+        assert b'Invalid image file' in response.data
+
+    def test_detect_endpoint_cache(self, client, sample_image):
+        """Test repeated uploads are served from the result cache unless bypassed."""
+        mock_results = [
+            {
+                'class': 'person',
+                'confidence': 0.95,
+                'bbox': [100, 100, 200, 200]
+            }
+        ]
+
+        with open(sample_image, 'rb') as img:
+            image_bytes = img.read()
+
+        with patch('app.utils.yolo_detector.YOLODetector.detect', return_value=mock_results) as mock_detect:
+            first = client.post('/api/detect', data={'file': (BytesIO(image_bytes), 'test.png')})
+            second = client.post('/api/detect', data={'file': (BytesIO(image_bytes), 'test.png')})
+            bypass = client.post('/api/detect?cache=0', data={'file': (BytesIO(image_bytes), 'test.png')})
+            
+            assert first.headers['X-Cache'] == 'MISS'
+            assert second.headers['X-Cache'] == 'HIT'
+            assert bypass.headers['X-Cache'] == 'BYPASS'
+            assert second.get_json()['detections'] == first.get_json()['detections']
+            assert mock_detect.call_count == 2
+        
+        stats = client.get('/api/cache/stats').get_json()
+        assert stats['enabled'] is True
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+
+    @pytest.mark.parametrize('setting, value', [('YOLO_BACKEND', 'onnx'), ('YOLO_IMGSZ', 320)])
+    def test_detect_endpoint_cache_keyed_by_settings(self, tmp_path, sample_image, setting, value):
+        """Test a restart with another backend or input size misses the persistent cache."""
+        from app import create_app
+        from app.config import TestingConfig
+
+        with open(sample_image, 'rb') as img:
+            image_bytes = img.read()
+
+        def detect(**config):
+            with patch.multiple(TestingConfig, DETECTION_CACHE_DB=str(tmp_path / 'cache.db'), **config):
+                client = create_app('testing').test_client()
+            return client.post('/api/detect', data={'file': (BytesIO(image_bytes), 'test.png')})
+
+        with patch('app.utils.yolo_detector.YOLODetector') as mock_detector:
+            mock_detector.return_value.detect.return_value = []
+            assert detect().headers['X-Cache'] == 'MISS'
+            assert detect().headers['X-Cache'] == 'HIT'
+            assert detect(**{setting: value}).headers['X-Cache'] == 'MISS'
+
+    def test_batch_endpoint_no_file(self, client):
+        """Test batch endpoint without files."""
+        response = client.post('/api/detect/batch')
+        assert response.status_code == 400
+        assert b'No file part' in response.data
+
+    def test_batch_endpoint_streams_ndjson(self, client, sample_image):
+        """Test many files in one request give one NDJSON line each, in order."""
+        with open(sample_image, 'rb') as img:
+            image_bytes = img.read()
+        
+        def fake_batch(images, conf=0.25):
+            return [[{'class': 'person', 'confidence': 0.9, 'bbox': [0, 0, 10, 10]}] for _ in images]
+
+        with patch('app.utils.yolo_detector.YOLODetector.detect_batch', side_effect=fake_batch) as mock_batch:
+            data = {
+                'files': [
+                    (BytesIO(image_bytes), 'a.png'),
+                    (BytesIO(b'not an image'), 'b.txt'),
+                    (BytesIO(b'not an image'), 'c.png'),
+                    (BytesIO(image_bytes), 'd.png')
+                ]
+            }
+            response = client.post('/api/detect/batch?cache=0', data=data)
+            
+            assert response.status_code == 200
+            assert response.mimetype == 'application/x-ndjson'
+            lines = [json.loads(line) for line in response.data.decode().splitlines()]
+            assert [line['filename'] for line in lines] == ['a.png', 'b.txt', 'c.png', 'd.png']
+            assert [line['success'] for line in lines] == [True, False, False, True]
+            assert lines[1]['error'] == 'File type not allowed'
+            assert lines[2]['error'] == 'Invalid image file'
+            assert lines[0]['detections'][0]['class'] == 'person'
+            # Both valid images went through a single forward pass
+            assert mock_batch.call_count == 1
+            assert len(mock_batch.call_args.args[0]) == 2
+
+    def test_batch_endpoint_zip_archive(self, client, sample_image):
+        """Test images inside a zip archive are extracted and detected."""
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zf:
+            zf.write(sample_image, 'one.png')
+            zf.write(sample_image, 'nested/two.png')
+            zf.writestr('notes.txt', 'skipped')
+        archive.seek(0)
+        
+        def fake_batch(images, conf=0.25):
+            return [[] for _ in images]
+
+        with patch('app.utils.yolo_detector.YOLODetector.detect_batch', side_effect=fake_batch):
+            response = client.post('/api/detect/batch', data={'files': (archive, 'images.zip')})
+            
+            lines = [json.loads(line) for line in response.data.decode().splitlines()]
+            assert [line['filename'] for line in lines] == ['one.png', 'nested/two.png']
+            assert all(line['success'] for line in lines)
+
+    def test_video_endpoint_mjpeg_stream(self, client, sample_image):
+        """Test an MJPEG body is split into frames and streamed back per frame."""
+        frame = cv2.imencode('.jpg', cv2.imread(sample_image))[1].tobytes()
+        
+        def fake_predict(images, conf=0.25, imgsz=640):
+            return [np.array([[10, 10, 50, 50, 0.9, 0]], dtype=np.float32) for _ in images]
+
+        with patch('app.utils.yolo_detector.YOLODetector.predict', side_effect=fake_predict), \
+             patch('app.utils.yolo_detector.YOLODetector.names', {0: 'person'}):
+            response = client.post('/api/detect/video?stride=2', data=frame * 3,
+                                   content_type='video/x-motion-jpeg')
+            
+            assert response.status_code == 200
+            lines = [json.loads(line) for line in response.data.decode().splitlines()]
+            assert [line['frame'] for line in lines] == [0, 1, 2]
+            assert [line['keyframe'] for line in lines] == [True, False, True]
+            assert lines[1]['detections'][0]['class'] == 'person'
+
+    def test_video_endpoint_invalid_file(self, client):
+        """Test video endpoint rejects non-video uploads."""
+        data = {'file': (BytesIO(b'not a video'), 'test.txt')}
+        response = client.post('/api/detect/video', data=data)
+        assert response.status_code == 400
+        assert b'File type not allowed' in response.data
 
     # New tests for web interface endpoint
     def test_web_detect_endpoint_no_file(self, client):
@@ -121,16 +278,11 @@ class TestAPI:
 
     def test_web_detect_endpoint_success(self, client, sample_image):
         """Test successful detection through web interface."""
-        mock_results = [
-            {
-                'class': 'person',
-                'confidence': 0.95,
-                'bbox': [100, 100, 200, 200]
-            }
-        ]
+        boxes = np.array([[100, 100, 200, 200, 0.95, 0]], dtype=np.float32)
 
         with open(sample_image, 'rb') as img, \
-             patch('app.utils.yolo_detector.YOLODetector.detect', return_value=mock_results):
+             patch('app.utils.yolo_detector.YOLODetector.predict', return_value=[boxes]), \
+             patch('app.utils.yolo_detector.YOLODetector.names', {0: 'person'}):
             
             data = {}
             data['file'] = (img, 'test.png')
@@ -139,12 +291,40 @@ class TestAPI:
             assert response.status_code == 200
             json_data = response.get_json()
             assert json_data['success'] is True
-            assert 'filename' in json_data
+            assert 'result_image' in json_data
             assert 'detections' in json_data
             assert isinstance(json_data['detections'], list)
             assert len(json_data['detections']) == 1
             assert json_data['detections'][0]['class'] == 'person'
 
+    def test_annotated_endpoint(self, app, client, sample_image):
+        """Test the annotated image comes back as encoded bytes."""
+        boxes = np.array([[10, 30, 50, 80, 0.95, 0]], dtype=np.float32)
+        
+        with open(sample_image, 'rb') as img, \
+             patch('app.utils.yolo_detector.YOLODetector.predict', return_value=[boxes]), \
+             patch('app.utils.yolo_detector.YOLODetector.names', {0: 'person'}):
+            
+            data = {}
+            data['file'] = (img, 'test.png')
+            response = client.post('/api/detect/annotated?format=webp&quality=80', data=data)
+            
+            assert response.status_code == 200
+            assert response.mimetype == 'image/webp'
+            assert response.headers['X-Detections-Count'] == '1'
+            decoded = cv2.imdecode(np.frombuffer(response.data, np.uint8), cv2.IMREAD_COLOR)
+            assert decoded.shape == (100, 100, 3)
+            assert os.listdir(app.config['UPLOAD_FOLDER']) == []
+
+    def test_annotated_endpoint_bad_format(self, client, sample_image):
+        """Test unsupported output formats are rejected."""
+        with open(sample_image, 'rb') as img:
+            data = {}
+            data['file'] = (img, 'test.png')
+            response = client.post('/api/detect/annotated?format=bmp', data=data)
+            
+            assert response.status_code == 400
+
     def test_web_detect_endpoint_large_file(self, client):
         """Test web detect endpoint with file exceeding size limit."""
         # Create a large file (17MB)
@@ -156,4 +336,137 @@ class TestAPI:
         client.application.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB
         
         response = client.post('/detect', data=data)
-        assert response.status_code == 413  # Request Entity Too Large 
\ No newline at end of file
+        assert response.status_code == 413  # Request Entity Too Large 
+    def test_healthz(self, client):
+        """Test the liveness probe answers without loading the model."""
+        response = client.get('/healthz')
+        assert response.status_code == 200
+        assert response.get_json()['status'] == 'ok'
+        assert client.application.extensions['yolo_loader'].detector.loaded is False
+
+    def test_readyz_lazy_mode(self, client):
+        """Test lazy mode reports ready before the model is loaded."""
+        response = client.get('/readyz')
+        assert response.status_code == 200
+        json_data = response.get_json()
+        assert json_data['ready'] is True
+        assert json_data['mode'] == 'lazy'
+        assert json_data['model_loaded'] is False
+
+    def test_readyz_before_warmup(self, client):
+        """Test readiness fails until warm-up has finished."""
+        client.application.extensions['yolo_loader'].mode = 'background'
+        response = client.get('/readyz')
+        assert response.status_code == 503
+        assert response.get_json()['ready'] is False
+
+    def test_tiled_endpoint(self, client):
+        """Test a large image is split into tiles and merged to image coordinates."""
+        image = np.zeros((700, 1300, 3), dtype=np.uint8)
+        ok, encoded = cv2.imencode('.png', image)
+        assert ok
+        
+        def predict(images, conf=0.25):
+            return [np.array([[5, 5, 15, 15, 0.9, 0]], dtype=np.float32) for _ in images]
+        
+        with patch('app.utils.yolo_detector.YOLODetector.predict', side_effect=predict) as mock_predict, \
+             patch('app.utils.yolo_detector.YOLODetector.names', {0: 'person'}):
+            
+            data = {'file': (BytesIO(encoded.tobytes()), 'large.png'), 'tile_size': '640', 'overlap': '0'}
+            response = client.post('/api/detect/tiled?batch_size=4', data=data)
+            
+            assert response.status_code == 200
+            json_data = response.get_json()
+            assert json_data['image_size'] == [1300, 700]
+            # 3 x 2 tiles in batches of 4, plus the full-image pass
+            assert [len(call.args[0]) for call in mock_predict.call_args_list] == [4, 2, 1]
+            assert len(json_data['detections']) > 1
+            assert all(d['class'] == 'person' for d in json_data['detections'])
+
+    def test_tiled_endpoint_bad_overlap(self, client, sample_image):
+        """Test out-of-range tiling parameters are rejected."""
+        with open(sample_image, 'rb') as img:
+            data = {'file': (img, 'test.png'), 'overlap': '1.5'}
+            response = client.post('/api/detect/tiled', data=data)
+            
+            assert response.status_code == 400
+
+    def test_server_timing_header(self, client, sample_image):
+        """Test detection responses report per-stage durations."""
+        mock_results = [{'class': 'person', 'confidence': 0.95, 'bbox': [100, 100, 200, 200]}]
+        
+        with open(sample_image, 'rb') as img, \
+             patch('app.utils.yolo_detector.YOLODetector.detect', return_value=mock_results):
+            response = client.post('/api/detect', data={'file': (img, 'test.png')})
+        
+        stages = [entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')]
+        # The lazy model is loaded by this first request
+        assert stages == ['receive', 'decode', 'model_load', 'serialize', 'total']
+
+    def test_metrics_endpoint(self, client, sample_image):
+        """Test the Prometheus endpoint exposes stage histograms and app gauges."""
+        # Scraping never loads a lazy model
+        assert client.get('/metrics').status_code == 200
+        assert client.application.extensions['yolo_loader'].detector.loaded is False
+        
+        mock_results = [{'class': 'person', 'confidence': 0.95, 'bbox': [100, 100, 200, 200]}]
+        
+        with open(sample_image, 'rb') as img, \
+             patch('app.utils.yolo_detector.YOLODetector.detect', return_value=mock_results):
+            client.post('/api/detect', data={'file': (img, 'test.png')})
+        
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        text = response.get_data(as_text=True)
+        assert 'yolo_stage_seconds_count{stage="decode"}' in text
+        assert 'yolo_request_seconds_count{endpoint="api_detect"}' in text
+        assert 'yolo_cache_lookups_total{result="miss"} 1.0' in text
+        assert 'yolo_queue_depth 0.0' in text
+        assert 'yolo_model_load_seconds' in text
+
+    def test_detect_endpoint_msgpack(self, client, sample_image):
+        """Test the Accept header selects the columnar MessagePack format."""
+        import msgpack
+        boxes = np.array([[10, 30, 50, 80, 0.95, 0]], dtype=np.float32)
+        
+        with open(sample_image, 'rb') as img, \
+             patch('app.utils.yolo_detector.YOLODetector.predict', return_value=[boxes]), \
+             patch('app.utils.yolo_detector.YOLODetector.names', {0: 'person'}):
+            response = client.post('/api/detect', data={'file': (img, 'test.png')},
+                                   headers={'Accept': 'application/msgpack'})
+        
+        assert response.status_code == 200
+        assert response.mimetype == 'application/msgpack'
+        assert 'Accept' in response.headers['Vary']
+        payload = msgpack.unpackb(response.data)
+        np.testing.assert_array_equal(np.frombuffer(payload['boxes'], '<f4'), [10, 30, 50, 80])
+        assert payload['classes'] == {'0': 'person'}
+
+    def test_detect_endpoint_binary_cached(self, client, sample_image):
+        """Test raw float32 responses come from the box cache on repeat requests."""
+        boxes = np.array([[10, 30, 50, 80, 0.95, 0]], dtype=np.float32)
+        
+        with open(sample_image, 'rb') as img:
+            payload = img.read()
+        
+        with patch('app.utils.yolo_detector.YOLODetector.predict', return_value=[boxes]) as mock_predict, \
+             patch('app.utils.yolo_detector.YOLODetector.names', {0: 'person'}):
+            first = client.post('/api/detect?format=binary', data={'file': (BytesIO(payload), 'test.png')})
+            second = client.post('/api/detect?format=binary', data={'file': (BytesIO(payload), 'test.png')})
+        
+        assert first.headers['X-Cache'] == 'MISS'
+        assert second.headers['X-Cache'] == 'HIT'
+        assert mock_predict.call_count == 1
+        np.testing.assert_array_equal(np.frombuffer(second.data, '<f4').reshape(-1, 6), boxes)
+
+    def test_detect_endpoint_not_acceptable(self, client, sample_image):
+        """Test unsupported Accept types get 406 and unknown formats 400."""
+        with open(sample_image, 'rb') as img:
+            response = client.post('/api/detect', data={'file': (img, 'test.png')},
+                                   headers={'Accept': 'text/html'})
+        assert response.status_code == 406
+        
+        with open(sample_image, 'rb') as img:
+            response = client.post('/api/detect?format=xml', data={'file': (img, 'test.png')})
+        assert response.status_code == 400
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import threading
+import time
+import pytest
+import numpy as np
+import cv2
+from io import BytesIO
+from unittest.mock import patch
+from werkzeug.datastructures import FileStorage
+from werkzeug.test import encode_multipart
+from app.asgi import AsyncDetectionApp
+
+def call(asgi_app, method, path, body=b'', headers=(), query_string=b''):
+    """Drive an ASGI app with a single request and collect the response."""
+    return asyncio.run(request(asgi_app, method, path, body, headers, query_string))
+
+async def request(asgi_app, method, path, body=b'', headers=(), query_string=b''):
+    """
+    Send one request to an ASGI app and collect the response.
+
+    ``body`` may be a list of chunks, sent as separate messages like a
+    chunked upload.
+    """
+    scope = {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'raw_path': path.encode(),
+        'root_path': '',
+        'scheme': 'http',
+        'query_string': query_string,
+        'headers': [(k.encode(), v.encode()) for k, v in headers],
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 12345),
+        'http_version': '1.1'
+    }
+    chunks = body if isinstance(body, list) else [body]
+    messages = [{'type': 'http.request', 'body': chunk, 'more_body': i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi_app(scope, receive, send)
+    start = sent[0]
+    body = b''.join(m.get('body', b'') for m in sent[1:])
+    return start['status'], {k.decode(): v.decode() for k, v in start['headers']}, body
+
+def multipart(sample_image, filename='test.png'):
+    with open(sample_image, 'rb') as img:
+        boundary, data = encode_multipart({'file': FileStorage(BytesIO(img.read()), filename=filename)})
+    return data, [('content-type', f'multipart/form-data; boundary={boundary}'),
+                  ('content-length', str(len(data)))]
+
+@pytest.fixture
+def asgi_app(app):
+    return AsyncDetectionApp(app)
+
+@pytest.mark.integration
+class TestASGI:
+    def test_detect(self, asgi_app, sample_image):
+        """Test detection is served natively through the bounded executor."""
+        mock_results = [{'class': 'person', 'confidence': 0.95, 'bbox': [100, 100, 200, 200]}]
+        body, headers = multipart(sample_image)
+        
+        with patch('app.utils.yolo_detector.YOLODetector.detect', return_value=mock_results):
+            status, response_headers, data = call(asgi_app, 'POST', '/api/detect', body, headers)
+        
+        assert status == 200
+        assert response_headers['x-cache'] == 'MISS'
+        assert 'decode;dur=' in response_headers['server-timing']
+        assert 'receive;dur=' in response_headers['server-timing']
+        assert json.loads(data)['detections'][0]['class'] == 'person'
+
+    def test_detect_compact(self, asgi_app, sample_image):
+        """Test the native route negotiates the columnar formats too."""
+        boxes = np.array([[10, 30, 50, 80, 0.95, 0]], dtype=np.float32)
+        body, headers = multipart(sample_image)
+        headers.append(('accept', 'application/vnd.yolo.compact+json'))
+        
+        with patch('app.utils.yolo_detector.YOLODetector.predict', return_value=[boxes]), \
+             patch('app.utils.yolo_detector.YOLODetector.names', {0: 'person'}):
+            status, response_headers, data = call(asgi_app, 'POST', '/api/detect', body, headers)
+        
+        assert status == 200
+        assert response_headers['content-type'] == 'application/vnd.yolo.compact+json'
+        assert response_headers['x-detections-count'] == '1'
+        assert json.loads(data)['classes'] == {'0': 'person'}
+
+    def test_detect_invalid_file(self, asgi_app):
+        """Test the native route keeps the WSGI validation messages."""
+        boundary, body = encode_multipart({'file': FileStorage(BytesIO(b'x'), filename='test.txt')})
+        headers = [('content-type', f'multipart/form-data; boundary={boundary}')]
+        status, _, data = call(asgi_app, 'POST', '/api/detect', body, headers)
+        
+        assert status == 400
+        assert b'File type not allowed' in data
+
+    def test_backpressure(self, asgi_app, sample_image):
+        """Test a full inference queue answers 503 with Retry-After."""
+        asgi_app.pending = asgi_app.max_pending
+        body, headers = multipart(sample_image)
+        status, response_headers, _ = call(asgi_app, 'POST', '/api/detect', body, headers)
+        
+        assert status == 503
+        assert response_headers['retry-after'] == str(asgi_app.retry_after)
+
+    def test_too_large(self, asgi_app):
+        """Test uploads over MAX_CONTENT_LENGTH are refused before reading the body."""
+        headers = [('content-length', str(asgi_app.max_content_length + 1))]
+        status, _, _ = call(asgi_app, 'POST', '/api/detect', b'', headers)
+        assert status == 413
+
+    def test_other_routes_use_wsgi(self, asgi_app):
+        """Test routes without a native handler are passed to Flask."""
+        status, _, data = call(asgi_app, 'GET', '/')
+        assert status == 200
+        assert b'YOLO Object Detection' in data
+
+    def test_wsgi_routes_run_concurrently(self, app):
+        """Test slow pass-through requests do not wait for each other."""
+        @app.route('/slow')
+        def slow():
+            time.sleep(0.3)
+            return 'done'
+        asgi_app = AsyncDetectionApp(app)
+
+        async def burst():
+            return await asyncio.gather(*(request(asgi_app, 'GET', '/slow') for _ in range(4)))
+
+        start = time.perf_counter()
+        responses = asyncio.run(burst())
+        elapsed = time.perf_counter() - start
+
+        assert [status for status, _, _ in responses] == [200] * 4
+        assert elapsed < 0.9
+
+    def test_chunked_mjpeg_upload(self, asgi_app):
+        """Test a chunked MJPEG body without Content-Length reaches the video route in full."""
+        frames = [cv2.imencode('.jpg', np.full((32, 48, 3), value, dtype=np.uint8))[1].tobytes()
+                  for value in (0, 80, 160)]
+        stream = b''.join(frames)
+        chunks = [stream[i:i + 100] for i in range(0, len(stream), 100)]
+
+        with patch('app.utils.yolo_detector.YOLODetector.predict',
+                   side_effect=lambda images, conf=0.25: [np.zeros((0, 6), dtype=np.float32) for _ in images]), \
+             patch('app.utils.yolo_detector.YOLODetector.names', {0: 'person'}):
+            status, _, data = call(asgi_app, 'POST', '/api/detect/video', chunks,
+                                   [('content-type', 'video/x-motion-jpeg'), ('transfer-encoding', 'chunked')])
+
+        assert status == 200
+        assert len(data.splitlines()) == 3
+
+    def test_bulk_queues_behind_interactive(self, app, sample_image):
+        """Test ASGI API requests wait in the shared admission queue, behind web requests."""
+        admission = app.extensions['yolo_admission']
+        admission.max_concurrent = 1
+        asgi_app = AsyncDetectionApp(app)
+        admission.acquire()
+        order = []
+
+        def record(images, conf=0.25, **options):
+            order.append(threading.current_thread().name)
+            return [np.zeros((0, 6), dtype=np.float32) for _ in images]
+
+        def wait_queued(count):
+            deadline = time.monotonic() + 5
+            while admission.stats()['queued'] != count:
+                assert time.monotonic() < deadline, f"expected {count} queued requests"
+                time.sleep(0.005)
+
+        body, headers = multipart(sample_image)
+        with open(sample_image, 'rb') as img:
+            upload = img.read()
+        with patch('app.utils.yolo_detector.YOLODetector.predict', side_effect=record), \
+             patch('app.utils.yolo_detector.YOLODetector.detect',
+                   side_effect=lambda image, conf=0.25: record([image]) and []), \
+             patch('app.utils.yolo_detector.YOLODetector.names', {0: 'person'}):
+            bulk = threading.Thread(target=call, args=(asgi_app, 'POST', '/api/detect', body, headers),
+                                    kwargs={'query_string': b'cache=0'})
+            bulk.start()
+            wait_queued(1)
+            web = threading.Thread(
+                target=lambda: app.test_client().post('/detect?cache=0', data={'file': (BytesIO(upload), 'a.png')}),
+                name='web'
+            )
+            web.start()
+            wait_queued(2)
+            admission.release()
+            bulk.join(5)
+            web.join(5)
+
+        assert order[0] == 'web'
+        assert order[1].startswith('yolo-inference')
+        assert admission.stats()['running'] == 0
+
+    def test_asgi_expired_deadline(self, asgi_app, sample_image):
+        """Test the ASGI front end drops expired requests before inference."""
+        body, headers = multipart(sample_image)
+        with patch('app.utils.yolo_detector.YOLODetector.detect') as detect:
+            status, _, _ = call(asgi_app, 'POST', '/api/detect', body,
+                                headers + [('x-request-timeout-ms', '0.001')])
+
+        assert status == 504
+        detect.assert_not_called()
@@ -0,0 +1,98 @@
+import threading
+import pytest
+import numpy as np
+from unittest.mock import MagicMock
+from app.utils.batcher import BatchScheduler
+
+def make_detector(boxes_per_image=None):
+    """Build a fake detector whose predict returns one box per image."""
+    detector = MagicMock()
+    detector.names = {0: 'person', 1: 'car'}
+
+    def predict(images, conf=0.25, imgsz=640):
+        return [
+            np.array(boxes_per_image or [[100, 100, 200, 200, 0.9, 0], [0, 0, 10, 10, 0.3, 1]],
+                     dtype=np.float32)
+            for _ in images
+        ]
+
+    detector.predict.side_effect = predict
+    return detector
+
+@pytest.mark.unit
+class TestBatchScheduler:
+    def test_single_request(self):
+        """Test a lone request is flushed after the wait expires."""
+        detector = make_detector()
+        scheduler = BatchScheduler(detector, max_batch_size=4, max_wait_ms=5, imgsz=640)
+        try:
+            results = scheduler.detect(np.zeros((640, 640, 3), dtype=np.uint8), conf=0.25)
+        finally:
+            scheduler.close()
+        
+        assert [r['class'] for r in results] == ['person', 'car']
+        assert results[0]['bbox'] == [100.0, 100.0, 200.0, 200.0]
+        detector.predict.assert_called_once()
+
+    def test_concurrent_requests_share_a_batch(self):
+        """Test concurrent callers are grouped into one forward pass."""
+        detector = make_detector()
+        scheduler = BatchScheduler(detector, max_batch_size=4, max_wait_ms=500, imgsz=640)
+        image = np.zeros((640, 640, 3), dtype=np.uint8)
+        results = [None] * 4
+
+        def worker(index):
+            results[index] = scheduler.detect(image)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        try:
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            scheduler.close()
+        
+        assert detector.predict.call_count == 1
+        assert len(detector.predict.call_args.args[0]) == 4
+        assert all(len(r) == 2 for r in results)
+
+    def test_per_request_confidence(self):
+        """Test each caller only sees boxes above its own threshold."""
+        detector = make_detector()
+        scheduler = BatchScheduler(detector, max_batch_size=2, max_wait_ms=500, imgsz=640)
+        image = np.zeros((640, 640, 3), dtype=np.uint8)
+        try:
+            low = scheduler.submit(image, conf=0.25)
+            high = scheduler.submit(image, conf=0.5)
+            low_boxes, high_boxes = low.result(), high.result()
+        finally:
+            scheduler.close()
+        
+        assert detector.predict.call_args.kwargs['conf'] == 0.25
+        assert len(low_boxes) == 2
+        assert len(high_boxes) == 1
+
+    def test_boxes_mapped_to_original_image(self):
+        """Test letterboxed boxes are scaled back to the caller's image size."""
+        detector = make_detector([[0, 160, 640, 480, 0.9, 0]])
+        scheduler = BatchScheduler(detector, max_batch_size=1, max_wait_ms=1, imgsz=640)
+        try:
+            boxes = scheduler.detect_boxes(np.zeros((640, 1280, 3), dtype=np.uint8))
+        finally:
+            scheduler.close()
+        
+        padded = detector.predict.call_args.args[0][0]
+        assert padded.shape == (640, 640, 3)
+        np.testing.assert_allclose(boxes[0, :4], [0, 0, 1280, 640])
+
+    def test_errors_reach_every_caller(self):
+        """Test a failed forward pass is raised in the waiting handler."""
+        detector = make_detector()
+        detector.predict.side_effect = RuntimeError('boom')
+        scheduler = BatchScheduler(detector, max_batch_size=2, max_wait_ms=1)
+        try:
+            with pytest.raises(RuntimeError, match='boom'):
+                scheduler.detect(np.zeros((32, 32, 3), dtype=np.uint8))
+        finally:
+            scheduler.close()
@@ -0,0 +1,75 @@
+import json
+import pytest
+import numpy as np
+import cv2
+from unittest.mock import patch
+from app.utils.benchmark import bench_batch_sizes, bench_latency, compare_results, summarize, synthetic_image
+
+def report(**results):
+    return {'meta': {}, 'results': results}
+
+@pytest.mark.unit
+class TestBenchmarkHelpers:
+    def test_synthetic_image_is_reproducible(self):
+        """Test the same seed always produces the same decodable image."""
+        first = synthetic_image(64, 48, seed=3).getvalue()
+        assert first == synthetic_image(64, 48, seed=3).getvalue()
+        assert first != synthetic_image(64, 48, seed=4).getvalue()
+        
+        image = cv2.imdecode(np.frombuffer(first, np.uint8), cv2.IMREAD_COLOR)
+        assert image.shape == (48, 64, 3)
+
+    def test_summarize(self):
+        """Test percentiles are in milliseconds and throughput uses wall time."""
+        summary = summarize([0.01] * 99 + [0.1], elapsed=2.0)
+        
+        assert summary['requests'] == 100
+        assert summary['p50_ms'] == pytest.approx(10.0)
+        assert summary['p99_ms'] > 10.0
+        assert summary['images_per_second'] == pytest.approx(50.0)
+
+    def test_compare_flags_regressions(self):
+        """Test slower latency and lower throughput beyond tolerance are regressions."""
+        baseline = report(latency={'640x480': {'p95_ms': 100.0, 'requests': 20}},
+                          concurrency={'4': {'images_per_second': 40.0}})
+        current = report(latency={'640x480': {'p95_ms': 105.0, 'requests': 10}},
+                         concurrency={'4': {'images_per_second': 30.0}})
+        
+        rows = {row['metric']: row for row in compare_results(baseline, current, tolerance=0.1)}
+        
+        assert set(rows) == {'latency.640x480.p95_ms', 'concurrency.4.images_per_second'}
+        assert rows['latency.640x480.p95_ms']['regression'] is False
+        assert rows['concurrency.4.images_per_second']['regression'] is True
+        assert rows['concurrency.4.images_per_second']['change'] == pytest.approx(0.25)
+
+@pytest.mark.integration
+class TestBenchmarkRun:
+    def test_latency_and_batch_runs(self, app):
+        """Test the harness drives the real routes and reads streamed bodies."""
+        mock_results = [{'class': 'person', 'confidence': 0.95, 'bbox': [1, 1, 2, 2]}]
+        
+        with patch('app.utils.yolo_detector.YOLODetector.detect', return_value=mock_results) as mock_detect, \
+             patch('app.utils.yolo_detector.YOLODetector.detect_batch',
+                   side_effect=lambda images, conf: [mock_results] * len(images)) as mock_batch:
+            latency = bench_latency(app, [(64, 48)], requests=3, warmup=1)
+            batch = bench_batch_sizes(app, [2], images=4, size=(32, 32))
+        
+        assert latency['64x48']['requests'] == 3
+        # Cache bypassed, every request reaches the model
+        assert mock_detect.call_count == 4
+        assert batch['2']['images_per_second'] > 0
+        assert mock_batch.call_count == 6
+
+    def test_compare_command_gates(self, runner, tmp_path):
+        """Test the compare command exits non-zero on a regression."""
+        baseline = tmp_path / 'baseline.json'
+        current = tmp_path / 'current.json'
+        baseline.write_text(json.dumps(report(latency={'a': {'p50_ms': 10.0}})))
+        current.write_text(json.dumps(report(latency={'a': {'p50_ms': 20.0}})))
+        
+        result = runner.invoke(args=['benchmark', 'compare', str(current), '--baseline', str(baseline)])
+        assert result.exit_code == 1
+        assert 'REGRESSION' in result.output
+        
+        result = runner.invoke(args=['benchmark', 'compare', str(baseline), '--baseline', str(baseline)])
+        assert result.exit_code == 0
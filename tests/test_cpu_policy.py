@@ -0,0 +1,145 @@
+import os
+import runpy
+from types import SimpleNamespace
+import pytest
+import cv2
+import torch
+from unittest.mock import MagicMock, patch
+from app.utils import cpu_policy
+from app.utils.benchmark import thread_combinations
+from app.utils.cpu_policy import CpuPolicy, available_cpus, cgroup_cpu_limit, thread_budget
+
+@pytest.fixture
+def restore_threads(monkeypatch):
+    """Undo the thread settings a policy applies to this process."""
+    for name in cpu_policy.THREAD_ENV:
+        monkeypatch.delenv(name, raising=False)
+    threads, cv2_threads = torch.get_num_threads(), cv2.getNumThreads()
+    yield
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(cv2_threads)
+    monkeypatch.setattr(cpu_policy, '_applied', None)
+
+@pytest.mark.unit
+class TestCpuLimits:
+    def test_cgroup_v2_quota(self, tmp_path):
+        """Test a cgroup v2 cpu.max quota is read as CPUs and 'max' as no limit."""
+        path = tmp_path / 'cpu.max'
+        path.write_text('150000 100000\n')
+        assert cgroup_cpu_limit(v2_path=str(path)) == 1.5
+        path.write_text('max 100000\n')
+        assert cgroup_cpu_limit(v2_path=str(path)) is None
+
+    def test_cgroup_v1_quota(self, tmp_path):
+        """Test the cgroup v1 quota and period files, -1 meaning no limit."""
+        quota, period = tmp_path / 'quota', tmp_path / 'period'
+        quota.write_text('200000')
+        period.write_text('100000')
+        paths = {'v2_path': str(tmp_path / 'missing'), 'v1_quota_path': str(quota), 'v1_period_path': str(period)}
+        assert cgroup_cpu_limit(**paths) == 2.0
+        quota.write_text('-1')
+        assert cgroup_cpu_limit(**paths) is None
+
+    def test_available_cpus_and_budget(self):
+        """Test the quota caps the affinity mask and workers split the rest evenly."""
+        assert available_cpus(cores=list(range(16)), limit=2.5) == 3
+        assert available_cpus(cores=[0, 1], limit=8) == 2
+        assert thread_budget(4, cpus=8) == 2
+        assert thread_budget(3, cpus=2) == 1
+
+    def test_thread_combinations(self):
+        """Test tuning candidates fit in the CPUs unless oversubscribing."""
+        assert thread_combinations(4) == [(1, 1), (1, 2), (1, 4), (2, 1), (2, 2), (4, 1)]
+        assert thread_combinations(2, workers=[2], threads=[2]) == []
+        assert thread_combinations(2, workers=[2], threads=[2], oversubscribe=True) == [(2, 2)]
+
+@pytest.mark.unit
+class TestCpuPolicy:
+    def test_derived_threads_and_core_slices(self):
+        """Test each worker gets its own cores, wrapping when workers outnumber slices."""
+        policy = CpuPolicy(processes=2, pin=True, cores=[0, 1, 2, 3], cpus=4)
+
+        assert policy.threads == 2
+        assert policy.cores_for(0) == [0, 1]
+        assert policy.cores_for(1) == [2, 3]
+        assert policy.cores_for(2) == [0, 1]
+
+    def test_apply(self, restore_threads):
+        """Test applying sets torch and OpenCV pools, the environment and pinning."""
+        policy = CpuPolicy(threads=1, processes=2, pin=True, cores=[0, 1], cpus=2)
+
+        with patch('app.utils.cpu_policy.os.sched_setaffinity', create=True) as mock_affinity:
+            applied = policy.apply(index=1)
+
+        mock_affinity.assert_called_once_with(0, [1])
+        assert applied['pinned_cores'] == [1]
+        assert torch.get_num_threads() == 1
+        assert cv2.getNumThreads() == 1
+        assert os.environ['OMP_NUM_THREADS'] == '1'
+
+    def test_torch_policy_only_in_applying_process(self, restore_threads):
+        """Test a forked process does not inherit the policy for torch."""
+        policy = CpuPolicy(threads=1, cpus=1)
+        cpu_policy._applied = (os.getpid() + 1, policy)
+        with patch.object(policy, 'apply_torch') as mock_apply:
+            cpu_policy.apply_torch_policy(torch)
+            mock_apply.assert_not_called()
+
+            cpu_policy._applied = (os.getpid(), policy)
+            cpu_policy.apply_torch_policy(torch)
+            mock_apply.assert_called_once_with(torch)
+
+@pytest.mark.unit
+class TestGunicornSlots:
+    def test_replacement_reuses_dead_workers_slot(self, monkeypatch):
+        """Test a restarted worker gets the core slice its predecessor held, not a live worker's."""
+        monkeypatch.setenv('YOLO_LOAD_MODE', 'preload')
+        monkeypatch.setenv('WEB_CONCURRENCY', '2')
+        conf = runpy.run_path(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gunicorn.conf.py'))
+        server = SimpleNamespace(WORKERS={})
+
+        first, second = SimpleNamespace(age=1), SimpleNamespace(age=2)
+        for pid, worker in ((101, first), (102, second)):
+            conf['pre_fork'](server, worker)
+            server.WORKERS[pid] = worker
+        del server.WORKERS[102]
+        replacement = SimpleNamespace(age=3)
+        conf['pre_fork'](server, replacement)
+
+        assert (first.cpu_slot, second.cpu_slot) == (0, 1)
+        assert replacement.cpu_slot == 1
+
+    def test_one_worker_runs_jobs(self, monkeypatch):
+        """Test only the worker in slot 0 starts the job runner, the others only warm up."""
+        monkeypatch.setenv('YOLO_LOAD_MODE', 'preload')
+        conf = runpy.run_path(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gunicorn.conf.py'))
+        app = SimpleNamespace(config={'CPU_POLICY': False}, extensions={
+            'yolo_loader': MagicMock(), 'yolo_jobs': MagicMock()
+        })
+        # The ASGI entry point wraps the Flask app, GUNICORN_APP=wsgi:app loads it directly
+        entry_points = [SimpleNamespace(flask_app=app), app, app]
+
+        for slot, loaded in enumerate(entry_points):
+            server = SimpleNamespace(app=SimpleNamespace(wsgi=lambda loaded=loaded: loaded))
+            conf['post_fork'](server, SimpleNamespace(cpu_slot=slot))
+
+        assert app.extensions['yolo_loader'].start_warmup.call_count == 3
+        app.extensions['yolo_jobs'].start.assert_called_once()
+
+@pytest.mark.integration
+class TestPolicyApp:
+    def test_onnx_threads_follow_policy(self, restore_threads):
+        """Test ONNX Runtime gets the policy's thread share unless ONNX_INTRA_OP_THREADS is set."""
+        from app import create_app
+        from app.config import TestingConfig
+
+        def onnx_threads(**config):
+            config = dict({'YOLO_BACKEND': 'onnx', 'CPU_POLICY': True, 'TORCH_THREADS': 3}, **config)
+            with patch.multiple(TestingConfig, **config), \
+                 patch('app.utils.yolo_detector.YOLODetector') as detector:
+                create_app('testing').extensions['yolo'].engine.names
+            return detector.call_args.kwargs['intra_op_threads']
+
+        assert onnx_threads() == 3
+        assert onnx_threads(ONNX_INTRA_OP_THREADS=2) == 2
+        assert onnx_threads(CPU_POLICY=False) == 0
@@ -0,0 +1,79 @@
+import json
+import msgpack
+import pytest
+import numpy as np
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+from app.utils.formats import encode_boxes, negotiate
+
+BOXES = np.array([
+    [10, 20, 30, 40, 0.9, 0],
+    [50, 60, 70, 80, 0.5, 2],
+    [15, 25, 35, 45, 0.7, 0]
+], dtype=np.float32)
+NAMES = {0: 'person', 1: 'bicycle', 2: 'car'}
+
+def accept(value):
+    return parse_accept_header(value, MIMEAccept)
+
+@pytest.mark.unit
+class TestNegotiate:
+    def test_defaults_to_json(self):
+        """Test a missing or wildcard Accept header gets JSON."""
+        assert negotiate(accept(None)) == 'json'
+        assert negotiate(accept('*/*')) == 'json'
+
+    def test_accept_header(self):
+        """Test media types and aliases select the matching format."""
+        assert negotiate(accept('application/msgpack')) == 'msgpack'
+        assert negotiate(accept('application/x-msgpack')) == 'msgpack'
+        assert negotiate(accept('application/vnd.yolo.compact+json, application/json;q=0.5')) == 'compact'
+        assert negotiate(accept('application/octet-stream')) == 'binary'
+        assert negotiate(accept('text/html')) is None
+
+    def test_format_param_wins(self):
+        """Test ?format= overrides the Accept header and rejects unknown names."""
+        assert negotiate(accept('application/json'), 'binary') == 'binary'
+        with pytest.raises(ValueError):
+            negotiate(accept(None), 'xml')
+
+@pytest.mark.unit
+class TestEncodeBoxes:
+    def test_compact(self):
+        """Test compact JSON carries parallel arrays and only the classes present."""
+        body, mimetype, headers = encode_boxes(BOXES, NAMES, 'compact')
+        payload = json.loads(body)
+        
+        assert mimetype == 'application/vnd.yolo.compact+json'
+        assert headers['X-Detections-Count'] == '3'
+        assert payload['boxes'][1] == [50, 60, 70, 80]
+        assert payload['confidences'] == pytest.approx([0.9, 0.5, 0.7])
+        assert payload['class_ids'] == [0, 2, 0]
+        assert payload['classes'] == {'0': 'person', '2': 'car'}
+
+    def test_msgpack(self):
+        """Test MessagePack columns decode back to the original arrays."""
+        body, mimetype, _ = encode_boxes(BOXES, NAMES, 'msgpack')
+        payload = msgpack.unpackb(body)
+        
+        assert mimetype == 'application/msgpack'
+        assert payload['count'] == 3
+        np.testing.assert_array_equal(np.frombuffer(payload['boxes'], '<f4').reshape(-1, 4), BOXES[:, :4])
+        np.testing.assert_array_equal(np.frombuffer(payload['confidences'], '<f4'), BOXES[:, 4])
+        np.testing.assert_array_equal(np.frombuffer(payload['class_ids'], '<u2'), [0, 2, 0])
+        assert payload['classes'] == {'0': 'person', '2': 'car'}
+
+    def test_binary(self):
+        """Test the raw body is little-endian float32 rows with the class table in a header."""
+        body, mimetype, headers = encode_boxes(BOXES, NAMES, 'binary')
+        
+        assert mimetype == 'application/vnd.yolo.boxes'
+        np.testing.assert_array_equal(np.frombuffer(body, '<f4').reshape(-1, 6), BOXES)
+        assert json.loads(headers['X-Classes']) == {'0': 'person', '2': 'car'}
+
+    def test_empty(self):
+        """Test no detections give empty columns."""
+        body, _, headers = encode_boxes(np.zeros((0, 6), dtype=np.float32), NAMES, 'binary')
+        assert body == b''
+        assert headers['X-Detections-Count'] == '0'
+        assert headers['X-Classes'] == '{}'
@@ -0,0 +1,58 @@
+import pytest
+import numpy as np
+import cv2
+from app.utils.image_io import decode_image, decode_image_reduced, letterbox, scale_boxes
+
+@pytest.mark.unit
+class TestImageIO:
+    def test_decode_png(self):
+        """Test encoded bytes decode to a BGR array."""
+        img = np.full((20, 30, 3), 255, dtype=np.uint8)
+        ok, encoded = cv2.imencode('.png', img)
+        assert ok
+        
+        decoded = decode_image(encoded.tobytes())
+        assert decoded.shape == (20, 30, 3)
+        assert decoded.dtype == np.uint8
+
+    def test_decode_invalid(self):
+        """Test garbage and empty payloads return None."""
+        assert decode_image(b'') is None
+        assert decode_image(b'not an image') is None
+
+    def test_letterbox_shape(self):
+        """Test letterboxing keeps aspect ratio and pads to a square."""
+        img = np.zeros((480, 640, 3), dtype=np.uint8)
+        padded, ratio, pad = letterbox(img, 320)
+        
+        assert padded.shape == (320, 320, 3)
+        assert ratio == 0.5
+        assert pad == (0, 40)
+
+    def test_scale_boxes_roundtrip(self):
+        """Test boxes map back from letterboxed to original coordinates."""
+        img = np.zeros((480, 640, 3), dtype=np.uint8)
+        _, ratio, pad = letterbox(img, 320)
+        boxes = np.array([[0, 40, 320, 280, 0.9, 1]], dtype=np.float32)
+        
+        scaled = scale_boxes(boxes, ratio, pad, img.shape[:2])
+        np.testing.assert_allclose(scaled[0], [0, 0, 640, 480, 0.9, 1])
+
+    def test_decode_reduced_jpeg(self):
+        """Test a large JPEG is decoded at the smallest scale still covering the model input."""
+        img = np.zeros((1200, 2560, 3), dtype=np.uint8)
+        ok, encoded = cv2.imencode('.jpg', img)
+        assert ok
+
+        decoded, scale = decode_image_reduced(encoded.tobytes(), 640)
+        assert decoded.shape == (300, 640, 3)
+        assert scale == (4.0, 4.0)
+
+    def test_decode_reduced_keeps_small_and_png(self):
+        """Test images that cannot shrink are decoded at full size."""
+        img = np.zeros((600, 800, 3), dtype=np.uint8)
+        for ext in ('.jpg', '.png'):
+            ok, encoded = cv2.imencode(ext, img)
+            decoded, scale = decode_image_reduced(encoded.tobytes(), 640)
+            assert decoded.shape == (600, 800, 3)
+            assert scale == (1.0, 1.0)
@@ -0,0 +1,84 @@
+import pytest
+import numpy as np
+import cv2
+from io import BytesIO
+from unittest.mock import patch
+from app.utils.inference_options import options_tag, parse_inference_options, rescale_boxes, resolve_classes
+
+NAMES = {0: 'person', 2: 'car', 16: 'dog'}
+
+@pytest.mark.unit
+class TestInferenceOptions:
+    def test_parse(self):
+        """Test present options are parsed and imgsz is rounded up to the stride."""
+        options = parse_inference_options({'imgsz': '500', 'iou': '0.5', 'max_det': '10', 'classes': 'car, 16',
+                                           'half': 'true'})
+        assert options == {'imgsz': 512, 'iou': 0.5, 'max_det': 10, 'classes': ('car', '16'), 'half': True}
+        assert parse_inference_options({}) == {}
+
+    @pytest.mark.parametrize('params', [
+        {'imgsz': '4096'}, {'imgsz': 'big'}, {'iou': '0'}, {'iou': 'x'}, {'max_det': '0'}, {'max_det': '5000'}
+    ])
+    def test_parse_rejects(self, params):
+        """Test out-of-range and malformed values."""
+        with pytest.raises(ValueError):
+            parse_inference_options(params)
+
+    def test_resolve_classes(self):
+        """Test names are case-insensitive and ids are accepted."""
+        assert resolve_classes(['Dog', '2'], NAMES) == (2, 16)
+        with pytest.raises(ValueError):
+            resolve_classes(['unicorn'], NAMES)
+
+    def test_options_tag(self):
+        """Test the cache tag ignores order and unset options."""
+        assert options_tag({'iou': 0.5, 'imgsz': 320, 'half': None}) == options_tag({'imgsz': 320, 'iou': 0.5})
+        assert options_tag({}) == ''
+
+    def test_rescale_boxes(self):
+        """Test reduced-decode coordinates map back to the full-size image."""
+        boxes = np.array([[10, 20, 30, 40, 0.9, 1]], dtype=np.float32)
+        np.testing.assert_allclose(rescale_boxes(boxes, (2.0, 4.0))[0], [20, 80, 60, 160, 0.9, 1])
+
+@pytest.mark.integration
+class TestInferenceOptionsAPI:
+    def test_options_reach_the_model(self, client, sample_image):
+        """Test query options are passed to inference with class names resolved."""
+        boxes = [np.array([[0, 0, 10, 10, 0.9, 2]], dtype=np.float32)]
+
+        with open(sample_image, 'rb') as img, \
+             patch('app.utils.yolo_detector.YOLODetector.predict', return_value=boxes) as predict, \
+             patch('app.utils.yolo_detector.YOLODetector.names', NAMES):
+            response = client.post('/api/detect?cache=0&imgsz=320&iou=0.5&classes=car,dog',
+                                   data={'file': (img, 'test.png')})
+
+        assert response.status_code == 200
+        assert response.get_json()['detections'][0]['class'] == 'car'
+        kwargs = predict.call_args.kwargs
+        assert (kwargs['imgsz'], kwargs['iou'], kwargs['classes']) == (320, 0.5, (2, 16))
+
+    def test_options_reach_tiled_inference(self, client):
+        """Test options set on a tiled upload apply to every tile batch."""
+        _, encoded = cv2.imencode('.png', np.zeros((700, 1300, 3), dtype=np.uint8))
+        boxes = np.array([[0, 0, 10, 10, 0.9, 2]], dtype=np.float32)
+
+        with patch('app.utils.yolo_detector.YOLODetector.predict',
+                   side_effect=lambda images, **kwargs: [boxes] * len(images)) as predict, \
+             patch('app.utils.yolo_detector.YOLODetector.names', NAMES):
+            response = client.post('/api/detect/tiled?iou=0.5', data={
+                'file': (BytesIO(encoded.tobytes()), 'large.png'), 'classes': 'car', 'max_det': '50'
+            })
+
+        assert response.status_code == 200
+        for call in predict.call_args_list:
+            assert (call.kwargs['iou'], call.kwargs['classes'], call.kwargs['max_det']) == (0.5, (2,), 50)
+
+    @pytest.mark.parametrize('query', ['imgsz=99999', 'iou=2', 'classes=unicorn'])
+    @pytest.mark.parametrize('route', ['/api/detect', '/api/detect/tiled'])
+    def test_invalid_options(self, client, sample_image, query, route):
+        """Test bad values and unknown classes are rejected."""
+        with open(sample_image, 'rb') as img, \
+             patch('app.utils.yolo_detector.YOLODetector.names', NAMES):
+            response = client.post(f'{route}?{query}', data={'file': (img, 'test.png')})
+
+        assert response.status_code == 400
@@ -0,0 +1,222 @@
+import io
+import json
+import time
+import threading
+import pytest
+import numpy as np
+import cv2
+from unittest.mock import patch
+from app import create_app
+from app.config import TestingConfig
+from app.utils.jobs import CANCELLED, FAILED, FINISHED, QUEUED, RUNNING, SUCCEEDED, JobRunner, JobStore
+
+def wait_finished(get, job_id, timeout=10):
+    """Poll until a job reaches a final state."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = get(job_id)
+        if job['status'] in FINISHED:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+def store_get(store):
+    return lambda job_id: store.get(job_id).to_dict()
+
+@pytest.mark.unit
+class TestJobStore:
+    def test_claim_is_exclusive_and_ordered(self, tmp_path):
+        """Test the oldest queued job is handed out once."""
+        store = JobStore(str(tmp_path))
+        first = store.create('batch', {'n': 1})
+        second = store.create('batch', {'n': 2})
+
+        assert store.claim('a').id == first.id
+        assert store.claim('b').id == second.id
+        assert store.claim('c') is None
+        assert store.stats()[RUNNING] == 2
+
+    def test_survives_restart_and_requeues_orphans(self, tmp_path):
+        """Test jobs of a process that stopped sending heartbeats run again after a restart."""
+        store = JobStore(str(tmp_path))
+        job = store.create('batch', {'n': 1})
+        store.claim('dead-process')
+        store.close()
+
+        reopened = JobStore(str(tmp_path))
+        assert reopened.requeue_stale(stale_after=60) == 0
+        with patch('app.utils.jobs.time.time', return_value=time.time() + 120):
+            assert reopened.requeue_stale(stale_after=60) == 1
+        assert reopened.get(job.id).status == QUEUED and reopened.get(job.id).params == {'n': 1}
+
+    def test_cancel_queued(self, tmp_path):
+        """Test a queued job is cancelled at once and never claimed."""
+        store = JobStore(str(tmp_path))
+        job = store.create('batch', {})
+
+        assert store.request_cancel(job.id).status == CANCELLED
+        assert store.claim('a') is None
+        assert store.request_cancel('missing') is None
+
+    def test_purge(self, tmp_path):
+        """Test finished jobs past their retention are deleted with their files."""
+        store = JobStore(str(tmp_path))
+        job = store.create('batch', {})
+        store.finish(store.claim('a'), SUCCEEDED)
+
+        with patch('app.utils.jobs.time.time', return_value=time.time() + 100):
+            assert store.purge(max_age=10) == 1
+        assert store.get(job.id) is None
+        assert not (tmp_path / job.id).exists()
+
+@pytest.mark.unit
+class TestJobRunner:
+    def test_runs_jobs_and_reports_progress(self, tmp_path):
+        """Test handler lines end up in the results file with progress counted."""
+        def handler(job):
+            job.total = job.params['frames']
+            for frame in range(job.total):
+                yield json.dumps({'frame': frame}) + '\n'
+
+        store = JobStore(str(tmp_path))
+        runner = JobRunner(store, {'video': handler}, poll_interval=0.01)
+        job = runner.submit('video', {'frames': 3})
+        result = wait_finished(store_get(store), job.id)
+        runner.close()
+
+        assert result['status'] == SUCCEEDED
+        assert result['progress'] == {'done': 3, 'total': 3}
+        with open(store.get(job.id).results_path) as f:
+            assert [json.loads(line)['frame'] for line in f] == [0, 1, 2]
+        assert not (tmp_path / job.id / 'input').exists()
+
+    def test_cancel_running(self, tmp_path):
+        """Test a running job stops at its next result line."""
+        started = threading.Event()
+
+        def handler(job):
+            for frame in range(1000):
+                if frame == 3:
+                    started.set()
+                time.sleep(0.005)
+                yield f"{frame}\n"
+
+        store = JobStore(str(tmp_path))
+        runner = JobRunner(store, {'video': handler}, poll_interval=0.01)
+        job = runner.submit('video', {})
+        started.wait(5)
+        runner.cancel(job.id)
+        result = wait_finished(store_get(store), job.id)
+        runner.close()
+
+        assert result['status'] == CANCELLED
+        assert 0 < result['progress']['done'] < 1000
+
+    def test_concurrency_limit_and_failure(self, tmp_path):
+        """Test at most max_concurrent jobs run at once and handler errors fail the job."""
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def handler(job):
+            with lock:
+                running.append(job.id)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.remove(job.id)
+            if job.params['fail']:
+                raise ValueError('Invalid video file')
+            yield 'done\n'
+
+        store = JobStore(str(tmp_path))
+        runner = JobRunner(store, {'batch': handler}, max_concurrent=2, poll_interval=0.01)
+        submitted = [runner.submit('batch', {'fail': index == 0}) for index in range(5)]
+        results = [wait_finished(store_get(store), job.id) for job in submitted]
+        runner.close()
+
+        assert max(peak) <= 2
+        assert results[0]['status'] == FAILED and results[0]['error'] == 'Invalid video file'
+        assert all(result['status'] == SUCCEEDED for result in results[1:])
+
+    def test_unknown_kind(self, tmp_path):
+        """Test only kinds with a handler are accepted."""
+        runner = JobRunner(JobStore(str(tmp_path)), {})
+        with pytest.raises(ValueError):
+            runner.submit('tiled', {})
+
+@pytest.fixture
+def jobs_app(tmp_path):
+    """App with the job queue enabled under a temporary directory."""
+    with patch.object(TestingConfig, 'JOBS_ENABLED', True), \
+         patch.object(TestingConfig, 'JOBS_DIR', str(tmp_path)), \
+         patch.object(TestingConfig, 'JOBS_POLL_INTERVAL', 0.01):
+        app = create_app('testing')
+    yield app
+    app.extensions['yolo_jobs'].close()
+
+@pytest.mark.integration
+class TestJobsAPI:
+    def test_disabled_by_default(self, client):
+        """Test the job API answers 404 unless enabled."""
+        assert client.get('/api/jobs').get_json() == {'enabled': False}
+        assert client.post('/api/jobs', data={'file': (io.BytesIO(b'x'), 'a.png')}).status_code == 404
+
+    def test_batch_job(self, jobs_app, sample_image):
+        """Test a job is accepted at once and its results fetched when done."""
+        client = jobs_app.test_client()
+        detections = [{'class': 'person', 'confidence': 0.9, 'bbox': [0, 0, 10, 10]}]
+
+        with open(sample_image, 'rb') as img, \
+             patch('app.utils.yolo_detector.YOLODetector.detect_batch', return_value=[detections]):
+            response = client.post('/api/jobs?cache=0', data={
+                'files': [(img, 'test.png'), (io.BytesIO(b'text'), 'notes.txt')]
+            })
+            assert response.status_code == 202
+            job_id = response.get_json()['id']
+            assert response.headers['Location'].endswith(f'/api/jobs/{job_id}')
+            status = wait_finished(lambda job_id: client.get(f'/api/jobs/{job_id}').get_json(), job_id)
+
+        assert status['status'] == SUCCEEDED
+        assert status['progress'] == {'done': 2, 'total': 2}
+        lines = [json.loads(line) for line in client.get(status['results']).data.splitlines()]
+        assert lines[0] == {'filename': 'test.png', 'success': True, 'detections': detections}
+        assert lines[1]['success'] is False
+        assert client.get('/api/jobs').get_json()['stats'][SUCCEEDED] == 1
+
+    def test_video_job(self, jobs_app, tmp_path):
+        """Test a video runs as one job with a result line per frame."""
+        path = str(tmp_path / 'clip.avi')
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (48, 32))
+        for _ in range(4):
+            writer.write(np.zeros((32, 48, 3), dtype=np.uint8))
+        writer.release()
+        client = jobs_app.test_client()
+
+        with open(path, 'rb') as video, \
+             patch('app.utils.yolo_detector.YOLODetector.predict',
+                   side_effect=lambda images, **kwargs: [np.zeros((0, 6), dtype=np.float32) for _ in images]) as predict, \
+             patch('app.utils.yolo_detector.YOLODetector.names', {0: 'person'}):
+            job_id = client.post('/api/jobs?stride=2&iou=0.5&classes=person',
+                                 data={'file': (video, 'clip.avi')}).get_json()['id']
+            status = wait_finished(lambda job_id: client.get(f'/api/jobs/{job_id}').get_json(), job_id)
+
+        assert status['kind'] == 'video' and status['status'] == SUCCEEDED
+        frames = [json.loads(line) for line in client.get(status['results']).data.splitlines()]
+        assert [frame['keyframe'] for frame in frames] == [True, False, True, False]
+        assert (predict.call_args.kwargs['iou'], predict.call_args.kwargs['classes']) == (0.5, (0,))
+
+    def test_unknown_job(self, jobs_app):
+        """Test status, results and cancellation of a job that does not exist."""
+        client = jobs_app.test_client()
+        assert client.get('/api/jobs/nope').status_code == 404
+        assert client.get('/api/jobs/nope/results').status_code == 404
+        assert client.delete('/api/jobs/nope').status_code == 404
+
+    def test_video_with_other_files(self, jobs_app):
+        """Test a video job must be a single file."""
+        client = jobs_app.test_client()
+        response = client.post('/api/jobs', data={
+            'files': [(io.BytesIO(b'v'), 'clip.mp4'), (io.BytesIO(b'i'), 'a.png')]
+        })
+        assert response.status_code == 400
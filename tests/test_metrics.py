@@ -0,0 +1,57 @@
+import pytest
+from unittest.mock import MagicMock
+from prometheus_client import CollectorRegistry, generate_latest
+from app.utils.metrics import REGISTRY, AppCollector, end_request, stage, start_request
+
+def stage_count(name):
+    return REGISTRY.get_sample_value('yolo_stage_seconds_count', {'stage': name}) or 0
+
+@pytest.mark.unit
+class TestStageTimings:
+    def test_stage_recorded_in_request(self):
+        """Test stages add up per request and feed the histogram."""
+        before = stage_count('test-stage')
+        timings, token = start_request()
+        try:
+            with stage('test-stage'):
+                pass
+            with stage('test-stage'):
+                pass
+        finally:
+            end_request(token)
+        
+        after = stage_count('test-stage')
+        assert after - before == 2
+        assert list(timings.stages) == ['test-stage']
+        header = timings.server_timing()
+        assert header.startswith('test-stage;dur=')
+        assert header.split(', ')[-1].startswith('total;dur=')
+
+    def test_stage_outside_request(self):
+        """Test stages outside a request only reach the histogram."""
+        before = stage_count('background')
+        with stage('background'):
+            pass
+        after = stage_count('background')
+        assert after - before == 1
+
+@pytest.mark.unit
+class TestAppCollector:
+    def test_collects_engine_cache_and_loader(self):
+        """Test scrape-time gauges are read from the app's components."""
+        engine = MagicMock(queue_depth=3, loaded=True)
+        cache = MagicMock()
+        cache.stats.return_value = {'hits': 2, 'disk_hits': 1, 'misses': 1, 'hit_rate': 0.75, 'entries': 3}
+        loader = MagicMock()
+        loader.status.return_value = {'load_seconds': 1.5, 'warmup_seconds': None, 'ready': True}
+        registry = CollectorRegistry()
+        registry.register(AppCollector(engine, cache=cache, loader=loader))
+        
+        text = generate_latest(registry).decode()
+        
+        assert 'yolo_queue_depth 3.0' in text
+        assert 'yolo_cache_hit_ratio 0.75' in text
+        assert 'yolo_cache_lookups_total{result="hit"} 2.0' in text
+        assert 'yolo_model_load_seconds 1.5' in text
+        assert 'yolo_model_warmup_seconds 0.0' in text
+        assert 'yolo_model_ready 1.0' in text
@@ -0,0 +1,92 @@
+import threading
+import pytest
+from unittest.mock import MagicMock
+from app.utils.model_loader import LazyModel, ModelLoader
+
+@pytest.mark.unit
+class TestLazyModel:
+    def test_loads_on_first_access(self):
+        """Test the factory runs on first attribute access only."""
+        factory = MagicMock()
+        factory.return_value.names = {0: 'person'}
+        model = LazyModel(factory)
+        
+        assert model.loaded is False
+        factory.assert_not_called()
+        assert model.names == {0: 'person'}
+        assert model.names == {0: 'person'}
+        assert model.loaded is True
+        assert model.load_seconds is not None
+        factory.assert_called_once()
+
+    def test_concurrent_loads_build_once(self):
+        """Test racing threads share a single load."""
+        calls = []
+        
+        def factory():
+            calls.append(1)
+            return object()
+        
+        model = LazyModel(factory)
+        threads = [threading.Thread(target=model.load) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        
+        assert len(calls) == 1
+
+@pytest.mark.unit
+class TestModelLoader:
+    def test_warm_up_runs_each_size(self):
+        """Test warm-up runs one dummy inference per size and sets ready."""
+        detector = LazyModel(MagicMock)
+        loader = ModelLoader(detector, detector, mode='background', warmup_sizes=(320, 640))
+        
+        assert loader.ready is False
+        loader.start()
+        assert loader.wait_ready(timeout=5)
+        
+        shapes = [call.args[0][0].shape for call in detector.predict.call_args_list]
+        assert shapes == [(320, 320, 3), (640, 640, 3)]
+        assert loader.status()['warmup_seconds'] is not None
+
+    def test_warm_up_error_is_reported(self):
+        """Test a failed warm-up leaves the loader not ready."""
+        engine = MagicMock()
+        engine.predict.side_effect = RuntimeError('boom')
+        loader = ModelLoader(engine, LazyModel(MagicMock), mode='background')
+        
+        loader.warm_up()
+        
+        assert loader.ready is False
+        assert loader.status()['error'] == 'RuntimeError: boom'
+
+    def test_preload_prepares_detector(self):
+        """Test preload loads and fuses the model without inference."""
+        detector = LazyModel(MagicMock)
+        loader = ModelLoader(detector, detector, mode='preload')
+        
+        loader.start()
+        
+        assert detector.loaded is True
+        detector.prepare.assert_called_once()
+        detector.predict.assert_not_called()
+        assert loader.ready is False
+
+    def test_preload_skips_worker_pool(self):
+        """Test preload with a worker pool engine builds neither the pool nor the detector."""
+        built = []
+        detector = LazyModel(lambda: built.append('detector'))
+        pool = LazyModel(lambda: built.append('pool'))
+        loader = ModelLoader(pool, detector, mode='preload')
+        
+        loader.start()
+        
+        assert built == []
+        assert pool.loaded is False
+
+    def test_unknown_mode(self):
+        """Test an unknown load mode is rejected."""
+        with pytest.raises(ValueError):
+            ModelLoader(MagicMock(), MagicMock(), mode='eager')
@@ -0,0 +1,203 @@
+import pytest
+import numpy as np
+import cv2
+from io import BytesIO
+from unittest.mock import MagicMock
+from app.utils.boxes import boxes_to_detections
+from app.utils.model_registry import CascadeEngine, ModelRegistry, UnknownModelError, parse_models
+from app.utils.result_cache import DetectionCache
+
+def fake_engine(confidence=0.9):
+    """Engine returning one box with the given confidence per image."""
+    engine = MagicMock()
+    engine.names = {0: 'person'}
+    engine.loaded = True
+    engine.predict.side_effect = lambda images, conf=0.25, **options: [
+        np.array([[0, 0, 10, 10, confidence, 0]], dtype=np.float32) for _ in images
+    ]
+    engine.detect.side_effect = lambda image, conf=0.25: boxes_to_detections(engine.predict([image])[0], engine.names)
+    return engine
+
+def make_registry(**options):
+    engines = {}
+
+    def build(weights):
+        engines[weights] = fake_engine()
+        return engines[weights]
+
+    sizes = {'n.pt': 10, 's.pt': 30, 'm.pt': 60}
+    registry = ModelRegistry(build, models={'s': 's.pt', 'm': 'm.pt'}, sizer=lambda w: sizes.get(w, 0), **options)
+    registry.register('n', 'n.pt', fake_engine(), pinned=True)
+    return registry, engines
+
+@pytest.mark.unit
+class TestModelRegistry:
+    def test_parse_models(self):
+        """Test named and unnamed entries."""
+        assert parse_models('small=models/a.pt, models/yolov8m.pt') == {'small': 'models/a.pt', 'yolov8m': 'models/yolov8m.pt'}
+        assert parse_models('') == {}
+
+    def test_resolve(self):
+        """Test default aliases and unknown names."""
+        registry, _ = make_registry()
+        assert registry.resolve(None) == registry.resolve('default') == 'n'
+        assert registry.resolve('s') == 's'
+        with pytest.raises(UnknownModelError):
+            registry.resolve('x')
+        with pytest.raises(UnknownModelError):
+            registry.resolve('cascade')
+
+    def test_loads_on_demand_once(self):
+        """Test a model is built on first use and reused afterwards."""
+        registry, engines = make_registry()
+        with registry.acquire('s') as first:
+            pass
+        with registry.acquire('s') as second:
+            pass
+
+        assert first is second and list(engines) == ['s.pt']
+        assert registry.stats()['loads'] == 1
+
+    def test_lru_eviction_under_budget(self):
+        """Test the least recently used model is unloaded, the pinned default never."""
+        registry, engines = make_registry(memory_budget_mb=75)
+        with registry.acquire('s'):
+            pass
+        with registry.acquire('m'):
+            pass
+
+        loaded = [entry['name'] for entry in registry.stats()['loaded']]
+        assert loaded == ['n', 'm']
+        engines['s.pt'].close.assert_called_once()
+
+    def test_eviction_waits_for_in_flight(self):
+        """Test a model evicted while in use is closed after the request ends."""
+        registry, engines = make_registry(memory_budget_mb=75)
+        with registry.acquire('s'):
+            with registry.acquire('m'):
+                pass
+            engines['s.pt'].close.assert_not_called()
+        engines['s.pt'].close.assert_called_once()
+
+    def test_swap_is_atomic(self):
+        """Test in-flight requests finish on the old model, new ones get the warmed-up replacement."""
+        registry, engines = make_registry(warmup_sizes=(32,))
+        with registry.acquire('s') as old:
+            registry.swap('s', 's2.pt')
+            old.engine.close.assert_not_called()
+            with registry.acquire('s') as new:
+                assert new.engine is engines['s2.pt']
+
+        old.engine.close.assert_called_once()
+        engines['s2.pt'].predict.assert_called_once()
+        assert new.key == 's2.pt' and registry.stats()['swaps'] == 1
+
+    def test_swap_rewritten_weights_misses_cache(self, tmp_path):
+        """Test weights rewritten at the same path are not served detections cached for the old file."""
+        weights = tmp_path / 'model.pt'
+        weights.write_bytes(b'v1')
+        registry = ModelRegistry(lambda w: fake_engine(), models={'a': str(weights)},
+                                 cache=DetectionCache(max_entries=8, ttl=60), warmup_sizes=())
+        _, encoded = cv2.imencode('.png', np.zeros((32, 32, 3), dtype=np.uint8))
+        data = encoded.tobytes()
+
+        def detect():
+            with registry.acquire('a') as entry:
+                return entry.service.detect_bytes(data)[1]
+
+        assert [detect(), detect()] == ['MISS', 'HIT']
+        weights.write_bytes(b'v2')
+        registry.swap('a', str(weights))
+        assert detect() == 'MISS'
+
+    def test_failed_swap_keeps_old_model(self):
+        """Test a model that fails to warm up never replaces the current one."""
+        registry, _ = make_registry()
+        registry.build = MagicMock(return_value=MagicMock(predict=MagicMock(side_effect=RuntimeError('bad'))))
+
+        with pytest.raises(RuntimeError):
+            registry.swap('n', 'broken.pt')
+        with registry.acquire() as entry:
+            assert entry.weights == 'n.pt'
+
+@pytest.mark.unit
+class TestCascade:
+    def test_escalates_only_uncertain_images(self):
+        """Test the large model only sees images with low-confidence detections."""
+        small = MagicMock(names={0: 'person'})
+        small.predict.return_value = [
+            np.array([[0, 0, 10, 10, 0.9, 0]], dtype=np.float32),
+            np.array([[0, 0, 10, 10, 0.3, 0]], dtype=np.float32),
+            np.zeros((0, 6), dtype=np.float32)
+        ]
+        large = fake_engine(confidence=0.8)
+
+        results = CascadeEngine(small, large, escalate_conf=0.5).predict(['a', 'b', 'c'])
+
+        large.predict.assert_called_once_with(['b'], conf=0.25)
+        np.testing.assert_allclose([r[:, 4].tolist() for r in results[:2]], [[0.9], [0.8]])
+        assert len(results[2]) == 0
+
+    def test_registry_cascade(self):
+        """Test 'cascade' holds both models for the request."""
+        registry, engines = make_registry(cascade=('n', 'm'), cascade_conf=0.95)
+        with registry.acquire('cascade') as entry:
+            detections = entry.engine.detect(np.zeros((8, 8, 3), dtype=np.uint8))
+            assert [e['in_flight'] for e in registry.stats()['loaded']] == [1, 1]
+
+        assert detections[0]['class'] == 'person'
+        engines['m.pt'].predict.assert_called_once()
+        assert entry.key.startswith('cascade:n.pt>m.pt')
+
+@pytest.mark.integration
+class TestModelAPI:
+    def test_unknown_model(self, client):
+        """Test an unconfigured model name is rejected."""
+        data = {'file': (BytesIO(b'fake'), 'test.png')}
+        response = client.post('/api/detect?model=nope', data=data)
+        assert response.status_code == 400
+        assert b'Unknown model' in response.data
+
+    def test_list_models(self, client):
+        """Test the default model is listed without being loaded."""
+        stats = client.get('/api/models').get_json()
+        assert stats['default'] == 'yolov8n'
+        assert stats['loaded'][0]['pinned'] is True
+
+    def test_swap_disabled(self, client):
+        """Test hot-swapping needs YOLO_MODEL_ADMIN."""
+        response = client.put('/api/models/yolov8n', json={'weights': 'yolov8s.pt'})
+        assert response.status_code == 403
+
+    def test_swap_default_updates_readiness_and_metrics(self, app, client):
+        """Test readiness, metrics and the default service follow a swap of the default model."""
+        app.config['YOLO_MODEL_ADMIN'] = True
+        registry = app.extensions['yolo_models']
+        engine = fake_engine()
+        engine.queue_depth = 7
+        engine.load_seconds = 0.5
+        registry.build = lambda weights: engine
+        registry.warmup_sizes = (32,)
+
+        assert client.put('/api/models/yolov8n', json={'weights': 'yolov8s.pt'}).status_code == 200
+
+        status = client.get('/readyz').get_json()
+        assert status['model_loaded'] is True and status['load_seconds'] == 0.5
+        assert 'yolo_queue_depth 7.0' in client.get('/metrics').get_data(as_text=True)
+        assert app.extensions['yolo'].engine is engine
+
+    def test_swap_and_select(self, app, client, sample_image):
+        """Test a swapped-in model serves requests that select it."""
+        app.config['YOLO_MODEL_ADMIN'] = True
+        registry = app.extensions['yolo_models']
+        registry.build = lambda weights: fake_engine()
+        registry.warmup_sizes = (32,)
+
+        response = client.put('/api/models/small', json={'weights': 'small.pt'})
+        assert response.status_code == 200
+
+        with open(sample_image, 'rb') as img:
+            response = client.post('/api/detect?model=small&cache=0', data={'file': (img, 'test.png')})
+        assert response.status_code == 200
+        assert response.headers['X-Model'] == 'small'
+        assert response.get_json()['detections'][0]['class'] == 'person'
@@ -0,0 +1,108 @@
+import os
+import pytest
+import numpy as np
+import cv2
+from unittest.mock import patch
+from app.utils.boxes import box_iou
+from app.utils.onnx_backend import export_onnx, file_digest
+from app.utils.yolo_detector import YOLODetector
+
+ASSETS = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'assets')
+
+@pytest.mark.unit
+class TestOnnxExport:
+    def test_export_is_cached(self, tmp_path):
+        """Test the model is exported once and reused while the weights are unchanged."""
+        weights = os.path.join(tmp_path, 'weights.pt')
+        with open(weights, 'wb') as f:
+            f.write(b'weights')
+        
+        def fake_export(format, imgsz, dynamic):
+            path = os.path.join(tmp_path, 'exported.onnx')
+            with open(path, 'wb') as f:
+                f.write(b'onnx')
+            return path
+
+        with patch('ultralytics.YOLO') as mock_yolo:
+            mock_yolo.return_value.ckpt_path = weights
+            mock_yolo.return_value.export.side_effect = fake_export
+            cache_dir = os.path.join(tmp_path, 'cache')
+            
+            first = export_onnx(weights, cache_dir, 640)
+            second = export_onnx(weights, cache_dir, 640)
+            
+            assert first == second
+            assert os.path.basename(first).startswith('weights-')
+            assert os.path.exists(first)
+            mock_yolo.return_value.export.assert_called_once()
+
+    def test_cache_hit_skips_model_load(self, tmp_path):
+        """Test a cached export is found from the weights file alone, without building the model."""
+        weights = os.path.join(tmp_path, 'weights.pt')
+        with open(weights, 'wb') as f:
+            f.write(b'weights')
+        cache_dir = os.path.join(tmp_path, 'cache')
+        os.makedirs(cache_dir)
+        cached = os.path.join(cache_dir, f"weights-{file_digest(weights)}-640.onnx")
+        with open(cached, 'wb') as f:
+            f.write(b'onnx')
+
+        with patch('ultralytics.YOLO') as mock_yolo:
+            assert export_onnx(weights, cache_dir, 640) == cached
+            mock_yolo.assert_not_called()
+
+    def test_external_data_folded_into_cache(self, tmp_path):
+        """Test weights the exporter put in a side file end up inside the cached model."""
+        import onnx
+        from onnx import TensorProto, helper, numpy_helper
+
+        weights = os.path.join(tmp_path, 'weights.pt')
+        with open(weights, 'wb') as f:
+            f.write(b'weights')
+
+        def fake_export(format, imgsz, dynamic):
+            path = os.path.join(tmp_path, 'weights.onnx')
+            scale = numpy_helper.from_array(np.full((4,), 2.0, dtype=np.float32), 'scale')
+            graph = helper.make_graph(
+                [helper.make_node('Mul', ['x', 'scale'], ['y'])], 'g',
+                [helper.make_tensor_value_info('x', TensorProto.FLOAT, [4])],
+                [helper.make_tensor_value_info('y', TensorProto.FLOAT, [4])],
+                initializer=[scale]
+            )
+            onnx.save_model(helper.make_model(graph), path, save_as_external_data=True,
+                            location='weights.onnx.data', size_threshold=0)
+            return path
+
+        with patch('ultralytics.YOLO') as mock_yolo:
+            mock_yolo.return_value.ckpt_path = weights
+            mock_yolo.return_value.export.side_effect = fake_export
+            cached = export_onnx(weights, os.path.join(tmp_path, 'cache'), 640)
+
+        assert not os.path.exists(os.path.join(tmp_path, 'weights.onnx.data'))
+        assert os.listdir(os.path.dirname(cached)) == [os.path.basename(cached)]
+        model = onnx.load(cached, load_external_data=False)
+        assert numpy_helper.to_array(model.graph.initializer[0]).tolist() == [2.0] * 4
+
+@pytest.mark.slow
+class TestOnnxParity:
+    def test_detections_match_torch(self, tmp_path):
+        """Test ONNX Runtime detections match PyTorch within tolerance."""
+        images = [cv2.imread(os.path.join(ASSETS, name)) for name in ('1.png', '2.png')]
+        torch_detector = YOLODetector('yolov8n.pt')
+        onnx_detector = YOLODetector('yolov8n.pt', backend='onnx', cache_dir=str(tmp_path))
+        
+        for image in images:
+            expected = torch_detector.predict([image], conf=0.25)[0]
+            actual = onnx_detector.predict([image], conf=0.25)[0]
+            
+            # Borderline boxes may fall either side of the threshold, compare confident ones
+            confident = expected[expected[:, 4] > 0.35]
+            assert len(actual) >= len(confident)
+            if not len(confident):
+                continue
+            
+            iou = box_iou(confident, actual)
+            iou[confident[:, 5][:, None] != actual[:, 5][None, :]] = 0
+            best = iou.argmax(axis=1)
+            assert (iou.max(axis=1) > 0.9).all()
+            np.testing.assert_allclose(actual[best, 4], confident[:, 4], atol=0.05)
@@ -0,0 +1,94 @@
+import json
+import time
+import threading
+import pytest
+import torch
+from unittest.mock import patch
+from app.utils import profiling
+from app.utils.profiling import Profiler, StackSampler, forward_section
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+@pytest.mark.unit
+class TestProfiler:
+    def test_stack_sampler_speedscope(self):
+        """Test other threads' stacks are sampled into a speedscope profile per thread."""
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_loop, args=(stop,), name='busy')
+        worker.start()
+        sampler = StackSampler(interval=0.001)
+        sampler.start()
+        time.sleep(0.05)
+        sampler.stop()
+        stop.set()
+        worker.join()
+
+        profile = sampler.to_speedscope('test')
+        busy = next(p for p in profile['profiles'] if p['name'] == 'busy')
+        names = {profile['shared']['frames'][i]['name'] for sample in busy['samples'] for i in sample}
+        assert 'busy_loop' in names
+        assert len(busy['samples']) == len(busy['weights']) > 0
+
+    def test_off_by_default(self, tmp_path):
+        """Test nothing is captured or written unless armed."""
+        profiler = Profiler(str(tmp_path))
+        assert profiler.start('api_detect') is None
+        assert isinstance(forward_section(), type(profiling._NULL))
+        assert list(tmp_path.iterdir()) == []
+
+    def test_armed_count(self, tmp_path):
+        """Test exactly the armed number of requests is profiled."""
+        profiler = Profiler(str(tmp_path), torch_ops=False)
+        profiler.arm(2)
+        captures = [profiler.start('api_detect') for _ in range(3)]
+
+        assert captures[2] is None
+        for capture in captures[:2]:
+            capture.stop()
+        summary = profiler.summary()
+        assert summary['requests'] == 2 and summary['remaining'] == 0
+        assert len(list(tmp_path.glob('*.speedscope.json'))) == 2
+        assert json.loads((tmp_path / 'summary.json').read_text())['requests'] == 2
+
+    def test_forward_pass_ops(self, tmp_path):
+        """Test forward passes during a capture are traced and their ops summed up."""
+        profiler = Profiler(str(tmp_path), labels={'backend': 'torch'})
+        profiler.arm(1)
+        capture = profiler.start('api_detect')
+        with forward_section():
+            torch.ones(8, 8) @ torch.ones(8, 8)
+        capture.stop()
+
+        summary = profiler.summary()
+        assert summary['captures'][0]['forward_passes'] == 1
+        assert any('mm' in op['name'] for op in summary['ops'])
+        assert summary['labels'] == {'backend': 'torch'}
+        assert len(list(tmp_path.glob('*-forward1.trace.json'))) == 1
+        assert profiling._forward_capture is None
+
+@pytest.mark.integration
+class TestProfileAPI:
+    def test_arming_needs_admin(self, client):
+        """Test the profiler can only be armed when enabled."""
+        assert client.post('/api/profile', json={'requests': 1}).status_code == 403
+        assert client.get('/api/profile').get_json()['requests'] == 0
+
+    def test_profiles_requests(self, app, client, sample_image, tmp_path):
+        """Test an armed profiler captures the next detection request and serves its files."""
+        app.config['PROFILE_ADMIN'] = True
+        app.extensions['yolo_profiler'].directory = str(tmp_path)
+        assert client.post('/api/profile', json={'requests': 1, 'torch': False}).status_code == 200
+
+        with open(sample_image, 'rb') as img, \
+             patch('app.utils.yolo_detector.YOLODetector.detect', return_value=[]):
+            client.post('/api/detect?cache=0', data={'file': (img, 'test.png')})
+        client.get('/api/cache/stats')
+
+        summary = client.get('/api/profile').get_json()
+        assert summary['requests'] == 1 and summary['remaining'] == 0
+        assert 'total' in summary['stages_ms']
+        filename = summary['captures'][0]['files'][0]
+        assert filename.endswith('-api_detect.speedscope.json')
+        assert client.get(f'/api/profile/files/{filename}').status_code == 200
@@ -0,0 +1,64 @@
+import os
+import pytest
+import numpy as np
+import cv2
+from unittest.mock import MagicMock, patch
+from app.utils.quantization import compare_models, quantize_model
+
+def fake_detector(boxes):
+    detector = MagicMock()
+    detector.predict.return_value = [np.array(boxes, dtype=np.float32).reshape(-1, 6)]
+    return detector
+
+@pytest.fixture
+def image_paths(tmp_path):
+    paths = []
+    for name in ('a.png', 'b.png'):
+        path = os.path.join(tmp_path, name)
+        cv2.imwrite(path, np.zeros((32, 32, 3), dtype=np.uint8))
+        paths.append(path)
+    return paths
+
+@pytest.mark.unit
+class TestQuantization:
+    def test_compare_identical(self, image_paths):
+        """Test identical detectors agree completely."""
+        boxes = [[0, 0, 10, 10, 0.9, 0], [20, 20, 30, 30, 0.8, 1]]
+        report = compare_models(fake_detector(boxes), fake_detector(boxes), image_paths)
+        
+        assert report['summary']['images'] == 2
+        assert report['summary']['recall'] == 1.0
+        assert report['summary']['precision'] == 1.0
+        assert report['summary']['mean_iou'] == pytest.approx(1.0)
+        assert 'speedup' in report['summary']
+
+    def test_compare_class_mismatch_and_missing_box(self, image_paths):
+        """Test boxes only match when classes agree and overlap is high enough."""
+        reference = fake_detector([[0, 0, 10, 10, 0.9, 0], [20, 20, 30, 30, 0.8, 1]])
+        candidate = fake_detector([[0, 0, 10, 10, 0.85, 1]])
+        report = compare_models(reference, candidate, image_paths[:1])
+        
+        row = report['images'][0]
+        assert row['matches'] == 0
+        assert row['recall'] == 0.0
+        assert row['precision'] == 0.0
+
+    def test_invalid_mode(self):
+        """Test unknown quantization modes are rejected."""
+        with pytest.raises(ValueError):
+            quantize_model('yolov8n.pt', mode='int4')
+
+    def test_static_needs_calibration_images(self, tmp_path):
+        """Test static mode refuses to run without calibration data."""
+        with patch('app.utils.quantization.export_onnx', return_value=os.path.join(tmp_path, 'm.onnx')):
+            with pytest.raises(ValueError):
+                quantize_model('yolov8n.pt', mode='static', calibration_dir=None, cache_dir=str(tmp_path))
+
+    def test_quantize_command(self, runner):
+        """Test the CLI prints the cached artifact path."""
+        with patch('app.utils.quantization.quantize_model', return_value='models/yolov8n-int8.onnx') as mock_quantize:
+            result = runner.invoke(args=['quantize', '--mode', 'dynamic'])
+        
+        assert result.exit_code == 0
+        assert 'models/yolov8n-int8.onnx' in result.output
+        assert mock_quantize.call_args.kwargs['mode'] == 'dynamic'
@@ -0,0 +1,60 @@
+import os
+import pytest
+from unittest.mock import patch
+from app.utils.result_cache import DetectionCache
+
+DETECTIONS = [{'class': 'person', 'confidence': 0.95, 'bbox': [100.0, 100.0, 200.0, 200.0]}]
+
+@pytest.mark.unit
+class TestDetectionCache:
+    def test_key_depends_on_bytes_model_and_conf(self):
+        """Test every input that changes the result changes the key."""
+        key = DetectionCache.make_key(b'image', 'yolov8n.pt', 0.25)
+        assert key == DetectionCache.make_key(b'image', 'yolov8n.pt', 0.25)
+        assert key != DetectionCache.make_key(b'other', 'yolov8n.pt', 0.25)
+        assert key != DetectionCache.make_key(b'image', 'yolov8s.pt', 0.25)
+        assert key != DetectionCache.make_key(b'image', 'yolov8n.pt', 0.5)
+
+    def test_hit_and_miss_counters(self):
+        """Test lookups are counted."""
+        cache = DetectionCache(max_entries=4, ttl=60)
+        assert cache.get('a') is None
+        cache.set('a', DETECTIONS)
+        assert cache.get('a') == DETECTIONS
+        
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['hit_rate'] == 0.5
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted first."""
+        cache = DetectionCache(max_entries=2, ttl=60)
+        cache.set('a', DETECTIONS)
+        cache.set('b', DETECTIONS)
+        cache.get('a')
+        cache.set('c', DETECTIONS)
+        
+        assert cache.get('b') is None
+        assert cache.get('a') == DETECTIONS
+        assert cache.stats()['evictions'] == 1
+
+    def test_ttl_expiry(self):
+        """Test entries older than the TTL are treated as misses."""
+        cache = DetectionCache(max_entries=2, ttl=10)
+        with patch('app.utils.result_cache.time.time', return_value=1000.0):
+            cache.set('a', DETECTIONS)
+        with patch('app.utils.result_cache.time.time', return_value=1011.0):
+            assert cache.get('a') is None
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        """Test entries written to SQLite are found by a new cache instance."""
+        db_path = os.path.join(tmp_path, 'cache.db')
+        cache = DetectionCache(max_entries=2, ttl=60, db_path=db_path)
+        cache.set('a', DETECTIONS)
+        cache.close()
+        
+        restarted = DetectionCache(max_entries=2, ttl=60, db_path=db_path)
+        assert restarted.get('a') == DETECTIONS
+        assert restarted.stats()['disk_hits'] == 1
+        restarted.close()
@@ -0,0 +1,72 @@
+import pytest
+import numpy as np
+from unittest.mock import MagicMock
+from app.utils.tiling import box_ios, iter_tiles, merge_detections, tile_origins, tiled_predict
+
+@pytest.mark.unit
+class TestTiles:
+    def test_tile_origins_cover_axis(self):
+        """Test tiles overlap and the last one ends at the image edge."""
+        assert tile_origins(1000, 400, 0.25) == [0, 300, 600]
+        assert tile_origins(300, 400, 0.25) == [0]
+
+    def test_iter_tiles(self):
+        """Test every tile is contiguous and full-size for large images."""
+        image = np.zeros((900, 1200, 3), dtype=np.uint8)
+        tiles = list(iter_tiles(image, 640, 0.2))
+        
+        assert [(x, y) for x, y, _ in tiles] == [(0, 0), (512, 0), (560, 0), (0, 260), (512, 260), (560, 260)]
+        assert all(tile.shape == (640, 640, 3) and tile.flags['C_CONTIGUOUS'] for _, _, tile in tiles)
+
+@pytest.mark.unit
+class TestMergeDetections:
+    def test_box_ios(self):
+        """Test a box cut in half fully overlaps by intersection over smaller."""
+        ios = box_ios(np.array([[0, 0, 100, 100]]), np.array([[50, 0, 100, 100]]))
+        np.testing.assert_allclose(ios, [[1.0]])
+
+    def test_merges_duplicates_per_class(self):
+        """Test seam duplicates are merged while other classes are kept."""
+        boxes = np.array([
+            [50, 0, 100, 100, 0.6, 0],
+            [0, 0, 100, 100, 0.9, 0],
+            [0, 0, 100, 100, 0.8, 1],
+            [300, 300, 400, 400, 0.5, 0]
+        ], dtype=np.float32)
+        
+        merged = merge_detections(boxes, iou_threshold=0.5)
+        
+        np.testing.assert_allclose(merged[:, 4], [0.9, 0.8, 0.5])
+
+    def test_empty(self):
+        """Test no boxes merge to an empty array."""
+        assert merge_detections(np.zeros((0, 6))).shape == (0, 6)
+
+@pytest.mark.unit
+class TestTiledPredict:
+    def test_boxes_in_global_coordinates(self):
+        """Test tile boxes are shifted back and tiles are batched."""
+        engine = MagicMock()
+        engine.predict.side_effect = lambda images, conf: [
+            np.array([[10, 10, 20, 20, 0.9, 0]], dtype=np.float32) for _ in images
+        ]
+        image = np.zeros((640, 1280, 3), dtype=np.uint8)
+        
+        boxes = tiled_predict(engine, image, tile_size=640, overlap=0.0, batch_size=2, full_image=False)
+        
+        assert engine.predict.call_count == 1
+        assert sorted(boxes[:, 0].tolist()) == [10.0, 650.0]
+
+    def test_full_image_pass_is_rescaled(self):
+        """Test the downscaled full-image pass maps back to image coordinates."""
+        engine = MagicMock()
+        engine.predict.side_effect = lambda images, conf: [
+            np.array([[0, 0, 320, 160, 0.9, 1]], dtype=np.float32) if images[0].shape[:2] == (320, 640)
+            else np.zeros((0, 6), dtype=np.float32)
+            for _ in images
+        ]
+        image = np.zeros((640, 1280, 3), dtype=np.uint8)
+        
+        boxes = tiled_predict(engine, image, tile_size=640, overlap=0.0, batch_size=8)
+        
+        np.testing.assert_allclose(boxes, [[0, 0, 640, 320, 0.9, 1]])
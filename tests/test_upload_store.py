@@ -0,0 +1,115 @@
+import os
+import time
+import hashlib
+import pytest
+import numpy as np
+from unittest.mock import patch
+from app import create_app
+from app.config import TestingConfig
+from app.utils.upload_store import UploadStore
+from app.utils.uploads import spooled_request_class
+
+@pytest.mark.unit
+class TestUploadStore:
+    def test_content_addressed_and_deduplicated(self, tmp_path):
+        """Test identical uploads are stored once under their hash."""
+        store = UploadStore(str(tmp_path), async_writes=False)
+        first = store.put(b'image-bytes', 'a.JPG')
+        second = store.put(b'image-bytes', 'b.jpg')
+
+        digest = hashlib.sha256(b'image-bytes').hexdigest()
+        assert first == second == os.path.join(digest[:2], digest + '.jpg')
+        assert (tmp_path / first).read_bytes() == b'image-bytes'
+        stats = store.stats()
+        assert (stats['writes'], stats['dedupe_hits'], stats['files']) == (1, 1, 1)
+        assert not list(tmp_path.rglob('*.tmp'))
+        store.close()
+
+    def test_evicts_expired_files(self, tmp_path):
+        """Test files older than max_age are removed."""
+        store = UploadStore(str(tmp_path), max_age=60, async_writes=False)
+        path = tmp_path / store.put(b'old', 'old.png')
+        store.put(b'new', 'new.png')
+        os.utime(path, (time.time() - 120, time.time() - 120))
+
+        assert store.evict() == 1
+        assert not path.exists()
+        assert store.stats()['files'] == 1
+        store.close()
+
+    def test_evicts_oldest_over_budget(self, tmp_path):
+        """Test the oldest files go first when the size budget is exceeded."""
+        store = UploadStore(str(tmp_path), max_bytes=25, async_writes=False)
+        first = store.put(b'a' * 10, '1.png')
+        store.put(b'b' * 10, '2.png')
+        store.put(b'c' * 10, '3.png')
+
+        stats = store.stats()
+        assert stats['bytes'] <= 25 and stats['evictions'] == 1
+        assert not (tmp_path / first).exists()
+        store.close()
+
+    def test_indexes_existing_files(self, tmp_path):
+        """Test files from an earlier run count towards the budget."""
+        (tmp_path / 'legacy.jpg').write_bytes(b'x' * 100)
+        store = UploadStore(str(tmp_path), max_bytes=50, async_writes=False)
+
+        assert store.stats()['bytes'] == 100
+        assert store.evict() == 1
+        assert not (tmp_path / 'legacy.jpg').exists()
+
+    def test_async_writes(self, tmp_path):
+        """Test queued uploads are written by the background thread."""
+        store = UploadStore(str(tmp_path))
+        assert store.put(b'queued', 'q.png') is None
+        store.flush()
+
+        assert store.stats()['writes'] == 1
+        assert len(list(tmp_path.rglob('*.png'))) == 1
+        store.close()
+
+    def test_drops_when_queue_full(self, tmp_path):
+        """Test uploads are skipped rather than blocking when the writer is behind."""
+        store = UploadStore(str(tmp_path), queue_size=1)
+        with patch.object(store, '_ensure_threads'):
+            store.put(b'one', '1.png')
+            store.put(b'two', '2.png')
+
+        assert store.stats()['dropped'] == 1
+
+    def test_spooled_request_class(self):
+        """Test uploads above the threshold spill to disk."""
+        request_class = spooled_request_class(4)
+        stream = request_class._get_file_stream(None, 1024, 'image/png')
+        stream.write(b'0123456789')
+
+        assert stream._rolled
+        stream.close()
+
+@pytest.mark.integration
+class TestUploadStoreAPI:
+    def test_disabled_by_default(self, client):
+        """Test no store is created unless enabled."""
+        response = client.get('/api/uploads/stats')
+        assert response.get_json() == {'enabled': False}
+
+    @pytest.mark.parametrize('route', ['/api/detect?cache=0', '/api/detect/annotated'])
+    def test_api_stores_upload(self, tmp_path, sample_image, route):
+        """Test single-image routes keep a copy of the upload when the store is enabled."""
+        with patch.object(TestingConfig, 'UPLOAD_STORE_ENABLED', True), \
+             patch.object(TestingConfig, 'UPLOAD_STORE_ASYNC', False), \
+             patch.object(TestingConfig, 'UPLOAD_FOLDER', str(tmp_path)):
+            app = create_app('testing')
+        client = app.test_client()
+
+        with open(sample_image, 'rb') as img, \
+             patch('app.utils.yolo_detector.YOLODetector.detect', return_value=[]), \
+             patch('app.utils.yolo_detector.YOLODetector.predict', return_value=[np.zeros((0, 6), dtype=np.float32)]), \
+             patch('app.utils.yolo_detector.YOLODetector.names', {0: 'person'}):
+            response = client.post(route, data={'file': (img, 'test.png')})
+
+        assert response.status_code == 200
+        stats = client.get('/api/uploads/stats').get_json()
+        assert stats['enabled'] is True and stats['writes'] == 1
+        assert len(list(tmp_path.rglob('*.png'))) == 1
+        app.extensions['upload_store'].close()
@@ -0,0 +1,112 @@
+import os
+import pytest
+import numpy as np
+import cv2
+from io import BytesIO
+from unittest.mock import MagicMock
+from app.utils.video import BoxTracker, iter_mjpeg_frames, iter_video_frames, track_stream
+
+def encode_jpeg(value):
+    img = np.full((32, 48, 3), value, dtype=np.uint8)
+    ok, encoded = cv2.imencode('.jpg', img)
+    assert ok
+    return encoded.tobytes()
+
+def with_thumbnail(jpeg, thumbnail):
+    """Insert an EXIF APP1 segment carrying a complete JPEG thumbnail after the SOI."""
+    payload = b'Exif\x00\x00' + thumbnail
+    segment = b'\xff\xe1' + (len(payload) + 2).to_bytes(2, 'big') + payload
+    return jpeg[:2] + segment + jpeg[2:]
+
+def make_engine():
+    """Fake engine returning one box that moves 10px per call."""
+    engine = MagicMock()
+    engine.names = {0: 'person'}
+    calls = {'count': 0}
+
+    def predict(images, conf=0.25):
+        results = []
+        for _ in images:
+            offset = 10 * calls['count']
+            calls['count'] += 1
+            results.append(np.array([[offset, 0, offset + 20, 20, 0.9, 0]], dtype=np.float32))
+        return results
+
+    engine.predict.side_effect = predict
+    return engine
+
+@pytest.mark.unit
+class TestVideo:
+    def test_mjpeg_split(self):
+        """Test concatenated JPEGs are cut into frames across small reads."""
+        stream = BytesIO(b'--boundary\r\n' + encode_jpeg(0) + b'\r\n--boundary\r\n' + encode_jpeg(255))
+        frames = list(iter_mjpeg_frames(stream, chunk_size=7))
+        
+        assert [index for index, _ in frames] == [0, 1]
+        assert frames[0][1].shape == (32, 48, 3)
+        assert frames[1][1].mean() > 200
+
+    def test_mjpeg_thumbnail_does_not_end_frame(self):
+        """Test the EOI of an embedded EXIF thumbnail is not taken for the frame's."""
+        jpeg = with_thumbnail(encode_jpeg(255), encode_jpeg(0))
+        stream = BytesIO(jpeg + encode_jpeg(0))
+        frames = list(iter_mjpeg_frames(stream, chunk_size=5))
+        
+        assert [index for index, _ in frames] == [0, 1]
+        assert frames[0][1].mean() > 200
+        assert frames[1][1].mean() < 50
+
+    def test_mjpeg_stride_skips_decoding(self):
+        """Test skipped frames are delimited but not decoded."""
+        stream = BytesIO(b''.join(encode_jpeg(v) for v in (0, 50, 100, 150)))
+        frames = list(iter_mjpeg_frames(stream, stride=2))
+        
+        assert [frame is not None for _, frame in frames] == [True, False, True, False]
+
+    def test_mjpeg_frame_too_large(self):
+        """Test an unterminated frame larger than the limit is rejected."""
+        stream = BytesIO(b'\xff\xd8' + b'\x00' * 1024)
+        with pytest.raises(ValueError):
+            list(iter_mjpeg_frames(stream, chunk_size=64, max_frame_size=256))
+
+    def test_video_file_frames(self, tmp_path):
+        """Test frames are read from a container with stride skipping."""
+        path = os.path.join(tmp_path, 'clip.avi')
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (48, 32))
+        for value in range(5):
+            writer.write(np.full((32, 48, 3), value * 50, dtype=np.uint8))
+        writer.release()
+        
+        frames = list(iter_video_frames(cv2.VideoCapture(path), stride=2))
+        assert [index for index, _ in frames] == [0, 1, 2, 3, 4]
+        assert [frame is not None for _, frame in frames] == [True, False, True, False, True]
+
+    def test_tracker_keeps_ids_and_extrapolates(self):
+        """Test matched boxes keep their id and move with constant velocity between keyframes."""
+        tracker = BoxTracker()
+        _, first_ids = tracker.update(np.array([[0, 0, 20, 20, 0.9, 0]]), 0)
+        boxes, ids = tracker.update(np.array([[10, 0, 30, 20, 0.9, 0]]), 2)
+        
+        assert ids.tolist() == first_ids.tolist()
+        predicted, _ = tracker.predict(3)
+        np.testing.assert_allclose(predicted[0, :4], [15, 0, 35, 20])
+
+    def test_tracker_new_track_for_other_class(self):
+        """Test a detection of a different class never inherits a track."""
+        tracker = BoxTracker()
+        _, first_ids = tracker.update(np.array([[0, 0, 20, 20, 0.9, 0]]), 0)
+        _, ids = tracker.update(np.array([[0, 0, 20, 20, 0.9, 1]]), 1)
+        
+        assert ids[0] != first_ids[0]
+
+    def test_track_stream_batches_keyframes(self):
+        """Test keyframes are batched and skipped frames reuse tracked boxes."""
+        engine = make_engine()
+        frames = [(i, np.zeros((8, 8, 3), np.uint8) if i % 2 == 0 else None) for i in range(6)]
+        results = list(track_stream(engine, iter(frames), batch_size=2))
+        
+        assert [r['frame'] for r in results] == list(range(6))
+        assert [r['keyframe'] for r in results] == [True, False, True, False, True, False]
+        assert engine.predict.call_count == 2
+        assert {d['track_id'] for r in results for d in r['detections']} == {0}
+        assert results[3]['detections'][0]['bbox'] == [15.0, 0.0, 35.0, 20.0]
@@ -0,0 +1,56 @@
+import os
+import pytest
+import numpy as np
+from app.utils.worker_pool import InferencePool
+
+class FakeDetector:
+    """Picklable stand-in for YOLODetector used inside worker processes."""
+    names = {0: 'person'}
+
+    def predict(self, images, conf=0.25, imgsz=640):
+        if conf >= 0.99:
+            # Simulate a segfault in the inference process
+            os._exit(1)
+        # One box covering the whole frame, plus its mean pixel value as the score
+        return [np.array([[0, 0, imgsz, imgsz, float(image.mean()) / 255, 0]], dtype=np.float32)
+                for image in images]
+
+def fake_factory(model_name):
+    return FakeDetector()
+
+@pytest.fixture
+def pool():
+    pool = InferencePool('fake.pt', workers=2, threads_per_worker=1, imgsz=64,
+                         factory=fake_factory, monitor_interval=0.1)
+    assert pool.wait_ready(timeout=60)
+    yield pool
+    pool.close()
+
+@pytest.mark.integration
+@pytest.mark.slow
+class TestInferencePool:
+    def test_detect_through_shared_memory(self, pool):
+        """Test a frame round-trips through a worker and boxes map back to it."""
+        image = np.full((64, 128, 3), 255, dtype=np.uint8)
+        results = pool.detect(image)
+        
+        assert len(results) == 1
+        assert results[0]['class'] == 'person'
+        assert results[0]['bbox'] == [0.0, 0.0, 128.0, 64.0]
+
+    def test_many_requests(self, pool):
+        """Test concurrent submissions are spread across workers."""
+        futures = [pool.submit(np.full((32, 32, 3), 255, dtype=np.uint8)) for _ in range(20)]
+        results = [f.result(timeout=30) for f in futures]
+        
+        assert all(boxes.shape == (1, 6) for boxes in results)
+        assert not pool._pending
+
+    def test_worker_crash_is_restarted(self, pool):
+        """Test a crashing worker fails its request and the pool keeps serving."""
+        image = np.zeros((32, 32, 3), dtype=np.uint8)
+        with pytest.raises(RuntimeError, match='crashed'):
+            pool.submit(image, conf=0.99).result(timeout=30)
+        
+        assert pool.detect_boxes(image).shape == (1, 6)
+        assert all(worker.process.is_alive() for worker in pool._workers.values())
@@ -1,5 +1,6 @@
 import pytest
 import torch
+import numpy as np
 from unittest.mock import MagicMock, patch
 from app.utils.yolo_detector import YOLODetector
 
@@ -12,12 +13,21 @@ class TestYOLODetector:
             assert detector.device == ('cuda' if torch.cuda.is_available() else 'cpu')
             mock_yolo.assert_called_once_with('yolov8n.pt')
 
+    def test_channels_last(self):
+        """Test the model is fused before its weights are converted to channels-last."""
+        with patch('app.utils.yolo_detector.YOLO') as mock_yolo:
+            detector = YOLODetector('yolov8n.pt', channels_last=True)
+            mock_model = mock_yolo.return_value
+            mock_model.fuse.assert_called_once()
+            mock_model.model.to.assert_called_once_with(memory_format=torch.channels_last)
+            assert detector.channels_last
+
     def test_detect_with_mock(self, sample_image):
         """Test detection with mocked YOLO model."""
         mock_results = MagicMock()
-        mock_results.boxes.data.tolist.return_value = [
+        mock_results.boxes.data = torch.tensor([
             [100, 100, 200, 200, 0.95, 0]  # x1, y1, x2, y2, conf, class_id
-        ]
+        ], dtype=torch.float64)
         mock_results.names = {0: 'person'}
 
         with patch('app.utils.yolo_detector.YOLO') as mock_yolo:
@@ -54,9 +64,9 @@ class TestYOLODetector:
     def test_different_confidence_threshold(self, sample_image):
         """Test detection with different confidence threshold."""
         mock_results = MagicMock()
-        mock_results.boxes.data.tolist.return_value = [
+        mock_results.boxes.data = torch.tensor([
             [100, 100, 200, 200, 0.95, 0]  # x1, y1, x2, y2, conf, class_id
-        ]
+        ], dtype=torch.float64)
         mock_results.names = {0: 'person'}
 
         with patch('app.utils.yolo_detector.YOLO') as mock_yolo:
@@ -68,4 +78,27 @@ class TestYOLODetector:
             
             assert isinstance(results, list)
             assert len(results) == 1
-            mock_model.assert_called_once_with(sample_image, conf=0.5) 
\ No newline at end of file
+            mock_model.assert_called_once_with(sample_image, conf=0.5)
+
+    def test_detect_array_without_annotation(self):
+        """Test detection on a decoded array draws and writes nothing by default."""
+        image = np.zeros((100, 100, 3), dtype=np.uint8)
+        mock_results = MagicMock()
+        mock_results.boxes.data = torch.tensor([
+            [10, 10, 50, 50, 0.9, 0]
+        ])
+        mock_results.names = {0: 'person'}
+        mock_results.orig_img = image
+
+        with patch('app.utils.yolo_detector.YOLO') as mock_yolo, \
+             patch('app.utils.yolo_detector.cv2.imwrite') as mock_imwrite:
+            mock_model = mock_yolo.return_value
+            mock_model.return_value = [mock_results]
+            
+            detector = YOLODetector('yolov8n.pt')
+            results = detector.detect(image, conf=0.5)
+            
+            assert results[0]['class'] == 'person'
+            mock_model.assert_called_once_with(image, conf=0.5)
+            mock_imwrite.assert_not_called()
+            assert not image.any()
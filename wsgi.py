@@ -0,0 +1,7 @@
+import os
+from app import create_app
+from app.asgi import AsyncDetectionApp
+
+# Entry points for pre-forking servers, see gunicorn.conf.py
+app = create_app(os.getenv('FLASK_ENV', 'production'))
+asgi_app = AsyncDetectionApp(app)